@@ -0,0 +1,139 @@
+"""
+Compare finding submission trait mappings in ClinVar VariationArchive elements with an index of TraitMapping elements
+to the previous XPath lookups.
+
+Reads the first --n-archives VariationArchive elements from a ClinVar variation XML file (optionally gzipped), keeping
+those with at least --min-submissions submissions. Archives with many submissions are the ones where XPath lookups,
+which scan the whole TraitMappingList for every trait, are slowest.
+
+Usage: PYTHONPATH=src python benchmarks/clinvar_trait_mappings.py ClinVarVariationRelease.xml.gz [--n-archives N]
+"""
+
+import argparse
+import gzip
+import itertools
+import time
+from xml.etree import ElementTree
+
+from data_pipeline.datasets.clinvar import (
+    SkipVariant,
+    _index_trait_mappings,
+    _iter_variation_archives,
+    _parse_variant,
+)
+
+
+def xpath_trait_mapping(trait_mapping_list_element, submission_element, trait_element):
+    """
+    Find the TraitMapping element for a submission's trait with XPath selectors, as the parser previously did.
+    """
+    if trait_mapping_list_element is None:
+        return None
+
+    attributes = (
+        f"[@ClinicalAssertionID='{submission_element.attrib['ID']}'][@TraitType='{trait_element.attrib['Type']}']"
+    )
+    for xref_element in trait_element.findall("XRef"):
+        selector = f"./TraitMapping{attributes}[@MappingType='XRef'][@MappingValue='{xref_element.attrib['ID']}']"
+        mapping_element = trait_mapping_list_element.find(selector)
+        if mapping_element is not None:
+            return mapping_element
+
+    for name_element in trait_element.findall("./Name/ElementValue"):
+        selector = f"./TraitMapping{attributes}[@MappingType='Name'][@MappingValue=\"{name_element.text}\"]"
+        try:
+            mapping_element = trait_mapping_list_element.find(selector)
+        except SyntaxError:
+            # Names containing quotes cannot be used in a selector
+            continue
+        if mapping_element is not None:
+            return mapping_element
+
+    return None
+
+
+def indexed_trait_mapping(trait_mappings, submission_element, trait_element):
+    key = (submission_element.attrib["ID"], trait_element.attrib["Type"])
+    for xref_element in trait_element.findall("XRef"):
+        mapping_element = trait_mappings.get((*key, "XRef", xref_element.attrib["ID"]))
+        if mapping_element is not None:
+            return mapping_element
+
+    for name_element in trait_element.findall("./Name/ElementValue"):
+        mapping_element = trait_mappings.get((*key, "Name", name_element.text))
+        if mapping_element is not None:
+            return mapping_element
+
+    return None
+
+
+def submission_traits(variant_element):
+    for submission_element in variant_element.iterfind("./InterpretedRecord/ClinicalAssertionList/ClinicalAssertion"):
+        for trait_element in submission_element.iterfind("./TraitSet/Trait"):
+            yield submission_element, trait_element
+
+
+def time_xpath_lookups(variant_elements):
+    start = time.perf_counter()
+    for variant_element in variant_elements:
+        trait_mapping_list_element = variant_element.find("./InterpretedRecord/TraitMappingList")
+        for submission_element, trait_element in submission_traits(variant_element):
+            xpath_trait_mapping(trait_mapping_list_element, submission_element, trait_element)
+    return time.perf_counter() - start
+
+
+def time_indexed_lookups(variant_elements):
+    start = time.perf_counter()
+    for variant_element in variant_elements:
+        trait_mappings = _index_trait_mappings(variant_element.find("./InterpretedRecord/TraitMappingList"))
+        for submission_element, trait_element in submission_traits(variant_element):
+            indexed_trait_mapping(trait_mappings, submission_element, trait_element)
+    return time.perf_counter() - start
+
+
+def time_parse(variant_elements):
+    start = time.perf_counter()
+    for variant_element in variant_elements:
+        try:
+            _parse_variant(variant_element)
+        except SkipVariant:
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("clinvar_xml_path")
+    parser.add_argument("--n-archives", type=int, default=100_000)
+    parser.add_argument("--min-submissions", type=int, default=1)
+    args = parser.parse_args()
+
+    open_file = gzip.open if args.clinvar_xml_path.endswith(".gz") else open
+    with open_file(args.clinvar_xml_path, "rb") as xml_file:
+        variant_elements = [
+            ElementTree.fromstring(variation_archive)
+            for variation_archive in itertools.islice(_iter_variation_archives(xml_file), args.n_archives)
+        ]
+
+    variant_elements = [
+        variant_element
+        for variant_element in variant_elements
+        if len(variant_element.findall("./InterpretedRecord/ClinicalAssertionList/ClinicalAssertion"))
+        >= args.min_submissions
+    ]
+    n_traits = sum(1 for variant_element in variant_elements for _ in submission_traits(variant_element))
+
+    xpath_time = time_xpath_lookups(variant_elements)
+    indexed_time = time_indexed_lookups(variant_elements)
+    parse_time = time_parse(variant_elements)
+
+    print(f"Archives:               {len(variant_elements):,}")
+    print(f"Submission traits:      {n_traits:,}")
+    print(f"XPath lookups:          {xpath_time:,.2f}s ({xpath_time / max(n_traits, 1) * 1e6:,.1f} us/trait)")
+    print(f"Indexed lookups:        {indexed_time:,.2f}s ({indexed_time / max(n_traits, 1) * 1e6:,.1f} us/trait)")
+    ms_per_archive = parse_time / max(len(variant_elements), 1) * 1e3
+    print(f"Parse (indexed):        {parse_time:,.2f}s ({ms_per_archive:,.2f} ms/archive)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compare computing xpos with precomputed contig lookups (data_types/locus.py) to the previous string expressions.
+
+By default, times both on a generated table with one row per base across the primary contigs (about 3 billion
+rows for GRCh38). Use --n-rows to time a smaller table or --coverage-path to time an existing coverage table.
+
+Usage: PYTHONPATH=src python benchmarks/locus_encoding.py [--reference-genome GRCh38] [--n-rows N]
+    [--coverage-path PATH]
+"""
+
+import argparse
+import time
+
+import hail as hl
+
+from data_pipeline.data_types.locus import CONTIG_NUMBERS, x_position
+
+
+def string_x_position(locus):
+    """
+    The previous xpos expression, which normalizes the contig name and parses it for every row.
+    """
+    contig = hl.rbind(locus.contig.replace("^chr", ""), lambda c: hl.if_else(c == "MT", "M", c))
+    contig_number = hl.bind(
+        lambda c: hl.case().when(c == "X", 23).when(c == "Y", 24).when(c == "M", 25).default(hl.int(c)),
+        contig,
+    )
+    return hl.int64(contig_number) * 1_000_000_000 + locus.position
+
+
+def generated_loci(reference_genome, n_rows=None):
+    reference_genome = hl.get_reference(reference_genome)
+    contigs = [contig for contig in reference_genome.contigs if contig in CONTIG_NUMBERS]
+    genome_length = sum(reference_genome.lengths[contig] for contig in contigs)
+
+    n_rows = n_rows or genome_length
+    ds = hl.utils.range_table(n_rows, n_partitions=max(1, n_rows // 10_000_000))
+    # Spread rows evenly across the genome so that every contig is represented
+    return ds.select(locus=hl.locus_from_global_position(hl.int64(ds.idx * (genome_length / n_rows)), reference_genome))
+
+
+def time_expression(ds, expression):
+    start = time.perf_counter()
+    result = ds.aggregate(hl.agg.sum(expression(ds.locus)))
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reference-genome", choices=["GRCh37", "GRCh38"], default="GRCh38")
+    parser.add_argument("--n-rows", type=int)
+    parser.add_argument("--coverage-path")
+    args = parser.parse_args()
+
+    if args.coverage_path:
+        ds = hl.read_table(args.coverage_path).select("locus")
+    else:
+        ds = generated_loci(args.reference_genome, args.n_rows)
+
+    # Materialize loci first so that both timings measure only the xpos expression
+    ds = ds.checkpoint(hl.utils.new_temp_file("locus_encoding", "ht"))
+    n_rows = ds.count()
+
+    string_time, string_result = time_expression(ds, string_x_position)
+    lookup_time, lookup_result = time_expression(ds, x_position)
+
+    assert string_result == lookup_result, "xpos expressions differ"
+
+    print(f"Rows:                {n_rows:,}")
+    print(f"String expressions:  {string_time:,.1f}s ({string_time / n_rows * 1e9:,.1f} ns/row)")
+    print(f"Precomputed lookups: {lookup_time:,.1f}s ({lookup_time / n_rows * 1e9:,.1f} ns/row)")
+
+
+if __name__ == "__main__":
+    main()
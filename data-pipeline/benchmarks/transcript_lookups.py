@@ -0,0 +1,69 @@
+"""
+Compare annotating transcript consequences with literal dict lookups (collecting the transcripts and MANE Select
+transcripts tables to the driver) to joining the tables to exploded consequences.
+
+Runs annotate_transcript_consequences on a variants table (for example, the output of annotate_gnomad_v4_variants)
+with each lookup method and writes the results to temporary tables. Use --n-partitions to time a subset of the
+variants table's partitions.
+
+Usage: PYTHONPATH=src python benchmarks/transcript_lookups.py VARIANTS_PATH TRANSCRIPTS_PATH
+    [--mane-transcripts-path PATH]
+"""
+
+import argparse
+import time
+
+import hail as hl
+
+from data_pipeline.data_types.variant import annotate_transcript_consequences
+from data_pipeline.data_types.variant.transcript_consequence.annotate_transcript_consequences import LOOKUP_METHODS
+
+
+def time_lookup_method(variants_path, transcripts_path, mane_transcripts_path, lookup_method):
+    start = time.perf_counter()
+    ds = annotate_transcript_consequences(
+        variants_path, transcripts_path, mane_transcripts_path=mane_transcripts_path, lookup_method=lookup_method
+    )
+    ds = ds.checkpoint(hl.utils.new_temp_file(f"transcript_lookups_{lookup_method}", "ht"))
+    return time.perf_counter() - start, ds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("variants_path")
+    parser.add_argument("transcripts_path")
+    parser.add_argument("--mane-transcripts-path")
+    parser.add_argument("--n-partitions", type=int)
+    args = parser.parse_args()
+
+    variants_path = args.variants_path
+    if args.n_partitions:
+        ds = hl.read_table(variants_path)
+        ds = ds._filter_partitions(range(args.n_partitions))  # pylint: disable=protected-access
+        variants_path = hl.utils.new_temp_file("transcript_lookups_variants", "ht")
+        ds.write(variants_path)
+
+    n_variants = hl.read_table(variants_path).count()
+    n_transcripts = hl.read_table(args.transcripts_path).count()
+
+    results = {}
+    for lookup_method in LOOKUP_METHODS:
+        results[lookup_method] = time_lookup_method(
+            variants_path, args.transcripts_path, args.mane_transcripts_path, lookup_method
+        )
+
+    literal_ds = results["literal"][1]
+    join_ds = results["join"][1]
+    n_different = literal_ds.aggregate(
+        hl.agg.count_where(literal_ds.transcript_consequences != join_ds[literal_ds.key].transcript_consequences)
+    )
+    assert n_different == 0, f"Lookup methods differ for {n_different} variants"
+
+    print(f"Variants:    {n_variants:,}")
+    print(f"Transcripts: {n_transcripts:,}")
+    for lookup_method, (elapsed, _) in results.items():
+        print(f"{lookup_method.capitalize() + ':':<12} {elapsed:,.1f}s ({elapsed / n_variants * 1e6:,.2f} us/variant)")
+
+
+if __name__ == "__main__":
+    main()
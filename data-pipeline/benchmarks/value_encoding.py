@@ -0,0 +1,129 @@
+"""
+Compare storing documents' value field as JSON or with the zlib value encoding.
+
+Input is a file with one JSON value per line, for example a sample of rows from a variants table:
+
+    ds = hl.read_table(path).head(10_000)
+    ds.select(value=hl.json(ds.row)).key_by().export("values.json", header=False)
+
+Without --host, reports payload sizes and encode/decode times. With --host, also loads the values into
+temporary indices and reports index store sizes and document fetch latency.
+
+Usage: PYTHONPATH=src python benchmarks/value_encoding.py values.json [--host localhost]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+import elasticsearch
+
+from data_pipeline.helpers.elasticsearch_value_encoding import decode_value, encode_value
+
+
+def benchmark_payloads(values):
+    json_size = sum(len(value.encode("utf8")) for value in values)
+
+    start = time.perf_counter()
+    encoded_values = [encode_value(value) for value in values]
+    encode_time = time.perf_counter() - start
+    encoded_size = sum(len(value) for value in encoded_values)
+
+    start = time.perf_counter()
+    for value in values:
+        json.loads(value)
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for value in encoded_values:
+        decode_value(value)
+    decode_time = time.perf_counter() - start
+
+    n = len(values)
+    print(f"Documents:          {n:,}")
+    print(f"JSON size:          {json_size / n:,.0f} bytes/document")
+    print(f"Encoded size:       {encoded_size / n:,.0f} bytes/document ({encoded_size / json_size:.1%} of JSON)")
+    print(f"Encode time:        {encode_time / n * 1e6:,.1f} us/document")
+    print(f"JSON parse time:    {parse_time / n * 1e6:,.1f} us/document")
+    print(f"Decode time:        {decode_time / n * 1e6:,.1f} us/document")
+
+    return encoded_values
+
+
+def _load_index(es_client, index, mapping, documents):
+    es_client.indices.create(
+        index=index,
+        body={
+            "mappings": {"properties": {"value": mapping}},
+            "settings": {"index.codec": "best_compression", "index.number_of_replicas": 0},
+        },
+    )
+
+    for batch_start in range(0, len(documents), 1000):
+        body = []
+        for document_id, document in enumerate(documents[batch_start : batch_start + 1000], batch_start):
+            body.append(json.dumps({"index": {"_id": str(document_id)}}))
+            body.append(json.dumps({"value": document}))
+        es_client.bulk(body="\n".join(body) + "\n", index=index, request_timeout=120)
+
+    es_client.indices.refresh(index=index)
+    es_client.indices.forcemerge(index=index, max_num_segments=1, request_timeout=600)
+    return es_client.indices.stats(index=index, metric="store")["_all"]["primaries"]["store"]["size_in_bytes"]
+
+
+def _fetch_latency(es_client, index, n_documents, decode, n_requests=200, documents_per_request=50):
+    latencies = []
+    for _ in range(n_requests):
+        ids = [str(random.randrange(n_documents)) for _ in range(documents_per_request)]
+        start = time.perf_counter()
+        response = es_client.mget(index=index, body={"ids": ids})
+        for doc in response["docs"]:
+            decode(doc["_source"]["value"])
+        latencies.append(time.perf_counter() - start)
+
+    return statistics.median(latencies)
+
+
+def benchmark_indices(es_client, values, encoded_values):
+    indices = {
+        "json": (
+            "benchmark_value_encoding_json",
+            {"type": "object", "enabled": False},
+            [json.loads(v) for v in values],
+        ),
+        "zlib": ("benchmark_value_encoding_zlib", {"type": "binary"}, encoded_values),
+    }
+
+    try:
+        for encoding, (index, mapping, documents) in indices.items():
+            size = _load_index(es_client, index, mapping, documents)
+            latency = _fetch_latency(
+                es_client, index, len(documents), decode_value if encoding == "zlib" else lambda value: value
+            )
+            print(f"{encoding} index size:    {size / 2**20:,.1f} MiB")
+            print(f"{encoding} fetch latency: {latency * 1000:,.1f} ms per 50 documents (median)")
+    finally:
+        for index, _, _ in indices.values():
+            es_client.indices.delete(index=index, ignore=404)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("values_path")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int, default=9200)
+    args = parser.parse_args()
+
+    with open(args.values_path) as f:
+        values = [line.rstrip("\n") for line in f if line.strip()]
+
+    encoded_values = benchmark_payloads(values)
+
+    if args.host:
+        benchmark_indices(elasticsearch.Elasticsearch(args.host, port=args.port), values, encoded_values)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 """Export locus and alleles for gnomAD variants to a sharded VCF."""
 
 import argparse
+import math
 
 import hail as hl
 
@@ -54,6 +55,30 @@ def get_variants(dataset: str) -> hl.Table:
     raise ValueError(f"Unknown dataset '{dataset}'")
 
 
+# Approximate number of variants per VCF partition when only exporting variants missing from the CAID cache.
+VARIANTS_PER_PART = 150_000
+
+
+def exclude_cached_variants(ds: hl.Table, caid_cache_url: str) -> hl.Table:
+    """
+    Remove variants that already have a CAID in the cache.
+
+    Variants in the cache without a CAID are kept, since the Allele Registry may have registered them since.
+
+    :param ds: Hail Table keyed by locus and alleles.
+    :param caid_cache_url: URL of a Hail Table of CAIDs created by `import_caids.py`.
+    """
+    cache = hl.read_table(caid_cache_url)
+    cache = cache.filter(hl.is_defined(cache.caid))
+    ds = ds.anti_join(cache)
+
+    # Most variants are usually cached, so combine the remaining variants into fewer partitions.
+    n_variants = ds.count()
+    ds = ds.naive_coalesce(max(1, math.ceil(n_variants / VARIANTS_PER_PART)))
+
+    return ds
+
+
 def export_vcfs(ds: hl.Table, output_url: str) -> None:
     """
     Export locus and alleles fields from a Hail Table to a sharded VCF.
@@ -78,11 +103,14 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("dataset", choices=("ExAC", "gnomAD v2.1.1", "gnomAD v3.1.1"))
     parser.add_argument("output_url")
+    parser.add_argument("--caid-cache-url", help="Only export variants without a CAID in this table of CAIDs")
     args = parser.parse_args()
 
     hl.init()
 
     ds = get_variants(args.dataset)
+    if args.caid_cache_url:
+        ds = exclude_cached_variants(ds, args.caid_cache_url)
     export_vcfs(ds, args.output_url)
 
 
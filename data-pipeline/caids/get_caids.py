@@ -3,17 +3,18 @@
 import argparse
 import asyncio
 import errno
-import gzip
 import json
 import logging
+import random
 import socket
-from concurrent.futures import ThreadPoolExecutor
-from typing import Awaitable, Callable, TypeVar
+import time
+import zlib
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, TypeVar
 
 import aiohttp
-from hailtop.aiotools import LocalAsyncFS, RouterAsyncFS
-from hailtop.aiogoogle import GoogleStorageAsyncFS
-from hailtop.utils import bounded_gather, sleep_and_backoff, tqdm
+from hailtop.aiotools.router_fs import RouterAsyncFS
+from hailtop.utils import bounded_gather
+from tqdm import tqdm
 
 
 logger = logging.getLogger("get_caids")
@@ -23,6 +24,13 @@ handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s -
 logger.addHandler(handler)
 
 
+ALLELE_REGISTRY_URL = "https://reg.clinicalgenome.org/annotateVcf"
+
+READ_SIZE = 1024 * 1024
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
 def filter_vcf_header(header: str) -> str:
     """Filter a VCF header to include only the format line and contigs 1-22, X, Y, and M."""
     assembly = "GRCh37" if "assembly=GRCh37" in header else "GRCh38"
@@ -50,7 +58,8 @@ def filter_vcf_header(header: str) -> str:
     return "\n".join(output_lines)
 
 
-RETRYABLE_HTTP_STATUS_CODES = {408, 500, 502, 503, 504}
+# 429 responses indicate that the Allele Registry is overloaded and are handled like server errors.
+RETRYABLE_HTTP_STATUS_CODES = {408, 429, 500, 502, 503, 504}
 
 
 def is_transient_error(e):
@@ -60,6 +69,8 @@ def is_transient_error(e):
         return True
     if isinstance(e, aiohttp.ServerDisconnectedError):
         return True
+    if isinstance(e, asyncio.TimeoutError):
+        return True
     if isinstance(e, aiohttp.client_exceptions.ClientConnectorError):
         return hasattr(e, "os_error") and is_transient_error(e.os_error)
     if isinstance(e, OSError) and e.errno in (
@@ -82,147 +93,400 @@ def is_transient_error(e):
     return False
 
 
+def is_overload_error(e):
+    """Whether an error indicates that too many requests are being sent to the Allele Registry."""
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status == 429 or e.status >= 500
+    return isinstance(e, (asyncio.TimeoutError, aiohttp.ServerTimeoutError))
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limit the number of concurrent requests, adjusting the limit based on responses.
+
+    The limit increases by one for each limit's worth of successful requests that complete within the target
+    latency (additive increase) and halves when a request is too slow or fails with an overload error
+    (multiplicative decrease). The limit is decreased at most once per target latency, since requests that
+    were sent before a decrease may still fail afterwards.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        target_latency: float = 120.0,
+        decrease_factor: float = 0.5,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+
+        self.in_flight = 0
+        self._waiters: List[asyncio.Future] = []
+        self._last_decrease = float("-inf")
+
+    async def acquire(self) -> None:
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                self._waiters.remove(waiter)
+
+        self.in_flight += 1
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """
+        Release a request slot.
+
+        :param latency: Time taken by the request, if it succeeded.
+        :param overloaded: Whether the request failed with an error that indicates the server is overloaded.
+        """
+        self.in_flight -= 1
+
+        if overloaded or (latency is not None and latency > self.target_latency):
+            now = time.monotonic()
+            if now - self._last_decrease >= self.target_latency:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                logger.info("Decreased concurrency to %d", int(self.limit))
+        elif latency is not None:
+            previous_limit = int(self.limit)
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if int(self.limit) > previous_limit:
+                logger.info("Increased concurrency to %d", int(self.limit))
+
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class GzipDecompressor:
+    """
+    Incrementally decompress gzip data containing one or more members.
+
+    Block gzipped files written by Hail are a series of gzip members, which zlib decompresses one at a time.
+    """
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes) -> bytes:
+        chunks = []
+        while data:
+            chunks.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+
+            data = self._decompressor.unused_data
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        return b"".join(chunks)
+
+
+def is_gzipped(url: str) -> bool:
+    return url.endswith(".gz") or url.endswith(".bgz")
+
+
+async def iter_lines(fs: RouterAsyncFS, url: str, read_size: int = READ_SIZE) -> AsyncIterator[bytes]:
+    """Iterate over lines in a (optionally gzipped) file without reading the entire file into memory."""
+    decompressor = GzipDecompressor() if is_gzipped(url) else None
+    remainder = b""
+    async with await fs.open(url) as stream:
+        while True:
+            data = await stream.read(read_size)
+            if not data:
+                break
+
+            if decompressor:
+                data = decompressor.decompress(data)
+
+            lines = (remainder + data).split(b"\n")
+            remainder = lines.pop()
+            for line in lines:
+                yield line + b"\n"
+
+    if remainder:
+        yield remainder + b"\n"
+
+
+async def iter_batches(lines: AsyncIterator[bytes], batch_size: int) -> AsyncIterator[List[bytes]]:
+    """Group VCF data lines into batches of at most `batch_size` lines, skipping header and blank lines."""
+    batch = []
+    async for line in lines:
+        if line.startswith(b"#") or not line.strip():
+            continue
+
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+async def request_body(header: bytes, lines: List[bytes], chunk_size: int = 1000) -> AsyncIterator[bytes]:
+    """Stream a VCF to the Allele Registry in chunks instead of joining all lines into one string."""
+    yield header
+    for i in range(0, len(lines), chunk_size):
+        yield b"".join(lines[i : i + chunk_size])
+
+
+def format_caid_line(line: str) -> Optional[str]:
+    """Convert a line of an annotated VCF to a TSV line with locus, alleles, and CAID columns."""
+    if not line or line.startswith("#"):
+        return None
+
+    [contig, pos, caid, ref, alt, *_] = line.split("\t")
+    return "\t".join([f"{contig}:{pos}", json.dumps([ref, alt]), caid]) + "\n"
+
+
+def get_retry_after(e: Exception) -> Optional[float]:
+    if isinstance(e, aiohttp.ClientResponseError) and e.headers:
+        try:
+            return float(e.headers.get("Retry-After", ""))
+        except ValueError:
+            return None
+    return None
+
+
 T = TypeVar("T")
 
 
-async def retry_transient_errors(f: Callable[..., Awaitable[T]], max_attempts: int = 3) -> T:
-    delay = 0.1
-    errors = 0
+async def retry_transient_errors(
+    f: Callable[[], Awaitable[T]], limiter: AdaptiveConcurrencyLimiter, max_attempts: int = 5
+) -> T:
+    """
+    Call `f` with a request slot from `limiter`, retrying transient errors with exponential backoff.
+
+    Honors Retry-After headers on 429 and 503 responses.
+    """
+    delay = 1.0
+    attempts = 0
     while True:
+        await limiter.acquire()
+        start = time.monotonic()
         try:
-            return await f()
+            result = await f()
         except Exception as e:
-            if not is_transient_error(e):
-                raise
-            errors += 1
-            if errors >= max_attempts:
-                raise
-
-        delay = await sleep_and_backoff(delay)
+            limiter.release(overloaded=is_overload_error(e))
 
+            attempts += 1
+            if not is_transient_error(e) or attempts >= max_attempts:
+                raise
 
-async def get_caids(sharded_vcf_url: str, output_url: str, *, parallelism: int = 4, request_timeout: int = 10,) -> None:
+            retry_after = get_retry_after(e)
+            logger.warning("Retrying after error (attempt %d of %d): %s", attempts, max_attempts, e)
+            await asyncio.sleep(retry_after if retry_after is not None else delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, 60.0)
+        except BaseException:
+            # Release the slot if the request is cancelled
+            limiter.release()
+            raise
+        else:
+            limiter.release(latency=time.monotonic() - start)
+            return result
+
+
+async def annotate_batch(
+    session: aiohttp.ClientSession,
+    limiter: AdaptiveConcurrencyLimiter,
+    allele_registry_url: str,
+    assembly: str,
+    header: bytes,
+    lines: List[bytes],
+    max_attempts: int = 5,
+) -> List[str]:
+    """Get CAIDs for a batch of VCF lines from the Allele Registry."""
+
+    async def post():
+        async with session.post(
+            allele_registry_url,
+            params={"assembly": assembly, "ids": "CA"},
+            data=request_body(header, lines),
+            raise_for_status=True,
+        ) as response:
+            output_lines = []
+            async for line in response.content:
+                output_line = format_caid_line(line.decode("utf-8").rstrip("\r\n"))
+                if output_line:
+                    output_lines.append(output_line)
+            return output_lines
+
+    return await retry_transient_errors(post, limiter, max_attempts=max_attempts)
+
+
+async def write_lines(fs: RouterAsyncFS, url: str, lines: Iterable[str]) -> None:
+    """Write lines to a file, buffering them into large writes."""
+    async with await fs.create(url) as output_stream:
+        buffer = []
+        buffer_size = 0
+        for line in lines:
+            buffer.append(line)
+            buffer_size += len(line)
+            if buffer_size >= WRITE_BUFFER_SIZE:
+                await output_stream.write("".join(buffer).encode("utf-8"))
+                buffer = []
+                buffer_size = 0
+
+        if buffer:
+            await output_stream.write("".join(buffer).encode("utf-8"))
+
+
+async def get_caids(
+    sharded_vcf_url: str,
+    output_url: str,
+    *,
+    max_parallelism: int = 64,
+    initial_parallelism: int = 4,
+    batch_size: int = 10_000,
+    target_latency: int = 120,
+    request_timeout: int = 10,
+    max_attempts: int = 5,
+    allele_registry_url: str = ALLELE_REGISTRY_URL,
+) -> None:
     """
     Download ClinGen Canonical Allele IDs for variants in the specified VCF.
 
     TSV files containing CAIDs will be written to the directory/prefix specified by `output_url`.
     One file will be written per partition in the sharded VCF.
 
+    Partitions are streamed and split into batches of at most `batch_size` variants. The number of concurrent
+    requests starts at `initial_parallelism` and adapts to the Allele Registry's response times and errors.
+
     :param sharded_vcf_url: URL to a VCF exported with `hl.export_vcf(table, path, parallel='separate_header')`.
     :param output_url: URL to a directory/prefix where output files will be written.
-    :param parallelism: Parallelism to use for processing parts.
+    :param max_parallelism: Maximum number of concurrent requests to the Allele Registry.
+    :param initial_parallelism: Number of concurrent requests to start with.
+    :param batch_size: Maximum number of variants to send in one request.
+    :param target_latency: Request time (in seconds) above which concurrency will be reduced.
     :param request_timeout: Timeout (in minutes) for requests to ClinGen Allele Registry.
+    :param max_attempts: Number of attempts for each request.
+    :param allele_registry_url: URL of the Allele Registry's annotateVcf endpoint.
     """
     # Remove trailing slashes to avoid issues constructing URLs.
     sharded_vcf_url = sharded_vcf_url.rstrip("/")
     output_url = output_url.rstrip("/")
 
-    with ThreadPoolExecutor() as thread_pool:
-        async with RouterAsyncFS(
-            "file", [LocalAsyncFS(thread_pool), GoogleStorageAsyncFS()]
-        ) as fs, aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=request_timeout * 60)) as session:
-            # The ClinGen Allele Registry API does not accept VCFs with contigs other than 1-22, X, Y, and M.
-            # Remove other contigs from the VCF header.
-            header_url = f"{sharded_vcf_url}/header"
-            if sharded_vcf_url.endswith(".gz"):
-                header_url += ".gz"
-            header_stream = await fs.open(header_url)
-            header_data = await header_stream.read()
-            if header_url.endswith(".gz"):
-                header_data = gzip.decompress(header_data)
-            header = header_data.decode("utf-8")
-            header = filter_vcf_header(header)
-
-            assembly = "GRCh37" if "assembly=GRCh37" in header else "GRCh38"
-
-            # Get list of VCF partitions.
-            all_part_urls = [
-                await f.url() async for f in await fs.listfiles(sharded_vcf_url) if f.name().startswith("part-")
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=initial_parallelism, max_limit=max_parallelism, target_latency=target_latency
+    )
+
+    async with RouterAsyncFS() as fs, aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=request_timeout * 60)
+    ) as session:
+        # The ClinGen Allele Registry API does not accept VCFs with contigs other than 1-22, X, Y, and M.
+        # Remove other contigs from the VCF header.
+        header_url = f"{sharded_vcf_url}/header"
+        if is_gzipped(sharded_vcf_url):
+            header_url += "." + sharded_vcf_url.split(".")[-1]
+        header = b"".join([line async for line in iter_lines(fs, header_url)]).decode("utf-8")
+        header = filter_vcf_header(header)
+
+        assembly = "GRCh37" if "assembly=GRCh37" in header else "GRCh38"
+        header_data = (header + "\n").encode("utf-8")
+
+        # Get list of VCF partitions.
+        all_part_urls = [
+            await f.url() async for f in await fs.listfiles(sharded_vcf_url) if f.basename().startswith("part-")
+        ]
+
+        # Get list of parts in output.
+        try:
+            completed_part_urls = [
+                await f.url() async for f in await fs.listfiles(output_url) if f.basename().startswith("part-")
             ]
+        except FileNotFoundError:
+            completed_part_urls = []
+
+        completed_parts = set([part_url.split("/")[-1].split(".")[0] for part_url in completed_part_urls])
+
+        # Identify parts that are not present in output.
+        # This allows resuming after an error occurs without losing/repeating partitions.
+        remaining_part_urls = []
+        for part_url in all_part_urls:
+            part_name = part_url.split("/")[-1].split(".")[0]
+            if part_name not in completed_parts:
+                remaining_part_urls.append(part_url)
+
+        # Limit the number of batches held in memory while waiting for a request slot.
+        pending_batches = asyncio.Semaphore(2 * max_parallelism)
 
-            # Get list of parts in output.
+        async def annotate_pending_batch(batch):
             try:
-                completed_part_urls = [
-                    await f.url() async for f in await fs.listfiles(output_url) if f.name().startswith("part-")
-                ]
-            except FileNotFoundError:
-                completed_part_urls = []
-
-            completed_parts = set([part_url.split("/")[-1].split(".")[0] for part_url in completed_part_urls])
-
-            # Identify parts that are not present in output.
-            # This allows resuming after an error occurs without losing/repeating partitions.
-            remaining_part_urls = []
-            for part_url in all_part_urls:
-                part_name = part_url.split("/")[-1].split(".")[0]
-                if part_name not in completed_parts:
-                    remaining_part_urls.append(part_url)
-
-            with tqdm(total=len(remaining_part_urls)) as progress:
-
-                def create_task(part_url):
-                    async def task():
-                        # Read VCF partition and prepend header.
-                        part_stream = await fs.open(part_url)
-                        part_data = await part_stream.read()
-                        if part_url.endswith(".gz"):
-                            part_data = gzip.decompress(part_data)
-                        part_data = part_data.decode("utf-8")
-                        part_vcf = header + "\n" + part_data
-
-                        # Send request to ClinGen Allele Registry.
-                        try:
-                            response = await retry_transient_errors(
-                                lambda: session.post(
-                                    "https://reg.clinicalgenome.org/annotateVcf",
-                                    params={"assembly": assembly, "ids": "CA"},
-                                    data=part_vcf,
-                                )
-                            )
-                        except asyncio.TimeoutError:
-                            logger.error("Request for %s timed out", part_url)
-                        except Exception:
-                            logger.exception("Failed to fetch CAIDS for %s", part_url)
-                        else:
-                            annotated_part_vcf = await response.text()
-
-                            # Convert response from VCF to a TSV with locus, alleles, CAID columns.
-                            part_name = part_url.split("/")[-1].split(".")[0]
-                            async with await fs.create(f"{output_url}/{part_name}.tsv") as output_stream:
-                                header_line = "\t".join(["locus", "alleles", "CAID"]) + "\n"
-                                await output_stream.write(header_line.encode("utf-8"))
-
-                                for line in annotated_part_vcf.splitlines():
-                                    if line.startswith("#"):
-                                        continue
-
-                                    [contig, pos, caid, ref, alt, *_] = line.split("\t")
-                                    locus = f"{contig}:{pos}"
-                                    alleles = [ref, alt]
-
-                                    output_line = "\t".join([locus, json.dumps(alleles), caid]) + "\n"
-                                    await output_stream.write(output_line.encode("utf-8"))
-                        finally:
-                            # Update progress bar.
-                            progress.update(1)
-
-                    return task
-
-                # Process partitions in parallel.
-                tasks = [create_task(part_url) for part_url in remaining_part_urls]
-                await bounded_gather(*tasks, parallelism=parallelism)
+                return await annotate_batch(
+                    session, limiter, allele_registry_url, assembly, header_data, batch, max_attempts=max_attempts
+                )
+            finally:
+                pending_batches.release()
+
+        with tqdm(total=len(remaining_part_urls)) as progress:
+
+            def create_task(part_url):
+                async def task():
+                    batch_tasks = []
+                    try:
+                        # Stream VCF partition and send batches of variants to ClinGen Allele Registry.
+                        async for batch in iter_batches(iter_lines(fs, part_url), batch_size):
+                            await pending_batches.acquire()
+                            batch_tasks.append(asyncio.ensure_future(annotate_pending_batch(batch)))
+
+                        batch_results = await asyncio.gather(*batch_tasks)
+                    except Exception:
+                        for batch_task in batch_tasks:
+                            batch_task.cancel()
+                        logger.exception("Failed to fetch CAIDS for %s", part_url)
+                    else:
+                        # Write a TSV with locus, alleles, CAID columns.
+                        # Output is only written once all batches succeed, so that incomplete parts are retried.
+                        part_name = part_url.split("/")[-1].split(".")[0]
+                        header_line = "\t".join(["locus", "alleles", "CAID"]) + "\n"
+                        await write_lines(
+                            fs,
+                            f"{output_url}/{part_name}.tsv",
+                            [header_line, *(line for lines in batch_results for line in lines)],
+                        )
+                    finally:
+                        # Update progress bar.
+                        progress.update(1)
+
+                return task
+
+            # Process partitions in parallel. Requests for each partition's batches share the adaptive limit.
+            tasks = [create_task(part_url) for part_url in remaining_part_urls]
+            await bounded_gather(*tasks, parallelism=max_parallelism)
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("vcf_url")
     parser.add_argument("output_url")
-    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--max-parallelism", type=int, default=64)
+    parser.add_argument("--initial-parallelism", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--target-latency", type=int, default=120)
     parser.add_argument("--request-timeout", type=int, default=10)
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--allele-registry-url", default=ALLELE_REGISTRY_URL)
     args = parser.parse_args()
 
-    return asyncio.get_event_loop().run_until_complete(
-        get_caids(args.vcf_url, args.output_url, parallelism=args.parallelism, request_timeout=args.request_timeout,)
+    return asyncio.run(
+        get_caids(
+            args.vcf_url,
+            args.output_url,
+            max_parallelism=args.max_parallelism,
+            initial_parallelism=args.initial_parallelism,
+            batch_size=args.batch_size,
+            target_latency=args.target_latency,
+            request_timeout=args.request_timeout,
+            max_attempts=args.max_attempts,
+            allele_registry_url=args.allele_registry_url,
+        )
     )
 
 
@@ -1,17 +1,39 @@
 """Import CAIDs created by `get_caids.py` into a Hail Table."""
 
 import argparse
+from typing import Optional
 
 import hail as hl
 
 
-def import_caids(caids_url: str, output_url: str, reference_genome: str = "GRCh38") -> None:
+def merge_caids(caids: hl.Table, caid_cache_url: str) -> hl.Table:
+    """
+    Merge newly fetched CAIDs into the CAID cache.
+
+    CAIDs fetched in this run take precedence over cached values.
+
+    :param caids: Hail Table of CAIDs keyed by locus and alleles.
+    :param caid_cache_url: URL of a Hail Table of CAIDs created by a previous run of `import_caids.py`.
+    """
+    cache = hl.read_table(caid_cache_url)
+    ds = caids.join(cache.select(cached_caid=cache.caid), how="outer")
+    ds = ds.select(caid=hl.or_else(ds.caid, ds.cached_caid))
+    return ds
+
+
+def import_caids(
+    caids_url: str, output_url: str, reference_genome: str = "GRCh38", caid_cache_url: Optional[str] = None
+) -> None:
     """
     Import CAIDs created by `get_caids.py` into a Hail Table.
 
     :param caids_url: URL of directory/prefix where CAID files are located.
     :param output_url: URL for output Hail Table.
+    :param caid_cache_url: URL of a Hail Table of CAIDs from a previous run to merge new CAIDs into.
     """
+    if caid_cache_url and caid_cache_url.rstrip("/") == output_url.rstrip("/"):
+        raise ValueError("Output URL must be different from CAID cache URL")
+
     caids_url = caids_url.rstrip("/")
     ds = hl.import_table(
         f"{caids_url}/part-*.tsv",
@@ -21,6 +43,9 @@ def import_caids(caids_url: str, output_url: str, reference_genome: str = "GRCh3
     )
     ds = ds.rename({"CAID": "caid"})
 
+    if caid_cache_url:
+        ds = merge_caids(ds, caid_cache_url)
+
     ds.write(output_url, overwrite=True)
 
 
@@ -29,11 +54,12 @@ def main():
     parser.add_argument("caids_url")
     parser.add_argument("output_url")
     parser.add_argument("--reference-genome", choices=("GRCh37", "GRCh38"), default="GRCh38")
+    parser.add_argument("--caid-cache-url", help="Merge CAIDs into this table of CAIDs from a previous run")
     args = parser.parse_args()
 
     hl.init()
 
-    import_caids(args.caids_url, args.output_url, args.reference_genome)
+    import_caids(args.caids_url, args.output_url, args.reference_genome, caid_cache_url=args.caid_cache_url)
 
 
 if __name__ == "__main__":
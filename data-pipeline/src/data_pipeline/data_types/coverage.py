@@ -1,7 +1,28 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence
 import hail as hl
 
 from data_pipeline.data_types.locus import x_position
+from data_pipeline.pipeline import checkpoint
+
+COVERAGE_METRICS = [
+    "mean",
+    "median",
+    "over_1",
+    "over_5",
+    "over_10",
+    "over_15",
+    "over_20",
+    "over_25",
+    "over_30",
+    "over_50",
+    "over_100",
+]
+
+# Decimal places that metrics are rounded to before run-length encoding coverage. Unrounded means rarely repeat
+# between adjacent bases. The browser displays over_x fractions rounded to 2 decimal places.
+COVERAGE_RUN_PRECISION = {"mean": 1, "median": 1, **{metric: 2 for metric in COVERAGE_METRICS[2:]}}
+
+COVERAGE_BIN_SIZES = [10, 100, 1_000]
 
 
 def prepare_coverage(coverage_path: str, filter_intervals: Optional[List[str]] = None):
@@ -21,23 +42,129 @@ def prepare_coverage(coverage_path: str, filter_intervals: Optional[List[str]] =
         coverage = coverage.annotate(median=coverage.median_approx)
 
     # Drop extra fields in v3
-    coverage = coverage.select(
-        "xpos",
-        "mean",
-        "median",
-        "over_1",
-        "over_5",
-        "over_10",
-        "over_15",
-        "over_20",
-        "over_25",
-        "over_30",
-        "over_50",
-        "over_100",
-    )
+    coverage = coverage.select("xpos", *COVERAGE_METRICS)
 
     if filter_intervals:
         intervals = [hl.parse_locus_interval(interval, reference_genome="GRCh38") for interval in filter_intervals]
         coverage = hl.filter_intervals(coverage, intervals)
 
     return coverage
+
+
+def _round(value: hl.expr.NumericExpression, decimal_places: int) -> hl.expr.NumericExpression:
+    if value.dtype not in (hl.tfloat32, hl.tfloat64):
+        return value
+
+    return hl.floor(value * 10**decimal_places + 0.5) / 10**decimal_places
+
+
+def run_length_encode_coverage(coverage: hl.Table, precision: Optional[Dict[str, int]] = None) -> hl.Table:
+    """
+    Combine consecutive bases with identical coverage metrics into one row per run of bases.
+
+    Args:
+        coverage: per base coverage table, as returned by prepare_coverage
+        precision: number of decimal places to round each metric to before comparing bases
+
+    Return:
+        table keyed by the first locus of each run, with the run's end position, xpos, xend, and metrics
+    """
+    if precision is None:
+        precision = {}
+
+    coverage = coverage.select(
+        **{
+            metric: _round(coverage[metric], precision[metric]) if metric in precision else coverage[metric]
+            for metric in COVERAGE_METRICS
+        }
+    )
+
+    previous_base = hl.scan._prev_nonnull(coverage.row)  # pylint: disable=protected-access
+    coverage = coverage.annotate(
+        is_run_start=hl.coalesce(
+            (previous_base.locus.contig_idx != coverage.locus.contig_idx)
+            | (previous_base.locus.position + 1 != coverage.locus.position)
+            | (previous_base.drop("locus") != coverage.row_value),
+            True,
+        )
+    )
+    previous_run_start = hl.scan._prev_nonnull(  # pylint: disable=protected-access
+        hl.or_missing(coverage.is_run_start, coverage.locus)
+    )
+    coverage = coverage.annotate(run_start=hl.if_else(coverage.is_run_start, coverage.locus, previous_run_start))
+
+    # run_start increases with locus, so keying by it does not shuffle rows. Grouping by a table's key aggregates
+    # rows within partitions.
+    coverage = coverage.key_by("run_start")
+    runs = coverage.group_by(coverage.run_start).aggregate(
+        end=hl.agg.max(coverage.locus.position),
+        **{metric: hl.agg.take(coverage[metric], 1)[0] for metric in COVERAGE_METRICS},
+    )
+    runs = runs.rename({"run_start": "locus"})
+
+    return runs.select(
+        "end",
+        xpos=x_position(runs.locus),
+        xend=x_position(runs.locus, runs.end),
+        **{metric: runs[metric] for metric in COVERAGE_METRICS},
+    )
+
+
+def _weighted_mean(value: hl.expr.Float64Expression, weight: hl.expr.Int64Expression) -> hl.expr.Float64Expression:
+    return hl.agg.sum(value * weight) / hl.agg.sum(hl.or_missing(hl.is_defined(value), weight))
+
+
+def bin_coverage(coverage: hl.Table, bin_sizes: Sequence[int] = tuple(COVERAGE_BIN_SIZES)) -> hl.Table:
+    """
+    Compute mean coverage metrics over fixed size bins at multiple resolutions.
+
+    Each resolution is computed from the previous one, so each bin size must be a multiple of the previous size.
+
+    Args:
+        coverage: per base coverage table, as returned by prepare_coverage
+        bin_sizes: bin sizes in bases
+
+    Return:
+        table keyed by bin size and the first locus of each bin, with the number of bases with coverage
+        in each bin and their mean metrics
+    """
+    bins = coverage.select(n_bases=1, **{metric: hl.float64(coverage[metric]) for metric in COVERAGE_METRICS})
+
+    levels = []
+    previous_bin_size = 1
+    for bin_size in sorted(bin_sizes):
+        if bin_size % previous_bin_size != 0:
+            raise ValueError(f"Bin size {bin_size} is not a multiple of bin size {previous_bin_size}")
+
+        # Like run starts, bin starts increase with locus and grouping by them does not shuffle rows
+        bins = bins.annotate(
+            bin_start=hl.locus(
+                bins.locus.contig,
+                (bins.locus.position - 1) // bin_size * bin_size + 1,
+                reference_genome=bins.locus.dtype.reference_genome,
+            )
+        )
+        bins = bins.key_by("bin_start")
+        bins = bins.group_by(bins.bin_start).aggregate(
+            n_bases=hl.agg.sum(bins.n_bases),
+            **{metric: _weighted_mean(bins[metric], bins.n_bases) for metric in COVERAGE_METRICS},
+        )
+        bins = checkpoint(bins.rename({"bin_start": "locus"}), f"coverage_bins_{bin_size}")
+
+        levels.append(bins.annotate(bin_size=bin_size).key_by("bin_size", "locus"))
+        previous_bin_size = bin_size
+
+    bins = levels[0].union(*levels[1:])
+    bins = bins.annotate(xpos=x_position(bins.locus))
+    return bins.annotate(
+        document_id=hl.str(bins.bin_size) + "-" + hl.str(bins.xpos),
+        xend=bins.xpos + bins.bin_size - 1,
+    )
+
+
+def prepare_coverage_runs(coverage_path: str, precision: Optional[Dict[str, int]] = None) -> hl.Table:
+    return run_length_encode_coverage(hl.read_table(coverage_path), precision=precision)
+
+
+def prepare_coverage_bins(coverage_path: str, bin_sizes: Sequence[int] = tuple(COVERAGE_BIN_SIZES)) -> hl.Table:
+    return bin_coverage(hl.read_table(coverage_path), bin_sizes=bin_sizes)
@@ -41,7 +41,7 @@ def get_exons(gencode):
         transcript_version=exons.transcript_id.split("\\.")[1],
         gene_id=exons.gene_id.split("\\.")[0],
         gene_version=exons.gene_id.split("\\.")[1],
-        chrom=normalized_contig(exons.interval.start.contig),
+        chrom=normalized_contig(exons.interval.start),
         strand=exons.strand,
         start=exons.interval.start.position,
         stop=exons.interval.end.position,
@@ -66,7 +66,7 @@ def get_genes(gencode):
         gene_id=genes.gene_id.split("\\.")[0],
         gene_version=genes.gene_id.split("\\.")[1],
         gencode_symbol=genes.gene_name,
-        chrom=normalized_contig(genes.interval.start.contig),
+        chrom=normalized_contig(genes.interval.start),
         strand=genes.strand,
         start=genes.interval.start.position,
         stop=genes.interval.end.position,
@@ -132,7 +132,7 @@ def get_transcripts(gencode):
         transcript_version=transcripts.transcript_id.split("\\.")[1],
         gene_id=transcripts.gene_id.split("\\.")[0],
         gene_version=transcripts.gene_id.split("\\.")[1],
-        chrom=normalized_contig(transcripts.interval.start.contig),
+        chrom=normalized_contig(transcripts.interval.start),
         strand=transcripts.strand,
         start=transcripts.interval.start.position,
         stop=transcripts.interval.end.position,
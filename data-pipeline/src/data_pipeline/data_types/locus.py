@@ -1,18 +1,72 @@
+from typing import Optional, Union
+
 import hail as hl
 
+# Numbers used to compute xpos for each contig, with and without the "chr" prefix used in GRCh38.
+CONTIG_NUMBERS = {**{str(n): n for n in range(1, 23)}, "X": 23, "Y": 24, "M": 25, "MT": 25}
+CONTIG_NUMBERS.update({f"chr{contig}": number for contig, number in list(CONTIG_NUMBERS.items())})
+
+NORMALIZED_CONTIGS = {
+    contig: "M" if contig in ("MT", "chrM", "chrMT") else contig.replace("chr", "") for contig in CONTIG_NUMBERS
+}
+
+ContigExpression = Union[hl.expr.StringExpression, hl.expr.LocusExpression]
+
+
+def _contig_lookup(contig: ContigExpression, values: dict, dtype: hl.HailType, default) -> hl.expr.Expression:
+    """
+    Look up a precomputed value for a contig, falling back to default(contig) for contigs not in values.
+
+    For loci, values are looked up by the contig's index in the locus' reference genome instead of by name.
+    """
+    if isinstance(contig, hl.expr.LocusExpression):
+        reference_genome = contig.dtype.reference_genome
+        values_by_contig_index = hl.literal([values.get(c) for c in reference_genome.contigs], hl.tarray(dtype))
+        return hl.coalesce(values_by_contig_index[contig.contig_idx], default(contig.contig))
+
+    return hl.coalesce(hl.literal(values, hl.tdict(hl.tstr, dtype)).get(contig), default(contig))
+
 
-def normalized_contig(contig: hl.expr.StringExpression) -> hl.expr.StringExpression:
+def _normalized_contig(contig: hl.expr.StringExpression) -> hl.expr.StringExpression:
     return hl.rbind(hl.str(contig).replace("^chr", ""), lambda c: hl.if_else(c == "MT", "M", c))
 
 
-def contig_number(contig: hl.expr.StringExpression) -> hl.expr.Int32Expression:
-    return hl.bind(
-        lambda contig: (
-            hl.case().when(contig == "X", 23).when(contig == "Y", 24).when(contig == "M", 25).default(hl.int(contig))
-        ),
-        normalized_contig(contig),
-    )
+def normalized_contig(contig: ContigExpression) -> hl.expr.StringExpression:
+    """
+    Contig name without the "chr" prefix and with the mitochondrial contig named "M".
+
+    Args:
+        contig: contig name or locus
+    """
+    return _contig_lookup(contig, NORMALIZED_CONTIGS, hl.tstr, _normalized_contig)
+
+
+def contig_number(contig: ContigExpression) -> hl.expr.Int32Expression:
+    """
+    Args:
+        contig: contig name or locus
+    """
+    return _contig_lookup(contig, CONTIG_NUMBERS, hl.tint32, lambda c: hl.int(_normalized_contig(c)))
+
+
+def x_position(
+    locus_or_contig: ContigExpression, position: Optional[hl.expr.Int32Expression] = None
+) -> hl.expr.Int64Expression:
+    """
+    Expression for computing xpos, which orders positions across contigs.
+
+    Args:
+        locus_or_contig: locus or contig name
+        position: position on contig, required when locus_or_contig is a contig name and otherwise defaults
+            to the locus' position
+
+    Return:
+        int64: contig number * 10^9 + position
+    """
+    if position is None:
+        if not isinstance(locus_or_contig, hl.expr.LocusExpression):
+            raise ValueError("position is required when computing xpos from a contig name")
 
+        position = locus_or_contig.position
 
-def x_position(locus: hl.expr.LocusExpression) -> hl.expr.Int64Expression:
-    return hl.int64(contig_number(locus.contig)) * 1_000_000_000 + locus.position
+    return hl.int64(contig_number(locus_or_contig)) * 1_000_000_000 + position
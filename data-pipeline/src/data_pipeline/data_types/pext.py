@@ -1,10 +1,4 @@
-import csv
-import os
-import subprocess
-from collections import namedtuple
-
 import hail as hl
-from tqdm import tqdm
 
 
 TISSUE_NAME_MAP = {
@@ -66,25 +60,9 @@ TISSUE_NAME_MAP = {
 TISSUE_FIELDS = list(TISSUE_NAME_MAP.values())
 
 
-Row = namedtuple("Row", ["gene", "chrom", "pos", "tissues"])
-Region = namedtuple("Region", ["gene", "chrom", "start", "stop", "tissues"])
-
-
-def read_bases_tsv(filename):
-    with open(filename) as bases_file:
-        reader = csv.reader(bases_file, delimiter="\t")
-        header_row = next(reader, None)
-        tissue_names = header_row[3:]
-        for row in reader:
-            tissues = dict(zip(tissue_names, [float(v) for v in row[3:]]))
-            yield Row(gene=row[0], chrom=row[1], pos=int(row[2]), tissues=tissues)
-
-
 def prepare_base_level_pext(base_level_pext_path):
-    tmp_dir = os.path.expanduser("~")
-
     #
-    # Step 1: rename fields, extract chrom/pos from locus, convert missing values to 0, export to TSV
+    # Step 1: rename fields, extract chrom/pos from locus, convert missing values to 0
     #
     ds = hl.read_table(base_level_pext_path)
 
@@ -96,70 +74,55 @@ def prepare_base_level_pext(base_level_pext_path):
         mean=hl.if_else(
             hl.is_missing(ds.mean_proportion) | hl.is_nan(ds.mean_proportion), hl.float(0), ds.mean_proportion
         ),
-        **{
-            renamed: hl.if_else(hl.is_missing(ds[original]) | hl.is_nan(ds[original]), hl.float(0), ds[original])
-            for original, renamed in TISSUE_NAME_MAP.items()
-        }
+        tissues=hl.struct(
+            **{
+                renamed: hl.if_else(hl.is_missing(ds[original]) | hl.is_nan(ds[original]), hl.float(0), ds[original])
+                for original, renamed in TISSUE_NAME_MAP.items()
+            }
+        ),
     )
 
-    ds = ds.order_by(ds.gene_id, hl.asc(ds.pos)).drop("locus")
-    ds.export("file://" + os.path.join(tmp_dir, "bases.tsv"))
+    ds = ds.key_by("gene_id", "pos").drop("locus")
 
     #
-    # Step 2: Collect base-level data into regions
+    # Step 2: Collect base-level data into regions of adjacent bases with the same values
     #
-    with open(os.path.join(tmp_dir, "regions.tsv"), "w") as output_file:
-        writer = csv.writer(output_file, delimiter="\t")
-        writer.writerow(["gene_id", "chrom", "start", "stop", "mean"] + TISSUE_FIELDS)
-
-        def output_region(region):
-            writer.writerow(
-                [region.gene, region.chrom, region.start, region.stop, region.tissues["mean"]]
-                + [region.tissues[t] for t in TISSUE_FIELDS]
-            )
-
-        rows = read_bases_tsv(os.path.join(tmp_dir, "bases.tsv"))
-        first_row = next(rows)
-        current_region = Region(
-            gene=first_row.gene, chrom=first_row.chrom, start=first_row.pos, stop=None, tissues=first_row.tissues
+    previous_base = hl.scan._prev_nonnull(ds.row)  # pylint: disable=protected-access
+    ds = ds.annotate(
+        is_region_start=hl.coalesce(
+            (previous_base.gene_id != ds.gene_id)
+            | (previous_base.chrom != ds.chrom)
+            | (ds.pos > previous_base.pos + 1)
+            | (previous_base.mean != ds.mean)
+            | (previous_base.tissues != ds.tissues),
+            True,
         )
-        last_pos = first_row.pos
-
-        for row in tqdm(rows):
-            if (
-                row.gene != current_region.gene
-                or row.chrom != current_region.chrom
-                or row.pos > (last_pos + 1)
-                or any(row.tissues[t] != current_region.tissues[t] for t in row.tissues)
-            ):
-                output_region(current_region._replace(stop=last_pos))
-                current_region = Region(gene=row.gene, chrom=row.chrom, start=row.pos, stop=None, tissues=row.tissues)
-
-            last_pos = row.pos
-
-        output_region(current_region._replace(stop=last_pos))
-
-    # Copy regions file to HDFS
-    subprocess.run(
-        ["hdfs", "dfs", "-cp", "file://" + os.path.join(tmp_dir, "regions.tsv"), os.path.join("/tmp/regions.tsv")],
-        check=True,
+    )
+    previous_region_start = hl.scan._prev_nonnull(  # pylint: disable=protected-access
+        hl.or_missing(ds.is_region_start, ds.pos)
+    )
+    ds = ds.annotate(start=hl.if_else(ds.is_region_start, ds.pos, previous_region_start))
+
+    # Region starts increase with position within each gene, so keying by them does not shuffle rows.
+    # Grouping by a table's key aggregates rows within partitions.
+    ds = ds.key_by("gene_id", "start")
+    ds = ds.group_by(ds.gene_id, ds.start).aggregate(
+        chrom=hl.agg.take(ds.chrom, 1)[0],
+        stop=hl.agg.max(ds.pos),
+        mean=hl.agg.take(ds.mean, 1)[0],
+        tissues=hl.agg.take(ds.tissues, 1)[0],
     )
 
     #
-    # Step 3: Convert regions to a Hail table.
+    # Step 3: Collect regions for each gene
     #
-    types = {t: hl.tfloat for t in TISSUE_FIELDS}
-    types["gene_id"] = hl.tstr
-    types["chrom"] = hl.tstr
-    types["start"] = hl.tint
-    types["stop"] = hl.tint
-    types["mean"] = hl.tfloat
-
-    ds = hl.import_table("/tmp/regions.tsv", min_partitions=100, missing="", types=types)
-
-    ds = ds.select("gene_id", "chrom", "start", "stop", "mean", tissues=hl.struct(**{t: ds[t] for t in TISSUE_FIELDS}))
-
-    ds = ds.group_by("gene_id").aggregate(regions=hl.agg.collect(ds.row_value.drop("gene_id")))
+    ds = ds.key_by("gene_id")
+    ds = ds.group_by("gene_id").aggregate(
+        regions=hl.sorted(
+            hl.agg.collect(ds.row.select("chrom", "start", "stop", "mean", "tissues")),
+            key=lambda region: region.start,
+        )
+    )
 
     return ds
 
@@ -0,0 +1,52 @@
+from typing import Mapping, Optional
+
+import hail as hl
+
+from data_pipeline.pipeline import checkpoint
+
+
+def annotate_colocated_variants(
+    ds: hl.Table,
+    subsets: Optional[Mapping[str, hl.expr.Expression]] = None,
+    checkpoint_name: Optional[str] = None,
+) -> hl.Table:
+    """
+    Annotate each variant with the IDs of other variants at the same locus.
+
+    The table must be keyed by locus and alleles and have a variant_id field. Since variants are already sorted
+    by locus, variants at each locus are collected from consecutive rows instead of shuffling the table with a
+    group_by. Hail only moves rows for a locus that spans a partition boundary into one partition. The result
+    is then joined back on the locus prefix of the key, which is also done without a shuffle.
+
+    Args:
+        subsets: (optional) subset name -> boolean expression for whether a variant is in that subset. If given,
+            colocated_variants is a struct with a list of variant IDs in each subset. Otherwise, it is a list
+            of all colocated variant IDs.
+        checkpoint_name: (optional) name for checkpointing variants grouped by locus
+
+    Return:
+        table with a colocated_variants field
+    """
+    variants_by_locus = ds.select(ds.variant_id, **({"subsets": hl.struct(**subsets)} if subsets is not None else {}))
+    variants_by_locus = variants_by_locus.key_by("locus").drop("alleles")
+    variants_by_locus = variants_by_locus.collect_by_key("variants")
+
+    if checkpoint_name:
+        variants_by_locus = checkpoint(variants_by_locus, checkpoint_name)
+
+    variants_at_locus = variants_by_locus[ds.locus].variants
+    variants_at_locus = variants_at_locus.filter(lambda variant: variant.variant_id != ds.variant_id)
+
+    if subsets is None:
+        return ds.annotate(colocated_variants=variants_at_locus.map(lambda variant: variant.variant_id))
+
+    return ds.annotate(
+        colocated_variants=hl.struct(
+            **{
+                subset: variants_at_locus.filter(lambda variant, subset=subset: variant.subsets[subset]).map(
+                    lambda variant: variant.variant_id
+                )
+                for subset in subsets
+            }
+        )
+    )
@@ -1,3 +1,3 @@
-from .vep import consequence_term_rank
+from .vep import consequence_term_rank, decode_transcript_consequence
 
-__all__ = ["consequence_term_rank"]
+__all__ = ["consequence_term_rank", "decode_transcript_consequence"]
@@ -1,16 +1,98 @@
 import hail as hl
 
 from .hgvs import hgvsp_from_consequence_amino_acids
-from .vep import consequence_term_rank
+from .vep import consequence_term_code, encode_consequence_terms, most_severe_consequence_code
 
 
 OMIT_CONSEQUENCE_TERMS = hl.set(["upstream_gene_variant", "downstream_gene_variant"])
 
+# Lookup tables with more rows than this are joined to exploded consequences instead of being collected
+# and embedded in the query as a literal dict.
+MAX_LITERAL_LOOKUP_ROWS = 50_000
 
-def annotate_transcript_consequences(variants_path, transcripts_path, mane_transcripts_path=None):
+LOOKUP_METHODS = ("literal", "join")
+
+
+def _literal_lookup(table):
+    """
+    Collect a table keyed by one field into a dict literal mapping key to row value.
+    """
+    [key_field] = table.key
+    return hl.dict([(row[key_field], row.drop(key_field)) for row in table.collect()])
+
+
+def _annotate_consequences_with_joins(ds, transcript_consequences, lookups):
+    """
+    Annotate transcript consequences with values from tables without collecting the tables.
+
+    Consequences are exploded into one row per consequence, joined to each table, and regrouped by variant.
+    Only the joins to lookup tables shuffle consequences. Regrouped consequences are keyed like the variants
+    table, so joining them back to it does not.
+
+    Args:
+        lookups: dict of consequence field name to (table keyed by one field, name of consequence field to look up)
+
+    Return:
+        array of annotated consequences for each variant
+    """
+    consequences = ds.select(_consequence=hl.enumerate(transcript_consequences))
+    consequences = consequences.explode(consequences._consequence)
+    consequences = consequences.annotate(_index=consequences._consequence[0], _consequence=consequences._consequence[1])
+
+    for field, (table, lookup_field) in lookups.items():
+        consequences = consequences.annotate(
+            _consequence=consequences._consequence.annotate(**{field: table[consequences._consequence[lookup_field]]})
+        )
+
+    consequences = consequences.group_by(*consequences.key).aggregate(
+        transcript_consequences=hl.sorted(
+            hl.agg.collect((consequences._index, consequences._consequence)), key=lambda c: c[0]
+        ).map(lambda c: c[1])
+    )
+
+    annotated_consequences = consequences[ds.key].transcript_consequences
+    # Variants with no consequences have no rows after exploding
+    return hl.or_missing(
+        hl.is_defined(transcript_consequences),
+        hl.or_else(annotated_consequences, hl.empty_array(annotated_consequences.dtype.element_type)),
+    )
+
+
+def _annotate_consequences_with_lookups(ds, transcript_consequences, lookups, lookup_method=None):
+    """
+    Annotate transcript consequences with values from tables keyed by a consequence field.
+
+    Small tables are collected into literal dicts. Larger tables are joined to exploded consequences.
+
+    Args:
+        lookups: dict of consequence field name to (table keyed by one field, name of consequence field to look up)
+        lookup_method: "literal" or "join" to use the same method for all tables instead of choosing by table size
+    """
+    if lookup_method is not None and lookup_method not in LOOKUP_METHODS:
+        raise ValueError(f"Invalid lookup method '{lookup_method}', expected one of {', '.join(LOOKUP_METHODS)}")
+
+    join_lookups = {}
+    literal_lookups = {}
+    for field, (table, lookup_field) in lookups.items():
+        if lookup_method == "join" or (lookup_method is None and table.count() > MAX_LITERAL_LOOKUP_ROWS):
+            join_lookups[field] = (table, lookup_field)
+        else:
+            literal_lookups[field] = (_literal_lookup(table), lookup_field)
+
+    if join_lookups:
+        transcript_consequences = _annotate_consequences_with_joins(ds, transcript_consequences, join_lookups)
+
+    return transcript_consequences.map(
+        lambda csq: csq.annotate(
+            **{field: lookup.get(csq[lookup_field]) for field, (lookup, lookup_field) in literal_lookups.items()}
+        )
+    )
+
+
+def annotate_transcript_consequences(variants_path, transcripts_path, mane_transcripts_path=None, lookup_method=None):
     ds = hl.read_table(variants_path)
 
-    most_severe_consequence = ds.vep.most_severe_consequence
+    variant_most_severe_consequence_code = consequence_term_code(ds.vep.most_severe_consequence)
 
     transcript_consequences = ds.vep.transcript_consequences
 
@@ -24,10 +106,12 @@ def annotate_transcript_consequences(variants_path, transcripts_path, mane_trans
     ).filter(lambda c: c.consequence_terms.size() > 0)
 
     # Add/transmute derived fields
+    # Consequence terms are encoded as integers here and decoded to strings when exporting to Elasticsearch.
     transcript_consequences = transcript_consequences.map(
-        lambda c: c.annotate(major_consequence=hl.sorted(c.consequence_terms, key=consequence_term_rank)[0])
+        lambda c: c.annotate(consequence_term_mask=encode_consequence_terms(c.consequence_terms))
     ).map(
         lambda c: c.annotate(
+            major_consequence_code=most_severe_consequence_code(c.consequence_term_mask),
             domains=hl.set(c.domains.map(lambda domain: domain.db + ":" + domain.name).filter(hl.is_defined)),
             hgvsc=c.hgvsc.split(":")[-1],
             hgvsp=hgvsp_from_consequence_amino_acids(c),
@@ -37,7 +121,7 @@ def annotate_transcript_consequences(variants_path, transcripts_path, mane_trans
 
     consequences = [
         "biotype",
-        "consequence_terms",
+        "consequence_term_mask",
         "domains",
         "gene_id",
         "gene_symbol",
@@ -47,7 +131,7 @@ def annotate_transcript_consequences(variants_path, transcripts_path, mane_trans
         "lof_filter",
         "lof_flags",
         "lof",
-        "major_consequence",
+        "major_consequence_code",
         "transcript_id",
     ]
 
@@ -63,36 +147,33 @@ def annotate_transcript_consequences(variants_path, transcripts_path, mane_trans
     transcript_consequences = transcript_consequences.map(lambda c: c.select(*consequences))
 
     transcripts = hl.read_table(transcripts_path)
-
-    # TODO: This can potentially be improved by removing Table.collect
-    # See https://hail.zulipchat.com/#narrow/stream/123010-Hail-0.2E2.20support/topic/Optimize.20annotation.20with.20small.20dataset
-    # and https://github.com/Nealelab/ukb_common/blob/ad94d20f8c9f3b711e40a473425925775f0b1f30/utils/generic.py#L18
-    transcript_info = hl.dict(
-        [
-            (row.transcript_id, row.transcript_info)
-            for row in transcripts.select(
-                transcript_info=hl.struct(
-                    transcript_version=transcripts.transcript_version,
-                    gene_version=transcripts.gene.gene_version,
-                )
-            ).collect()
-        ]
+    transcripts = transcripts.select(
+        transcript_version=transcripts.transcript_version,
+        gene_version=transcripts.gene.gene_version,
     )
 
-    transcript_consequences = transcript_consequences.map(
-        lambda csq: csq.annotate(**transcript_info.get(csq.transcript_id))
-    )
+    lookups = {"_transcript_info": (transcripts, "transcript_id")}
 
     if mane_transcripts_path:
         mane_transcripts = hl.read_table(mane_transcripts_path)
         mane_transcripts_version = hl.eval(mane_transcripts.globals.version)
+        mane_transcripts = mane_transcripts.select_globals()
+
+        lookups["_mane_transcript"] = (mane_transcripts, "gene_id")
+
+    transcript_consequences = _annotate_consequences_with_lookups(
+        ds, transcript_consequences, lookups, lookup_method=lookup_method
+    )
 
-        mane_transcripts = hl.dict([(row.gene_id, row.drop("gene_id")) for row in mane_transcripts.collect()])
+    transcript_consequences = transcript_consequences.map(
+        lambda csq: csq.annotate(**csq._transcript_info).drop("_transcript_info")
+    )
 
+    if mane_transcripts_path:
         transcript_consequences = transcript_consequences.map(
             lambda csq: csq.annotate(
                 **hl.rbind(
-                    mane_transcripts.get(csq.gene_id),
+                    csq._mane_transcript,
                     lambda mane_transcript: (
                         hl.case()
                         .when(
@@ -124,14 +205,14 @@ def annotate_transcript_consequences(variants_path, transcripts_path, mane_trans
                         )
                     ),
                 )
-            )
+            ).drop("_mane_transcript")
         )
 
         transcript_consequences = hl.sorted(
             transcript_consequences,
             lambda c: (
                 hl.if_else(c.biotype == "protein_coding", 0, 1, missing_false=True),
-                hl.if_else(c.major_consequence == most_severe_consequence, 0, 1, missing_false=True),
+                hl.if_else(c.major_consequence_code == variant_most_severe_consequence_code, 0, 1, missing_false=True),
                 hl.if_else(c.is_mane_select, 0, 1, missing_false=True),
                 hl.if_else(c.is_canonical, 0, 1, missing_false=True),
             ),
@@ -145,7 +226,7 @@ def annotate_transcript_consequences(variants_path, transcripts_path, mane_trans
             transcript_consequences,
             lambda c: (
                 hl.if_else(c.biotype == "protein_coding", 0, 1, missing_false=True),
-                hl.if_else(c.major_consequence == most_severe_consequence, 0, 1, missing_false=True),
+                hl.if_else(c.major_consequence_code == variant_most_severe_consequence_code, 0, 1, missing_false=True),
                 hl.if_else(c.is_canonical, 0, 1, missing_false=True),
             ),
         )
@@ -43,6 +43,13 @@ CONSEQUENCE_TERMS = [
     "regulatory_region_variant",
     "feature_truncation",
     "intergenic_variant",
+    # Terms added to VEP after this list was ordered. These are ranked below all other terms, as they were before
+    # they were added to this list.
+    "splice_donor_5th_base_variant",  # new in v105
+    "splice_donor_region_variant",  # new in v105
+    "splice_polypyrimidine_tract_variant",  # new in v105
+    "coding_transcript_variant",
+    "sequence_variant",
 ]
 
 # hail DictExpression that maps each CONSEQUENCE_TERM to its rank in the list
@@ -51,3 +58,60 @@ CONSEQUENCE_TERM_RANK_LOOKUP = hl.dict({term: rank for rank, term in enumerate(C
 
 def consequence_term_rank(consequence_term):
     return CONSEQUENCE_TERM_RANK_LOOKUP.get(consequence_term)
+
+
+# Consequence terms are encoded as their rank, so the most severe of a set of terms has the lowest code.
+# Sets of terms are encoded as a bitmask with the bit for each term's code set.
+# Terms that are not in CONSEQUENCE_TERMS (for example, terms added in a newer version of VEP) are encoded
+# with a reserved code that ranks below all known terms and decodes to UNKNOWN_CONSEQUENCE_TERM.
+UNKNOWN_CONSEQUENCE_TERM = "unknown_consequence"
+UNKNOWN_CONSEQUENCE_TERM_CODE = len(CONSEQUENCE_TERMS)
+
+assert UNKNOWN_CONSEQUENCE_TERM_CODE < 63, "Consequence term codes must fit in an int64 bitmask"
+
+
+def consequence_term_code(consequence_term):
+    return CONSEQUENCE_TERM_RANK_LOOKUP.get(consequence_term, UNKNOWN_CONSEQUENCE_TERM_CODE)
+
+
+def encode_consequence_terms(consequence_terms):
+    return hl.fold(
+        lambda mask, term: hl.bit_or(mask, hl.bit_lshift(hl.int64(1), consequence_term_code(term))),
+        hl.int64(0),
+        consequence_terms,
+    )
+
+
+def most_severe_consequence_code(consequence_term_mask):
+    # The lowest set bit is the code of the most severe term
+    return hl.or_missing(
+        consequence_term_mask != 0,
+        hl.bit_count(hl.bit_and(consequence_term_mask, -consequence_term_mask) - 1),
+    )
+
+
+def decode_consequence_term(consequence_term_code):
+    return hl.literal([*CONSEQUENCE_TERMS, UNKNOWN_CONSEQUENCE_TERM])[consequence_term_code]
+
+
+def decode_consequence_terms(consequence_term_mask):
+    """
+    Decode a bitmask of consequence terms into an array of terms, ordered from most to least severe.
+    """
+    return (
+        hl.range(UNKNOWN_CONSEQUENCE_TERM_CODE + 1)
+        .filter(lambda code: hl.bit_and(consequence_term_mask, hl.bit_lshift(hl.int64(1), code)) != 0)
+        .map(decode_consequence_term)
+    )
+
+
+def decode_transcript_consequence(transcript_consequence):
+    """
+    Replace encoded consequence terms in a transcript consequence with strings for export.
+
+    The integer major_consequence_code is kept for filtering.
+    """
+    return transcript_consequence.annotate(
+        consequence_terms=decode_consequence_terms(transcript_consequence.consequence_term_mask),
+        major_consequence=decode_consequence_term(transcript_consequence.major_consequence_code),
+    ).drop("consequence_term_mask")
@@ -15,7 +15,7 @@ def variant_id(locus: hl.expr.LocusExpression, alleles: hl.expr.ArrayExpression,
     Return:
         string: "<chrom>-<pos>-<ref>-<alt>"
     """
-    contig = normalized_contig(locus.contig)
+    contig = normalized_contig(locus)
     var_id = contig + "-" + hl.str(locus.position) + "-" + alleles[0] + "-" + alleles[1]
 
     if max_length is not None:
@@ -72,7 +72,7 @@ def compressed_variant_id(locus: hl.expr.LocusExpression, alleles: hl.expr.Array
         lambda ref_len, alt_len: hl.case()
         .when(
             ref_len > alt_len,
-            normalized_contig(locus.contig)
+            normalized_contig(locus)
             + "-"
             + hl.str(locus.position)
             + "d"
@@ -82,7 +82,7 @@ def compressed_variant_id(locus: hl.expr.LocusExpression, alleles: hl.expr.Array
         )
         .when(
             ref_len < alt_len,
-            normalized_contig(locus.contig)
+            normalized_contig(locus)
             + "-"
             + hl.str(locus.position)
             + "i"
@@ -0,0 +1,204 @@
+"""
+Python implementations of the variant ID expressions in variant_id.py, for use outside of Hail.
+
+These produce the same IDs as variant_id and compressed_variant_id for variants with split alleles. Functions
+with plural names operate on sequences of IDs and are intended for large batches.
+"""
+
+import string
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+ENCODED_ALLELE_CHARACTERS = string.ascii_uppercase + string.ascii_lowercase + string.digits + "-_"
+
+_ENCODED_ALLELE_CHARACTER_CODES = np.frombuffer(ENCODED_ALLELE_CHARACTERS.encode("ascii"), dtype=np.uint8)
+
+_INVALID_BASE = 255
+
+# Map from byte value to 2 bit base code. Anything other than A, C, G, or T is invalid.
+_BASE_CODES = np.full(256, _INVALID_BASE, dtype=np.uint8)
+_BASE_CODES[np.frombuffer(b"ACGT", dtype=np.uint8)] = np.arange(4)
+
+
+class CompressedVariantId(NamedTuple):
+    contig: str
+    position: int
+    # "substitution", "deletion", or "insertion"
+    variant_type: str
+    # Reference allele for substitutions. Not available for deletions or insertions.
+    ref: Optional[str]
+    # Alternate allele for substitutions and deletions, encoded alternate allele for insertions.
+    alt: str
+    # Number of bases deleted or inserted
+    length_change: int
+
+
+def normalized_contig(contig: str) -> str:
+    contig = contig[3:] if contig.startswith("chr") else contig
+    return "M" if contig == "MT" else contig
+
+
+def variant_id(contig: str, position: int, ref: str, alt: str) -> str:
+    return f"{normalized_contig(contig)}-{position}-{ref}-{alt}"
+
+
+def parse_variant_id(variant_id: str) -> Tuple[str, int, str, str]:
+    """
+    Parse a <chrom>-<pos>-<ref>-<alt> variant ID.
+
+    Return:
+        tuple: (contig, position, ref, alt)
+    """
+    contig, position, ref, alt = variant_id.split("-")
+    return (contig, int(position), ref, alt)
+
+
+def encode_allele(allele: str) -> Optional[str]:
+    """
+    Encode an allele using 1 character for each group of 3 bases.
+
+    Return:
+        str: encoded allele or None if the allele contains bases other than A, C, G, and T
+    """
+    encoded = []
+    for i in range(0, len(allele), 3):
+        group = allele[i : i + 3].ljust(3, "A")
+        try:
+            codes = ["ACGT".index(base) for base in group]
+        except ValueError:
+            return None
+        encoded.append(ENCODED_ALLELE_CHARACTERS[codes[0] * 16 + codes[1] * 4 + codes[2]])
+
+    return "".join(encoded)
+
+
+def encode_alleles(alleles: Sequence[str]) -> List[Optional[str]]:
+    """
+    Encode many alleles at once. Equivalent to [encode_allele(allele) for allele in alleles].
+    """
+    if not alleles:
+        return []
+
+    raw_alleles = [allele.encode("utf8") for allele in alleles]
+    lengths = np.fromiter(map(len, raw_alleles), dtype=np.int64, count=len(raw_alleles))
+    n_groups = (lengths + 2) // 3
+
+    codes = _BASE_CODES[np.frombuffer(b"".join(raw_alleles), dtype=np.uint8)]
+    invalid_bases = codes == _INVALID_BASE
+    is_invalid = np.zeros(len(raw_alleles), dtype=bool)
+    is_invalid[np.repeat(np.arange(len(raw_alleles)), lengths)[invalid_bases]] = True
+    codes[invalid_bases] = 0
+
+    # Copy each allele's base codes into a buffer where each allele is padded to a multiple of 3 bases
+    raw_starts = np.cumsum(lengths) - lengths
+    group_starts = np.cumsum(n_groups) - n_groups
+    padded_codes = np.zeros(3 * int(n_groups.sum()), dtype=np.intp)
+    padded_codes[np.repeat(3 * group_starts - raw_starts, lengths) + np.arange(codes.size)] = codes
+
+    groups = padded_codes.reshape(-1, 3)
+    encoded = _ENCODED_ALLELE_CHARACTER_CODES[groups[:, 0] * 16 + groups[:, 1] * 4 + groups[:, 2]]
+    encoded = encoded.tobytes().decode("ascii")
+
+    return [
+        None if invalid else encoded[start : start + n]
+        for invalid, start, n in zip(is_invalid.tolist(), group_starts.tolist(), n_groups.tolist())
+    ]
+
+
+def decode_allele(encoded_allele: str, length: Optional[int] = None) -> str:
+    """
+    Decode an allele encoded with encode_allele.
+
+    Encoded alleles are padded to a multiple of 3 bases. If length is given, the decoded allele is truncated to it.
+    """
+    bases = []
+    for character in encoded_allele:
+        n = ENCODED_ALLELE_CHARACTERS.index(character)
+        bases.extend(("ACGT"[n // 16], "ACGT"[(n // 4) % 4], "ACGT"[n % 4]))
+
+    decoded = "".join(bases)
+    return decoded[:length] if length is not None else decoded
+
+
+def compressed_variant_id(contig: str, position: int, ref: str, alt: str) -> Optional[str]:
+    """
+    Equivalent of compressed_variant_id in variant_id.py.
+
+    Return:
+        str: compressed variant ID or None if the variant is an insertion of bases other than A, C, G, and T
+    """
+    contig = normalized_contig(contig)
+    if len(ref) > len(alt):
+        return f"{contig}-{position}d{len(ref) - len(alt)}-{alt}"
+
+    if len(ref) < len(alt):
+        encoded_alt = encode_allele(alt)
+        if encoded_alt is None:
+            return None
+
+        return f"{contig}-{position}i{len(alt) - len(ref)}-{encoded_alt}"
+
+    return variant_id(contig, position, ref, alt)
+
+
+def compressed_variant_ids(variant_ids: Sequence[str]) -> List[Optional[str]]:
+    """
+    Compute compressed variant IDs for many <chrom>-<pos>-<ref>-<alt> variant IDs at once.
+    """
+    normalized_contigs = {}
+    compressed_ids: List[Optional[str]] = []
+    insertion_indices = []
+    insertion_prefixes = []
+    insertion_alts = []
+
+    for i, variant in enumerate(variant_ids):
+        contig, position, ref, alt = variant.split("-")
+        normalized = normalized_contigs.get(contig)
+        if normalized is None:
+            normalized = normalized_contigs[contig] = normalized_contig(contig)
+
+        if len(ref) > len(alt):
+            compressed_ids.append(f"{normalized}-{position}d{len(ref) - len(alt)}-{alt}")
+        elif len(ref) < len(alt):
+            compressed_ids.append(None)
+            insertion_indices.append(i)
+            insertion_prefixes.append(f"{normalized}-{position}i{len(alt) - len(ref)}-")
+            insertion_alts.append(alt)
+        else:
+            compressed_ids.append(variant if normalized == contig else f"{normalized}-{position}-{ref}-{alt}")
+
+    for i, prefix, encoded_alt in zip(insertion_indices, insertion_prefixes, encode_alleles(insertion_alts)):
+        if encoded_alt is not None:
+            compressed_ids[i] = prefix + encoded_alt
+
+    return compressed_ids
+
+
+def parse_compressed_variant_id(compressed_id: str) -> CompressedVariantId:
+    """
+    Parse a compressed variant ID.
+
+    Compressed IDs for deletions and insertions do not contain the reference allele, so those cannot be
+    converted back to variant IDs without a reference sequence.
+    """
+    try:
+        contig, rest = compressed_id.split("-", 1)
+        position, alleles = rest.split("-", 1)
+        if position.isdigit():
+            ref, alt = alleles.split("-")
+            return CompressedVariantId(contig, int(position), "substitution", ref, alt, 0)
+
+        # Encoded insertion alleles may contain "-", so only split the ID up to the allele
+        for marker, variant_type in (("d", "deletion"), ("i", "insertion")):
+            if marker in position:
+                position, length_change = position.split(marker)
+                return CompressedVariantId(contig, int(position), variant_type, None, alleles, int(length_change))
+    except ValueError:
+        pass
+
+    raise ValueError(f"Invalid compressed variant ID: {compressed_id}")
+
+
+def parse_compressed_variant_ids(compressed_ids: Sequence[str]) -> List[CompressedVariantId]:
+    return [parse_compressed_variant_id(compressed_id) for compressed_id in compressed_ids]
@@ -3,8 +3,12 @@ import datetime
 import gzip
 import json
 import os
+import re
+import shutil
 import subprocess
 import sys
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from xml.etree import ElementTree
 
 import hail as hl
@@ -36,7 +40,29 @@ class SkipVariant(Exception):
     pass
 
 
-def _parse_submission(submission_element, trait_mapping_list_element):
+def _index_trait_mappings(trait_mapping_list_element):
+    """
+    Index a VariationArchive's TraitMapping elements by (ClinicalAssertionID, TraitType, MappingType, MappingValue).
+
+    If multiple elements have the same attributes, the first one is indexed.
+    """
+    trait_mappings = {}
+    if trait_mapping_list_element is None:
+        return trait_mappings
+
+    for mapping_element in trait_mapping_list_element.iterfind("./TraitMapping"):
+        key = (
+            mapping_element.attrib.get("ClinicalAssertionID"),
+            mapping_element.attrib.get("TraitType"),
+            mapping_element.attrib.get("MappingType"),
+            mapping_element.attrib.get("MappingValue"),
+        )
+        trait_mappings.setdefault(key, mapping_element)
+
+    return trait_mappings
+
+
+def _parse_submission(submission_element, trait_mappings):
     submission = {}
 
     submission["id"] = submission_element.find("./ClinVarAccession").attrib["Accession"]
@@ -58,19 +84,17 @@ def _parse_submission(submission_element, trait_mapping_list_element):
         preferred_name_element = None
         mapping_element = None
 
-        if trait_mapping_list_element is not None:
-            xref_elements = trait_element.findall("XRef")
-            for xref_element in xref_elements:
-                selector = f"./TraitMapping[@ClinicalAssertionID='{submission_element.attrib['ID']}'][@TraitType='{trait_element.attrib['Type']}'][@MappingType='XRef'][@MappingValue='{xref_element.attrib['ID']}']"  # noqa
-                mapping_element = trait_mapping_list_element.find(selector)
-                if mapping_element is not None:
-                    break
+        mapping_key = (submission_element.attrib["ID"], trait_element.attrib["Type"])
+
+        for xref_element in trait_element.findall("XRef"):
+            mapping_element = trait_mappings.get((*mapping_key, "XRef", xref_element.attrib["ID"]))
+            if mapping_element is not None:
+                break
 
         if mapping_element is None:
             preferred_name_element = trait_element.find("./Name/ElementValue[@Type='Preferred']")
-            if preferred_name_element is not None and trait_mapping_list_element is not None:
-                selector = f"./TraitMapping[@ClinicalAssertionID='{submission_element.attrib['ID']}'][@TraitType='{trait_element.attrib['Type']}'][@MappingType='Name'][@MappingValue=\"{preferred_name_element.text}\"]"  # noqa
-                mapping_element = trait_mapping_list_element.find(selector)
+            if preferred_name_element is not None:
+                mapping_element = trait_mappings.get((*mapping_key, "Name", preferred_name_element.text))
 
         if mapping_element is None:
             name_elements = trait_element.findall("./Name/ElementValue")
@@ -78,11 +102,9 @@ def _parse_submission(submission_element, trait_mapping_list_element):
                 if preferred_name_element is None:
                     preferred_name_element = name_element
 
-                if trait_mapping_list_element is not None:
-                    selector = f"./TraitMapping[@ClinicalAssertionID='{submission_element.attrib['ID']}'][@TraitType='{trait_element.attrib['Type']}'][@MappingType='Name'][@MappingValue=\"{name_element.text}\"]"  # noqa
-                    mapping_element = trait_mapping_list_element.find(selector)
-                    if mapping_element:
-                        break
+                mapping_element = trait_mappings.get((*mapping_key, "Name", name_element.text))
+                if mapping_element is not None:
+                    break
 
         if mapping_element is not None:
             medgen_element = mapping_element.find("./MedGen")
@@ -156,78 +178,284 @@ def _parse_variant(variant_element):
         )[0]
 
     submission_elements = variant_element.findall("./InterpretedRecord/ClinicalAssertionList/ClinicalAssertion")
-    trait_mapping_list_element = variant_element.find("./InterpretedRecord/TraitMappingList")
-    variant["submissions"] = [_parse_submission(el, trait_mapping_list_element) for el in submission_elements]
+    trait_mappings = _index_trait_mappings(variant_element.find("./InterpretedRecord/TraitMappingList"))
+    variant["submissions"] = [_parse_submission(el, trait_mappings) for el in submission_elements]
 
     return variant
 
 
-def import_clinvar_xml(clinvar_xml_path):
-    release_date = None
+CLINVAR_VARIANTS_TSV_HEADER = [
+    "locus_GRCh37",
+    "alleles_GRCh37",
+    "locus_GRCh38",
+    "alleles_GRCh38",
+    "variation_archive_version",
+    "variant",
+]
+
+VARIATION_ARCHIVE_START_TAG = b"<VariationArchive "
+VARIATION_ARCHIVE_END_TAG = b"</VariationArchive>"
+
+
+def _iter_variation_archives(xml_file, block_size=16 * 1024 * 1024):
+    """
+    Find VariationArchive elements in a ClinVar XML file by scanning for their start and end tags.
+
+    This is much faster than parsing the XML, so it can be used to split the file into chunks to parse in parallel.
+
+    Return:
+        iterator of bytes: XML for each VariationArchive element
+    """
+    buffer = b""
+    while True:
+        block = xml_file.read(block_size)
+        buffer += block
+
+        position = 0
+        while True:
+            start = buffer.find(VARIATION_ARCHIVE_START_TAG, position)
+            if start == -1:
+                # Keep enough of the buffer to find a start tag split across blocks
+                position = max(position, len(buffer) - len(VARIATION_ARCHIVE_START_TAG))
+                break
+
+            end = buffer.find(VARIATION_ARCHIVE_END_TAG, start)
+            if end == -1:
+                position = start
+                break
+
+            end += len(VARIATION_ARCHIVE_END_TAG)
+            yield buffer[start:end]
+            position = end
+
+        buffer = buffer[position:]
+
+        if not block:
+            break
+
+
+def _chunk_variation_archives(variation_archives, chunk_size):
+    """
+    Group VariationArchive elements into chunks of approximately chunk_size bytes.
+    """
+    chunk = []
+    current_chunk_size = 0
+    for variation_archive in variation_archives:
+        chunk.append(variation_archive)
+        current_chunk_size += len(variation_archive)
+        if current_chunk_size >= chunk_size:
+            yield b"".join(chunk)
+            chunk = []
+            current_chunk_size = 0
+
+    if chunk:
+        yield b"".join(chunk)
+
+
+def _get_variation_archive_version(variation_archive: bytes):
+    """
+    Return:
+        tuple: (VariationID, Version) from a VariationArchive element's attributes
+    """
+    start_tag = variation_archive[: variation_archive.index(b">")]
+    variation_id = re.search(rb'\sVariationID="([^"]*)"', start_tag)
+    version = re.search(rb'\sVersion="([^"]*)"', start_tag)
+    return (
+        variation_id.group(1).decode() if variation_id else None,
+        version.group(1).decode() if version else None,
+    )
+
+
+def _get_clinvar_release_date(clinvar_xml_path):
+    open_file = gzip.open if clinvar_xml_path.endswith(".gz") else open
+    with open_file(clinvar_xml_path, "rb") as xml_file:
+        release_element = re.search(rb"<ClinVarVariationRelease\s[^>]*>", xml_file.read(64 * 1024))
+
+    if release_element is None:
+        return None
 
+    return ElementTree.fromstring(release_element.group(0) + b"</ClinVarVariationRelease>").attrib.get("ReleaseDate")
+
+
+def _parse_variation_archives(variation_archives_xml: bytes, output_path: str) -> int:
+    """
+    Parse a chunk of VariationArchive elements and write the variants to a TSV file.
+
+    Return:
+        int: number of variants written
+    """
+    root = ElementTree.fromstring(b"<VariationArchives>" + variation_archives_xml + b"</VariationArchives>")
+
+    n_variants = 0
+    with open(output_path, "w", newline="") as output_file:
+        writer = csv.writer(output_file, delimiter="\t", quotechar=None, quoting=csv.QUOTE_NONE)
+        writer.writerow(CLINVAR_VARIANTS_TSV_HEADER)
+
+        for element in root.iterfind("./VariationArchive"):
+            try:
+                variant = _parse_variant(element)
+            except SkipVariant:
+                continue
+            except Exception:
+                print(
+                    f"Failed to parse variant {element.attrib['VariationID']}",
+                    file=sys.stderr,
+                )
+                raise
+
+            locations = variant.pop("locations")
+            writer.writerow(
+                [
+                    locations["GRCh37"]["locus"] if "GRCh37" in locations else "NA",
+                    json.dumps(locations["GRCh37"]["alleles"]) if "GRCh37" in locations else "NA",
+                    "chr" + locations["GRCh38"]["locus"].replace("MT", "M") if "GRCh38" in locations else "NA",
+                    json.dumps(locations["GRCh38"]["alleles"]) if "GRCh38" in locations else "NA",
+                    element.attrib.get("Version", "NA"),
+                    json.dumps(variant),
+                ]
+            )
+            n_variants += 1
+
+    return n_variants
+
+
+def _get_previous_variation_archive_versions(previous_clinvar_path):
+    previous = hl.read_table(previous_clinvar_path)
+    if "variation_archive_version" not in previous.row:
+        print("Previous ClinVar table does not contain record versions, importing all variants")
+        return {}
+
+    return dict(
+        previous.aggregate(hl.agg.collect((previous.variant.clinvar_variation_id, previous.variation_archive_version)))
+    )
+
+
+def _parse_changed_variation_archives(
+    xml_file, output_dir, previous_versions, n_workers=None, chunk_size=32 * 1024 * 1024
+):
+    """
+    Parse VariationArchive elements whose record version has changed since a previous release into TSV files.
+
+    Chunks of elements are parsed in parallel by a pool of processes, each of which writes a part-*.tsv file
+    to output_dir. At least one part file is always written so that the output can be imported even if no
+    variants changed.
+
+    Args:
+        previous_versions: VariationArchive version for each variation ID in the previous release
+
+    Return:
+        tuple: (number of variants parsed, list of variation IDs that have not changed)
+    """
+    unchanged_variation_ids = []
+
+    n_workers = n_workers or os.cpu_count()
+    n_variants = 0
+    n_chunks = 0
+    # Start worker processes with spawn instead of forking the driver, which is running Hail's JVM gateway
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # The exact number of variants in the XML file is unknown.
+        # Approximate it to show a progress bar.
+        progress = tqdm(total=1_100_000, mininterval=5)
+
+        def changed_variation_archives():
+            for variation_archive in _iter_variation_archives(xml_file):
+                progress.update(1)
+
+                if previous_versions:
+                    variation_id, version = _get_variation_archive_version(variation_archive)
+                    if version is not None and previous_versions.get(variation_id) == version:
+                        unchanged_variation_ids.append(variation_id)
+                        continue
+
+                yield variation_archive
+
+        # Limit the number of chunks held in memory while waiting for a process to parse them
+        pending = set()
+        for chunk in _chunk_variation_archives(changed_variation_archives(), chunk_size):
+            if len(pending) >= 2 * n_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                n_variants += sum(future.result() for future in done)
+
+            output_path = os.path.join(output_dir, f"part-{n_chunks:05d}.tsv")
+            pending.add(executor.submit(_parse_variation_archives, chunk, output_path))
+            n_chunks += 1
+
+        n_variants += sum(future.result() for future in pending)
+
+        progress.close()
+
+    if n_chunks == 0:
+        with open(os.path.join(output_dir, "part-00000.tsv"), "w", newline="") as output_file:
+            writer = csv.writer(output_file, delimiter="\t", quotechar=None, quoting=csv.QUOTE_NONE)
+            writer.writerow(CLINVAR_VARIANTS_TSV_HEADER)
+
+    return n_variants, unchanged_variation_ids
+
+
+def import_clinvar_xml(
+    clinvar_xml_path,
+    previous_clinvar_path=None,
+    n_workers=None,
+    chunk_size=32 * 1024 * 1024,
+    staging_path="/tmp/clinvar_variants",
+):
+    """
+    Import variants from a ClinVar XML file.
+
+    The XML file is split into chunks of VariationArchive elements, which are parsed in parallel by a pool of
+    processes. Each process writes its variants to a separate TSV file.
+
+    Args:
+        previous_clinvar_path: (optional) table imported from a previous ClinVar release, for example a copy of
+            this task's previous output. Variants whose record version has not changed since that release are
+            copied from it instead of being parsed.
+        n_workers: number of processes used to parse the XML (defaults to the number of CPUs)
+        chunk_size: approximate size in bytes of the XML parsed by a process at once
+        staging_path: path to copy parsed variants to for import (on the cluster's default file system)
+    """
     clinvar_xml_local_path = os.path.join("/tmp", os.path.basename(clinvar_xml_path))
     print("Copying ClinVar XML")
     if not os.path.exists(clinvar_xml_local_path):
         subprocess.check_call(["gsutil", "cp", clinvar_xml_path, clinvar_xml_local_path])
 
+    release_date = _get_clinvar_release_date(clinvar_xml_local_path)
+
+    previous_versions = {}
+    if previous_clinvar_path:
+        previous_versions = _get_previous_variation_archive_versions(previous_clinvar_path)
+
+    local_staging_path = os.path.join("/tmp", "clinvar_variants")
+    shutil.rmtree(local_staging_path, ignore_errors=True)
+    os.makedirs(os.path.join(local_staging_path, "parts"))
+
     print("Parsing XML file")
-    with open("/tmp/clinvar_variants.tsv", "w", newline="") as output_file:
-        writer = csv.writer(output_file, delimiter="\t", quotechar="", quoting=csv.QUOTE_NONE)
-        writer.writerow(["locus_GRCh37", "alleles_GRCh37", "locus_GRCh38", "alleles_GRCh38", "variant"])
-
-        open_file = gzip.open if clinvar_xml_local_path.endswith(".gz") else open
-        with open_file(clinvar_xml_local_path, "r") as xml_file:
-            # The exact number of variants in the XML file is unknown.
-            # Approximate it to show a progress bar.
-            progress = tqdm(total=1_100_000, mininterval=5)
-
-            xml = ElementTree.iterparse(xml_file, events=["end"])
-            for _, element in xml:
-                if element.tag == "ClinVarVariationRelease":
-                    release_date = element.attrib["ReleaseDate"]
-
-                if element.tag == "VariationArchive":
-                    try:
-                        variant = _parse_variant(element)
-
-                        locations = variant.pop("locations")
-                        writer.writerow(
-                            [
-                                locations["GRCh37"]["locus"] if "GRCh37" in locations else "NA",
-                                json.dumps(locations["GRCh37"]["alleles"]) if "GRCh37" in locations else "NA",
-                                "chr" + locations["GRCh38"]["locus"].replace("MT", "M")
-                                if "GRCh38" in locations
-                                else "NA",
-                                json.dumps(locations["GRCh38"]["alleles"]) if "GRCh38" in locations else "NA",
-                                json.dumps(variant),
-                            ]
-                        )
-
-                        progress.update(1)
-
-                    except SkipVariant:
-                        pass
-                    except Exception:
-                        print(
-                            f"Failed to parse variant {element.attrib['VariationID']}",
-                            file=sys.stderr,
-                        )
-                        raise
-
-                    # https://stackoverflow.com/questions/7697710/python-running-out-of-memory-parsing-xml-using-celementtree-iterparse
-                    element.clear()
-
-            progress.close()
-
-    subprocess.check_call(["hdfs", "dfs", "-cp", "-f", "file:///tmp/clinvar_variants.tsv", "/tmp/clinvar_variants.tsv"])
+    open_file = gzip.open if clinvar_xml_local_path.endswith(".gz") else open
+    with open_file(clinvar_xml_local_path, "rb") as xml_file:
+        n_variants, unchanged_variation_ids = _parse_changed_variation_archives(
+            xml_file,
+            os.path.join(local_staging_path, "parts"),
+            previous_versions=previous_versions,
+            n_workers=n_workers,
+            chunk_size=chunk_size,
+        )
+
+    print(f"Parsed {n_variants} variants, {len(unchanged_variation_ids)} unchanged since previous release")
+
+    with open(os.path.join(local_staging_path, "unchanged_variation_ids.tsv"), "w") as output_file:
+        output_file.write("clinvar_variation_id\n")
+        output_file.writelines(f"{variation_id}\n" for variation_id in unchanged_variation_ids)
+
+    subprocess.check_call(["hdfs", "dfs", "-rm", "-r", "-f", staging_path])
+    subprocess.check_call(["hdfs", "dfs", "-cp", f"file://{local_staging_path}", staging_path])
 
     ds = hl.import_table(
-        "/tmp/clinvar_variants.tsv",
+        f"{staging_path}/parts/part-*.tsv",
         types={
             "locus_GRCh37": hl.tlocus("GRCh37"),
             "alleles_GRCh37": hl.tarray(hl.tstr),
             "locus_GRCh38": hl.tlocus("GRCh38"),
             "alleles_GRCh38": hl.tarray(hl.tstr),
+            "variation_archive_version": hl.tstr,
             "variant": hl.tstruct(
                 clinvar_variation_id=hl.tstr,
                 rsid=hl.tstr,
@@ -250,6 +478,12 @@ def import_clinvar_xml(clinvar_xml_path):
         min_partitions=2000,
     )
 
+    if unchanged_variation_ids:
+        unchanged_variants = hl.import_table(f"{staging_path}/unchanged_variation_ids.tsv", key="clinvar_variation_id")
+        previous = hl.read_table(previous_clinvar_path)
+        previous = previous.filter(hl.is_defined(unchanged_variants[previous.variant.clinvar_variation_id]))
+        ds = ds.union(previous.select(*ds.row.dtype.fields).select_globals())
+
     ds = ds.annotate_globals(clinvar_release_date=release_date)
 
     return ds
@@ -270,7 +504,7 @@ def prepare_clinvar_variants(clinvar_path, reference_genome):
     ds = ds.annotate(
         variant_id=variant_id(ds.locus, ds.alleles),
         reference_genome=reference_genome,
-        chrom=normalized_contig(ds.locus.contig),
+        chrom=normalized_contig(ds.locus),
         pos=ds.locus.position,
         ref=ds.alleles[0],
         alt=ds.alleles[1],
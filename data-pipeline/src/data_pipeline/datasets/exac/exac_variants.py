@@ -420,7 +420,7 @@ def import_exac_vcf(path):
     ds = ds.select(
         variant_id=variant_id(ds.locus, ds.alleles),
         reference_genome="GRCh37",
-        chrom=normalized_contig(ds.locus.contig),
+        chrom=normalized_contig(ds.locus),
         pos=ds.locus.position,
         xpos=x_position(ds.locus),
         ref=ds.alleles[0],
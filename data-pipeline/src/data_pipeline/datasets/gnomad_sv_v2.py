@@ -2,13 +2,7 @@ import itertools
 
 import hail as hl
 
-
-def x_position(chrom, position):
-    contig_number = (
-        hl.case().when(chrom == "X", 23).when(chrom == "Y", 24).when(chrom[0] == "M", 25).default(hl.int(chrom))
-    )
-    return hl.int64(contig_number) * 1_000_000_000 + position
-
+from data_pipeline.data_types.locus import x_position
 
 TOP_LEVEL_INFO_FIELDS = [
     "ALGORITHMS",
@@ -79,10 +73,10 @@ def import_structural_variants(vcf_path):
         # Start
         chrom=ds.locus.contig,
         pos=ds.locus.position,
-        xpos=x_position(ds.locus.contig, ds.locus.position),
+        xpos=x_position(ds.locus),
         # End
         end=ds.info.END,
-        xend=x_position(ds.locus.contig, ds.info.END),
+        xend=x_position(ds.locus, ds.info.END),
         # Start 2
         chrom2=ds.info.CHR2,
         pos2=ds.info.POS2,
@@ -2,13 +2,7 @@ import itertools
 
 import hail as hl
 
-
-def x_position(chrom, position):
-    contig_number = (
-        hl.case().when(chrom == "X", 23).when(chrom == "Y", 24).when(chrom[0] == "M", 25).default(hl.int(chrom))
-    )
-    return hl.int64(contig_number) * 1_000_000_000 + position
-
+from data_pipeline.data_types.locus import x_position
 
 TOP_LEVEL_INFO_FIELDS = [
     "ALGORITHMS",
@@ -95,8 +89,8 @@ def import_svs_from_vcfs(vcf_paths, preserve_par):
     )
 
     ds = ds.annotate(
-        xpos=x_position(ds.chrom, ds.pos),
-        xend=x_position(ds.chrom, ds.end),
+        xpos=x_position(ds.locus),
+        xend=x_position(ds.locus, ds.end),
         xpos2=x_position(ds.chrom2, ds.pos2),
         xend2=x_position(ds.chrom2, ds.end2),
     )
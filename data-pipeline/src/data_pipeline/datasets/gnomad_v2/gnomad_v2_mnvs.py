@@ -5,6 +5,7 @@ import hail as hl
 
 from data_pipeline.data_types.locus import normalized_contig, x_position
 from data_pipeline.data_types.variant.transcript_consequence import consequence_term_rank
+from data_pipeline.pipeline import checkpoint
 
 
 # Change field quote character from double quotes to single quotes.
@@ -82,7 +83,7 @@ def import_mnv_file(path, **kwargs):
     ds = ds.transmute(locus=hl.locus(ds["locus.contig"], ds["locus.position"]))
 
     ds = ds.transmute(
-        chrom=normalized_contig(ds.locus.contig),
+        chrom=normalized_contig(ds.locus),
         pos=ds.locus.position,
         xpos=x_position(ds.locus),
     )
@@ -282,7 +283,7 @@ def import_three_bp_mnv_file(path, **kwargs):
     ds = ds.rename({"tnv": "variant_id"})
 
     ds = ds.transmute(
-        chrom=normalized_contig(ds.locus.contig),
+        chrom=normalized_contig(ds.locus),
         pos=ds.locus.position,
         xpos=x_position(ds.locus),
     )
@@ -420,8 +421,8 @@ def import_three_bp_mnv_file(path, **kwargs):
 
 
 def prepare_gnomad_v2_mnvs(mnvs_path, three_bp_mnvs_path):
-    mnvs = import_mnv_file(mnvs_path, quote="'")
-    mnvs_3bp = import_three_bp_mnv_file(three_bp_mnvs_path, quote="'")
+    mnvs = checkpoint(import_mnv_file(mnvs_path, quote="'"), "mnvs")
+    mnvs_3bp = checkpoint(import_three_bp_mnv_file(three_bp_mnvs_path, quote="'"), "3bp_mnvs")
 
     snp12_components = mnvs_3bp.select(
         component_mnv=hl.bind(
@@ -491,6 +492,7 @@ def prepare_gnomad_v2_mnvs(mnvs_path, three_bp_mnvs_path):
     component_2bp_mnvs = component_2bp_mnvs.group_by(component_2bp_mnvs.component_mnv).aggregate(
         related_mnvs=hl.agg.collect(component_2bp_mnvs.related_mnv)
     )
+    component_2bp_mnvs = checkpoint(component_2bp_mnvs, "component_2bp_mnvs")
 
     mnvs = mnvs.annotate(related_mnvs=component_2bp_mnvs[mnvs.variant_id].related_mnvs)
     mnvs = mnvs.annotate(
@@ -1,7 +1,7 @@
 import hail as hl
 
 from data_pipeline.data_types.locus import normalized_contig, x_position
-from data_pipeline.data_types.variant import variant_id
+from data_pipeline.data_types.variant import annotate_colocated_variants, variant_id
 
 
 POPULATIONS = ["afr", "amr", "asj", "eas", "fin", "nfe", "oth", "sas"]
@@ -340,7 +340,7 @@ def prepare_gnomad_v2_variants(exome_variants_path, genome_variants_path):
     variants = variants.annotate(
         variant_id=variant_id(variants.locus, variants.alleles),
         reference_genome="GRCh37",
-        chrom=normalized_contig(variants.locus.contig),
+        chrom=normalized_contig(variants.locus),
         pos=variants.locus.position,
         xpos=x_position(variants.locus),
         ref=variants.alleles[0],
@@ -364,38 +364,18 @@ def prepare_gnomad_v2_variants(exome_variants_path, genome_variants_path):
 
     # Colocated variants
     variants = variants.cache()
-    variants_by_locus = variants.select(
-        variants.variant_id,
-        exome_ac_raw=hl.struct(**{f: variants.exome.freq[f].ac_raw for f in variants.exome.freq.dtype.fields}),
-        genome_ac_raw=hl.struct(
-            non_cancer=variants.genome.freq.gnomad.ac_raw,
-            **{f: variants.genome.freq[f].ac_raw for f in variants.genome.freq.dtype.fields},
-        ),
-    )
-    variants_by_locus = variants_by_locus.group_by("locus").aggregate(
-        variants=hl.agg.collect(variants_by_locus.row_value)
+    exome_ac_raw = hl.struct(**{f: variants.exome.freq[f].ac_raw for f in variants.exome.freq.dtype.fields})
+    genome_ac_raw = hl.struct(
+        non_cancer=variants.genome.freq.gnomad.ac_raw,
+        **{f: variants.genome.freq[f].ac_raw for f in variants.genome.freq.dtype.fields},
     )
-
-    def subset_filter(subset):
-        return lambda variant: (variant.exome_ac_raw[subset] > 0) | (variant.genome_ac_raw[subset] > 0)
-
-    variants_by_locus = variants_by_locus.annotate(
-        variant_ids=hl.struct(
-            **{
-                subset: variants_by_locus.variants.filter(subset_filter(subset)).map(lambda variant: variant.variant_id)
-                for subset in ["gnomad", "controls", "non_cancer", "non_neuro", "non_topmed"]
-            }
-        )
-    )
-
-    variants = variants.annotate(colocated_variants=variants_by_locus[variants.locus].variant_ids)
-    variants = variants.annotate(
-        colocated_variants=hl.struct(
-            **{
-                subset: variants.colocated_variants[subset].filter(lambda variant_id: variant_id != variants.variant_id)
-                for subset in ["gnomad", "controls", "non_cancer", "non_neuro", "non_topmed"]
-            }
-        )
+    variants = annotate_colocated_variants(
+        variants,
+        {
+            subset: (exome_ac_raw[subset] > 0) | (genome_ac_raw[subset] > 0)
+            for subset in ["gnomad", "controls", "non_cancer", "non_neuro", "non_topmed"]
+        },
+        checkpoint_name="variants_by_locus",
     )
 
     return variants
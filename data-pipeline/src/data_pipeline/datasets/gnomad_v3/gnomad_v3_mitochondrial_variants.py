@@ -26,7 +26,7 @@ def prepare_mitochondrial_variants(path, mnvs_path=None):
         # ID
         variant_id=variant_id(ds.locus, ds.alleles),
         reference_genome=ds.locus.dtype.reference_genome.name,
-        chrom=normalized_contig(ds.locus.contig),
+        chrom=normalized_contig(ds.locus),
         pos=ds.locus.position,
         ref=ds.alleles[0],
         alt=ds.alleles[1],
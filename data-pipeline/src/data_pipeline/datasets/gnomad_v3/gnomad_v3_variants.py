@@ -2,7 +2,7 @@ import itertools
 
 import hail as hl
 
-from data_pipeline.data_types.variant import variant_id
+from data_pipeline.data_types.variant import annotate_colocated_variants, variant_id
 
 
 def nullify_nan(value):
@@ -36,37 +36,9 @@ def prepare_gnomad_v3_variants(path):
     # Colocated variants #
     ######################
 
-    variants_by_locus = ds.select(
-        ds.variant_id,
-        ac_raw=hl.struct(**{subset or "all": freq(ds, subset=subset, raw=True).AC for subset in subsets}),
-    )
-    variants_by_locus = variants_by_locus.group_by("locus").aggregate(
-        variants=hl.agg.collect(variants_by_locus.row_value)
-    )
-
-    def subset_filter(subset):
-        return lambda variant: variant.ac_raw[subset] > 0
-
-    variants_by_locus = variants_by_locus.annotate(
-        variant_ids=hl.struct(
-            **{
-                subset
-                or "all": variants_by_locus.variants.filter(subset_filter(subset or "all")).map(
-                    lambda variant: variant.variant_id
-                )
-                for subset in subsets
-            }
-        )
-    )
-
-    ds = ds.annotate(colocated_variants=variants_by_locus[ds.locus].variant_ids)
-    ds = ds.annotate(
-        colocated_variants=hl.struct(
-            **{
-                subset: ds.colocated_variants[subset].filter(lambda variant_id: variant_id != ds.variant_id)
-                for subset in ds.colocated_variants._fields
-            }
-        )
+    ds = annotate_colocated_variants(
+        ds,
+        {subset or "all": freq(ds, subset=subset, raw=True).AC > 0 for subset in subsets},
     )
 
     ###############
@@ -2,13 +2,7 @@ import itertools
 
 import hail as hl
 
-
-def x_position(chrom, position):
-    contig_number = (
-        hl.case().when(chrom == "X", 23).when(chrom == "Y", 24).when(chrom[0] == "M", 25).default(hl.int(chrom))
-    )
-    return hl.int64(contig_number) * 1_000_000_000 + position
-
+from data_pipeline.data_types.locus import x_position
 
 FREQ_FIELDS = ["SC", "SN", "SF"]
 POPULATIONS = ["afr", "amr", "asj", "eas", "fin", "mid", "nfe", "sas"]
@@ -37,8 +31,8 @@ def prepare_gnomad_v4_cnvs(vcf_path):
     )
 
     ds = ds.annotate(
-        xpos=x_position(ds.chrom, ds.pos),
-        xend=x_position(ds.chrom, ds.end),
+        xpos=x_position(ds.locus),
+        xend=x_position(ds.locus, ds.end),
     )
 
     ds = ds.annotate(genes=hl.set(hl.array(hl.str(ds.info.Genes).split(","))))
@@ -2,7 +2,7 @@ import itertools
 
 import hail as hl
 
-from data_pipeline.data_types.variant import variant_id
+from data_pipeline.data_types.variant import annotate_colocated_variants, variant_id
 
 
 def nullify_nan(value):
@@ -37,37 +37,10 @@ def prepare_gnomad_v4_variants_helper(input_path: str, exomes_or_genomes: str):
     # Colocated variants #
     ######################
 
-    variants_by_locus = ds.select(
-        ds.variant_id,
-        ac_raw=hl.struct(**{subset or "all": freq(ds, subset=subset, raw=True).AC for subset in subsets}),
-    )
-    variants_by_locus = variants_by_locus.group_by("locus").aggregate(
-        variants=hl.agg.collect(variants_by_locus.row_value)
-    )
-
-    def subset_filter(subset):
-        return lambda variant: variant.ac_raw[subset] > 0
-
-    variants_by_locus = variants_by_locus.annotate(
-        variant_ids=hl.struct(
-            **{
-                subset
-                or "all": variants_by_locus.variants.filter(subset_filter(subset or "all")).map(
-                    lambda variant: variant.variant_id
-                )
-                for subset in subsets
-            }
-        )
-    )
-
-    ds = ds.annotate(colocated_variants=variants_by_locus[ds.locus].variant_ids)
-    ds = ds.annotate(
-        colocated_variants=hl.struct(
-            **{
-                subset: ds.colocated_variants[subset].filter(lambda variant_id: variant_id != ds.variant_id)
-                for subset in ds.colocated_variants._fields
-            }
-        )
+    ds = annotate_colocated_variants(
+        ds,
+        {subset or "all": freq(ds, subset=subset, raw=True).AC > 0 for subset in subsets},
+        checkpoint_name=f"{exomes_or_genomes}_variants_by_locus",
     )
 
     ###############
@@ -348,44 +321,20 @@ def prepare_gnomad_v4_variants(exome_variants_path: str, genome_variants_path: s
 
     # Colocated variants
     variants = variants.cache()
-    variants_by_locus = variants.select(
-        variants.variant_id,
-        exome_ac_raw=hl.struct(**{f: variants.exome.freq[f].ac_raw for f in variants.exome.freq.dtype.fields}),
-        genome_ac_raw=hl.struct(
-            **{f: variants.genome.freq[f].ac_raw for f in variants.genome.freq.dtype.fields},
-        ),
-    )
-    variants_by_locus = variants_by_locus.group_by("locus").aggregate(
-        variants=hl.agg.collect(variants_by_locus.row_value)
-    )
-
-    def subset_filter(subset):
-        def fn(variant):
-            return hl.if_else(
-                subset in list(variant.exome_ac_raw) and (variant.exome_ac_raw[subset] > 0),
-                True,
-                subset in list(variant.genome_ac_raw) and (variant.genome_ac_raw[subset] > 0),
-            )
-
-        return fn
-
-    variants_by_locus = variants_by_locus.annotate(
-        variant_ids=hl.struct(
-            **{
-                subset: variants_by_locus.variants.filter(subset_filter(subset)).map(lambda variant: variant.variant_id)
-                for subset in ["all", "non_ukb", "hgdp", "tgp"]
-            }
+    exome_ac_raw = hl.struct(**{f: variants.exome.freq[f].ac_raw for f in variants.exome.freq.dtype.fields})
+    genome_ac_raw = hl.struct(**{f: variants.genome.freq[f].ac_raw for f in variants.genome.freq.dtype.fields})
+
+    def in_subset(subset):
+        return hl.if_else(
+            subset in list(exome_ac_raw) and (exome_ac_raw[subset] > 0),
+            True,
+            subset in list(genome_ac_raw) and (genome_ac_raw[subset] > 0),
         )
-    )
 
-    variants = variants.annotate(colocated_variants=variants_by_locus[variants.locus].variant_ids)
-    variants = variants.annotate(
-        colocated_variants=hl.struct(
-            **{
-                subset: variants.colocated_variants[subset].filter(lambda variant_id: variant_id != variants.variant_id)
-                for subset in ["all", "non_ukb", "hgdp", "tgp"]
-            }
-        )
+    variants = annotate_colocated_variants(
+        variants,
+        {subset: in_subset(subset) for subset in ["all", "non_ukb", "hgdp", "tgp"]},
+        checkpoint_name="variants_by_locus",
     )
 
     return variants
@@ -14,7 +14,7 @@ from data_pipeline.datasets.gnomad_v4.types.initial_variant import (
 @attr.define
 class TranscriptConsequence:
     biotype: Union[str, None]
-    consequence_terms: list[str]
+    consequence_term_mask: int
     # domains: Union[List[Domain], None]
     domains: Union[List[str], None]
     gene_id: Union[str, None]
@@ -26,7 +26,7 @@ class TranscriptConsequence:
     lof_flags: Union[str, None]
     lof_filter: Union[str, None]
     # lof_info: Union[str, None]
-    major_consequence: str
+    major_consequence_code: int
     # polyphen_prediction: Union[str, None]
     # sift_prediction: Union[str, None]
     transcript_id: Union[str, None]
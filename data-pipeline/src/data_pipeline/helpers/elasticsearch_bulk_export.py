@@ -0,0 +1,518 @@
+import datetime
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+import elasticsearch
+import elasticsearch.helpers
+import hail as hl
+from loguru import logger
+
+from data_pipeline.helpers.elasticsearch_value_encoding import add_encoded_value
+
+# Status codes for bulk requests or individual documents that should be retried after backing off
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Index used to record the progress of bulk exports
+EXPORT_LEDGER_INDEX = "data_pipeline_export_ledger"
+
+
+class AdaptiveBatchSize:
+    """
+    Number of documents to send per bulk request, adjusted based on Elasticsearch's response.
+
+    The batch size increases additively while bulk requests complete within the target latency.
+    It decreases multiplicatively when requests are slow or are rejected because Elasticsearch's
+    write queue is full. The same instance is shared by all workers loading into an index.
+    """
+
+    def __init__(self, initial_size: int, min_size: int = 50, max_size: int = 20_000, target_latency: float = 10.0):
+        self._lock = threading.Lock()
+        self._size = float(initial_size)
+        self._step = max(1, initial_size // 10)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return int(self._size)
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            if latency > self.target_latency:
+                self._size = max(self.min_size, self._size * 0.75)
+            else:
+                self._size = min(self.max_size, self._size + self._step)
+
+    def record_rejection(self) -> None:
+        with self._lock:
+            self._size = max(self.min_size, self._size * 0.5)
+
+
+class ThroughputBudget:
+    """
+    Limit on the total rate of documents sent to Elasticsearch, shared by all workers in all concurrent exports.
+
+    Workers reserve capacity for each bulk request before sending it and wait if the budget is exhausted.
+    Unused capacity accumulates for up to burst_seconds.
+    """
+
+    def __init__(self, documents_per_second: float, burst_seconds: float = 1.0):
+        self._lock = threading.Lock()
+        self._capacity = documents_per_second * burst_seconds
+        self._available = self._capacity
+        self._last_update = time.perf_counter()
+        self.documents_per_second = documents_per_second
+
+    def acquire(self, n_documents: int) -> None:
+        with self._lock:
+            now = time.perf_counter()
+            self._available = min(
+                self._capacity, self._available + (now - self._last_update) * self.documents_per_second
+            )
+            self._last_update = now
+            self._available -= n_documents
+            wait = -self._available / self.documents_per_second if self._available < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BulkLoadProgress:
+    def __init__(self, total_partitions: int, log_interval: float = 60.0):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._last_log = self._start
+        self._log_interval = log_interval
+        self.total_partitions = total_partitions
+        self.completed_partitions = 0
+        self.indexed_documents = 0
+
+    def record_documents(self, n_documents: int, batch_size: Optional[AdaptiveBatchSize] = None) -> None:
+        with self._lock:
+            self.indexed_documents += n_documents
+            now = time.perf_counter()
+            if now - self._last_log >= self._log_interval:
+                self._last_log = now
+                self._log(now, batch_size)
+
+    def record_partition(self) -> None:
+        with self._lock:
+            self.completed_partitions += 1
+
+    def _log(self, now: float, batch_size: Optional[AdaptiveBatchSize]) -> None:
+        elapsed = now - self._start
+        message = (
+            f"Indexed {self.indexed_documents:,} documents ({self.indexed_documents / elapsed:,.0f}/s), "
+            f"{self.completed_partitions}/{self.total_partitions} partitions complete"
+        )
+        if batch_size:
+            message += f", batch size {batch_size.size}"
+        logger.info(message)
+
+    def log(self) -> None:
+        with self._lock:
+            self._log(time.perf_counter(), None)
+
+    def summary(self) -> str:
+        with self._lock:
+            return (
+                f"{self.completed_partitions}/{self.total_partitions} partitions, "
+                f"{self.indexed_documents:,} documents"
+            )
+
+
+class ExportProgressMonitor:
+    """
+    Combined progress of concurrent exports, logged periodically from a background thread.
+    """
+
+    def __init__(self, log_interval: float = 60.0):
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status = {}
+        self._bulk_progress = {}
+        self.log_interval = log_interval
+
+    def set_status(self, name: str, status: str) -> None:
+        with self._lock:
+            self._status[name] = status
+
+    def track_bulk_load(self, name: str, progress: BulkLoadProgress) -> None:
+        with self._lock:
+            self._bulk_progress[name] = progress
+
+    def log(self) -> None:
+        with self._lock:
+            lines = []
+            for name, status in self._status.items():
+                if status == "running" and name in self._bulk_progress:
+                    status = f"running, {self._bulk_progress[name].summary()}"
+                lines.append(f"  {name}: {status}")
+
+        logger.info("Export progress:\n" + "\n".join(lines))
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.log_interval):
+            self.log()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="export-progress", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+        self.log()
+
+
+def _bulk_request_body(documents: List[Tuple[Optional[str], str]]) -> str:
+    lines = []
+    for document_id, document in documents:
+        lines.append(json.dumps({"index": {"_id": document_id}} if document_id is not None else {"index": {}}))
+        lines.append(document)
+
+    return "\n".join(lines) + "\n"
+
+
+def _is_retryable_error(error: elasticsearch.TransportError) -> bool:
+    return isinstance(error, elasticsearch.ConnectionError) or error.status_code in RETRYABLE_STATUS_CODES
+
+
+def send_bulk_request(
+    es_client,
+    index: str,
+    documents: List[Tuple[Optional[str], str]],
+    batch_size: AdaptiveBatchSize,
+    max_retries: int = 5,
+    request_timeout: int = 120,
+) -> None:
+    """
+    Index a batch of documents with a bulk request.
+
+    If the whole request fails with a retryable error or some documents are rejected, the remaining
+    documents are retried with exponential backoff. Other indexing errors are raised immediately.
+    """
+    pending = documents
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            time.sleep(min(60, 2**attempt))
+
+        start = time.perf_counter()
+        try:
+            response = es_client.bulk(body=_bulk_request_body(pending), index=index, request_timeout=request_timeout)
+        except elasticsearch.TransportError as error:
+            if not _is_retryable_error(error):
+                raise
+
+            logger.warning(f"Bulk request failed ({error}), retrying")
+            batch_size.record_rejection()
+            continue
+
+        latency = time.perf_counter() - start
+
+        if not response.get("errors"):
+            batch_size.record_success(latency)
+            return
+
+        rejected = []
+        for document, item in zip(pending, response["items"]):
+            result = next(iter(item.values()))
+            if result["status"] in RETRYABLE_STATUS_CODES:
+                rejected.append(document)
+            elif result["status"] >= 300:
+                raise RuntimeError(f"Failed to index document {document[0]}: {json.dumps(result.get('error'))}")
+
+        logger.warning(f"{len(rejected)} of {len(pending)} documents rejected, retrying")
+        batch_size.record_rejection()
+        pending = rejected
+
+    raise RuntimeError(f"Failed to index {len(pending)} documents after {max_retries} retries")
+
+
+def parse_document_line(line: str, has_ids: bool, encode_values: bool = False) -> Tuple[Optional[str], str]:
+    fields = line.rstrip("\n").split("\t")
+    document_id = fields.pop(0) if has_ids else None
+    document = fields[0]
+    if encode_values:
+        document = add_encoded_value(document, fields[1])
+
+    return (document_id, document)
+
+
+def bulk_index_partition(
+    es_client,
+    index: str,
+    lines: Iterable[str],
+    batch_size: AdaptiveBatchSize,
+    *,
+    has_ids: bool,
+    max_retries: int = 5,
+    progress: Optional[BulkLoadProgress] = None,
+    throughput_budget: Optional[ThroughputBudget] = None,
+    encode_values: bool = False,
+) -> int:
+    """
+    Index all documents from one exported table partition.
+
+    Return:
+        int: number of documents indexed
+    """
+    n_documents = 0
+    batch: List[Tuple[Optional[str], str]] = []
+
+    def send_batch():
+        if throughput_budget:
+            throughput_budget.acquire(len(batch))
+        send_bulk_request(es_client, index, batch, batch_size, max_retries=max_retries)
+        if progress:
+            progress.record_documents(len(batch), batch_size)
+
+    for line in lines:
+        if not line.strip():
+            continue
+
+        batch.append(parse_document_line(line, has_ids, encode_values))
+        if len(batch) >= batch_size.size:
+            send_batch()
+            n_documents += len(batch)
+            batch = []
+
+    if batch:
+        send_batch()
+        n_documents += len(batch)
+
+    return n_documents
+
+
+def export_table_to_document_partitions(
+    table: hl.Table, path: str, id_field: Optional[str] = None, value_field: Optional[str] = None
+) -> List[str]:
+    """
+    Export a table's rows as JSON documents, with one file per table partition.
+
+    If id_field is given, each line starts with the document ID followed by a tab. If value_field is given,
+    that field is left out of the document and exported as JSON in a separate tab-separated column so that
+    it can be encoded when loading.
+
+    Return:
+        list: paths of exported partition files, in partition order
+    """
+    table = table.key_by()
+    documents = table.select(
+        **({"document_id": hl.str(table[id_field])} if id_field else {}),
+        document=hl.json(table.row.drop(value_field) if value_field else table.row),
+        **({"value": hl.json(table[value_field])} if value_field else {}),
+    )
+    documents.export(path, header=False, parallel="separate_header")
+
+    return list_document_partitions(path)
+
+
+def list_document_partitions(path: str) -> List[str]:
+    """
+    List partition files previously exported with export_table_to_document_partitions.
+
+    Return:
+        list: paths of partition files, in partition order
+    """
+    if not hl.hadoop_exists(path):
+        return []
+
+    return sorted(f["path"] for f in hl.hadoop_ls(path) if not f["is_dir"] and "part-" in f["path"].split("/")[-1])
+
+
+def get_partition_index(path: str) -> int:
+    match = re.match(r"part-(\d+)", path.split("/")[-1])
+    if not match:
+        raise ValueError(f"Unable to determine partition index for {path}")
+
+    return int(match.group(1))
+
+
+class ExportLedger:
+    """
+    Record of which exported table partitions have been fully acknowledged by Elasticsearch.
+
+    The ledger is stored in a small index on the target cluster, so an interrupted export can be resumed
+    with only the name of the index it was loading into. Partitions are identified by their index in the
+    table, which does not change if the table is exported to document files again.
+    """
+
+    def __init__(self, es_client, index: str, ledger_index: str = EXPORT_LEDGER_INDEX):
+        self.es_client = es_client
+        self.index = index
+        self.ledger_index = ledger_index
+
+    def _create_ledger_index(self) -> None:
+        if self.es_client.indices.exists(index=self.ledger_index):
+            return
+
+        self.es_client.indices.create(
+            index=self.ledger_index,
+            body={
+                "mappings": {
+                    "properties": {
+                        "index": {"type": "keyword"},
+                        "type": {"type": "keyword"},
+                        "partition": {"type": "integer"},
+                        "documents": {"type": "long"},
+                        "staging_path": {"type": "keyword", "index": False},
+                        "value_encoding": {"type": "keyword", "index": False},
+                        "partitions": {"type": "integer"},
+                        "completed": {"type": "boolean"},
+                        "updated_at": {"type": "date"},
+                    }
+                },
+                "settings": {"index.number_of_shards": 1},
+            },
+            ignore=400,  # Ignore error if another export created the index first
+        )
+
+    def start(self, staging_path: str, n_partitions: int, value_encoding: str = "json") -> None:
+        self._create_ledger_index()
+        self.es_client.index(
+            index=self.ledger_index,
+            id=self.index,
+            body={
+                "index": self.index,
+                "type": "export",
+                "staging_path": staging_path,
+                "partitions": n_partitions,
+                "value_encoding": value_encoding,
+                "completed": False,
+                "updated_at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+            },
+            refresh=True,
+        )
+
+    def get_export(self) -> Optional[dict]:
+        try:
+            return self.es_client.get(index=self.ledger_index, id=self.index)["_source"]
+        except elasticsearch.NotFoundError:
+            return None
+
+    def record_partition(self, partition: int, n_documents: int) -> None:
+        self.es_client.index(
+            index=self.ledger_index,
+            id=f"{self.index}/{partition}",
+            body={
+                "index": self.index,
+                "type": "partition",
+                "partition": partition,
+                "documents": n_documents,
+                "updated_at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+            },
+        )
+
+    def completed_partitions(self) -> Set[int]:
+        self.es_client.indices.refresh(index=self.ledger_index)
+        query = {
+            "query": {"bool": {"filter": [{"term": {"index": self.index}}, {"term": {"type": "partition"}}]}},
+            "_source": ["partition"],
+        }
+        return {
+            doc["_source"]["partition"]
+            for doc in elasticsearch.helpers.scan(self.es_client, index=self.ledger_index, query=query)
+        }
+
+    def finish(self) -> None:
+        self.es_client.update(
+            index=self.ledger_index,
+            id=self.index,
+            body={"doc": {"completed": True, "updated_at": datetime.datetime.utcnow().isoformat(timespec="seconds")}},
+            refresh=True,
+        )
+
+
+def _open_partition(path: str):
+    return hl.hadoop_open(path, "r")
+
+
+def bulk_load_partitions(
+    es_client,
+    index: str,
+    partition_paths: List[str],
+    *,
+    has_ids: bool,
+    initial_batch_size: int,
+    num_workers: int = 8,
+    max_retries: int = 5,
+    encode_values: bool = False,
+    ledger: Optional[ExportLedger] = None,
+    throughput_budget: Optional[ThroughputBudget] = None,
+    progress_monitor: Optional[ExportProgressMonitor] = None,
+    progress_name: Optional[str] = None,
+    open_partition: Callable = _open_partition,
+) -> None:
+    """
+    Index exported table partitions into Elasticsearch using concurrent workers.
+
+    Each partition is loaded by a single worker. If loading a partition fails, other partitions continue
+    loading and an error listing all failed partitions is raised at the end.
+
+    If a ledger is given, partitions already recorded in it are skipped and each partition is recorded
+    once all of its documents have been acknowledged.
+
+    If a progress monitor is given, progress is reported to it under progress_name (or the index name)
+    instead of being logged separately.
+
+    If encode_values is true, partitions must have been exported with a value_field, which is encoded with
+    add_encoded_value.
+    """
+    if ledger:
+        completed_partitions = ledger.completed_partitions()
+        if completed_partitions:
+            logger.info(f"Skipping {len(completed_partitions)} partitions already loaded into {index}")
+
+        partition_paths = [path for path in partition_paths if get_partition_index(path) not in completed_partitions]
+
+    batch_size = AdaptiveBatchSize(initial_batch_size)
+    progress = BulkLoadProgress(len(partition_paths), log_interval=float("inf") if progress_monitor else 60.0)
+    if progress_monitor:
+        progress_monitor.track_bulk_load(progress_name or index, progress)
+
+    def load_partition(path):
+        with open_partition(path) as f:
+            n_documents = bulk_index_partition(
+                es_client,
+                index,
+                f,
+                batch_size,
+                has_ids=has_ids,
+                max_retries=max_retries,
+                progress=progress,
+                throughput_budget=throughput_budget,
+                encode_values=encode_values,
+            )
+
+        if ledger:
+            ledger.record_partition(get_partition_index(path), n_documents)
+
+        progress.record_partition()
+        return n_documents
+
+    failed_partitions = []
+    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="bulk") as executor:
+        futures = {executor.submit(load_partition, path): path for path in partition_paths}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception(f"Failed to load partition {futures[future]}")
+                failed_partitions.append(futures[future])
+
+    progress.log()
+
+    if failed_partitions:
+        raise RuntimeError(
+            f"Failed to load {len(failed_partitions)} of {len(partition_paths)} partitions: "
+            + ", ".join(sorted(failed_partitions))
+        )
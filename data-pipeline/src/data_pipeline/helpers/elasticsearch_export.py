@@ -1,10 +1,25 @@
 import datetime
 import json
+import math
 import re
 from functools import reduce
+from typing import Dict, List, Optional
 
+import attr
 import elasticsearch
 import hail as hl
+from loguru import logger
+
+from data_pipeline.helpers.elasticsearch_bulk_export import (
+    ExportLedger,
+    bulk_load_partitions,
+    export_table_to_document_partitions,
+    list_document_partitions,
+)
+from data_pipeline.helpers.elasticsearch_value_encoding import VALUE_ENCODINGS, decode_value
+
+
+EXPORT_ENGINES = ["es-hadoop", "bulk"]
 
 
 HAIL_TYPE_TO_ES_TYPE_MAPPING = {
@@ -93,6 +108,258 @@ def get_index_fields(table, index_fields):
     return {field.split(".")[-1]: _get_index_field(field) for field in index_fields}
 
 
+@attr.define
+class MappingHints:
+    """
+    How queries use an index's fields, used to leave unneeded data structures out of its mapping.
+
+    Fields are given as dotted paths and a hint for a field applies to all fields within it.
+
+    Attributes:
+        searched_fields: fields used in queries, which are indexed
+        aggregated_fields: fields used in aggregations or sorting (including index sorting), which have doc values
+        nested_fields: arrays of structs that are queried with nested queries. Other arrays of structs are mapped
+            as objects instead of nested documents.
+        field_types: Elasticsearch types for fields, for example "half_float" or
+            {"type": "scaled_float", "scaling_factor": 100}
+    """
+
+    searched_fields: List[str] = attr.field(factory=list)
+    aggregated_fields: List[str] = attr.field(factory=list)
+    nested_fields: List[str] = attr.field(factory=list)
+    field_types: Dict = attr.field(factory=dict)
+
+
+def _field_matches(field, hinted_fields):
+    return any(field == hinted_field or field.startswith(f"{hinted_field}.") for hinted_field in hinted_fields)
+
+
+def optimize_mapping(mapping, mapping_hints):
+    """
+    Update a mapping so that only fields used by queries are indexed or have doc values.
+
+    Values for all fields are still returned in documents' _source.
+    """
+
+    def _optimize_properties(properties, prefix):
+        for name, field_mapping in properties.items():
+            field = f"{prefix}{name}"
+
+            if field_mapping.get("enabled") is False:
+                continue
+
+            if "properties" in field_mapping:
+                if field_mapping.get("type") == "nested" and not _field_matches(field, mapping_hints.nested_fields):
+                    del field_mapping["type"]
+
+                _optimize_properties(field_mapping["properties"], f"{field}.")
+                continue
+
+            if field in mapping_hints.field_types:
+                field_type = mapping_hints.field_types[field]
+                field_mapping.clear()
+                field_mapping.update({"type": field_type} if isinstance(field_type, str) else field_type)
+
+            # Binary fields are never indexed and do not accept the index parameter
+            if field_mapping.get("type") != "binary" and not _field_matches(field, mapping_hints.searched_fields):
+                field_mapping["index"] = False
+
+            if not _field_matches(field, mapping_hints.aggregated_fields):
+                field_mapping["doc_values"] = False
+
+    _optimize_properties(mapping["properties"], "")
+    return mapping
+
+
+@attr.define
+class LoadProfile:
+    """
+    Index settings used while loading documents into an index and the optimizations applied once loading finishes.
+
+    Attributes:
+        bulk_settings: index settings to use while loading, in addition to or overriding the defaults
+        replicas: number of replicas to set after loading (None leaves the index without replicas)
+        refresh_interval: refresh interval to set after loading (None resets it to Elasticsearch's default)
+        max_num_segments: number of segments to merge each shard into after loading (None lets Elasticsearch decide)
+        index_sort: fields to sort documents in each shard by
+        eager_global_ordinals: keyword fields to build global ordinals for at refresh instead of on first search
+        store_preload: Lucene file extensions to preload into the filesystem cache when shards are opened
+    """
+
+    bulk_settings: Dict = attr.field(factory=dict)
+    replicas: Optional[int] = None
+    refresh_interval: Optional[str] = None
+    max_num_segments: Optional[int] = None
+    index_sort: List[str] = attr.field(factory=list)
+    eager_global_ordinals: List[str] = attr.field(factory=list)
+    store_preload: List[str] = attr.field(factory=list)
+
+
+def get_index_settings(num_shards, load_profile):
+    # https://www.elastic.co/guide/en/elasticsearch/reference/current/index-modules.html#index-modules-settings
+    settings = {
+        "index.codec": "best_compression",
+        "index.mapping.total_fields.limit": 10000,
+        "index.number_of_replicas": 0,
+        "index.number_of_shards": num_shards,
+        "index.refresh_interval": -1,
+    }
+
+    # https://www.elastic.co/guide/en/elasticsearch/reference/current/index-modules-index-sorting.html
+    if load_profile.index_sort:
+        settings["index.sort.field"] = load_profile.index_sort
+        settings["index.sort.order"] = ["asc"] * len(load_profile.index_sort)
+
+    # https://www.elastic.co/guide/en/elasticsearch/reference/current/preload-data-to-file-system-cache.html
+    if load_profile.store_preload:
+        settings["index.store.preload"] = load_profile.store_preload
+
+    settings.update(load_profile.bulk_settings)
+    return settings
+
+
+def finalize_index(es_client, index, load_profile):
+    """
+    Prepare a loaded index for serving queries.
+
+    Segments are merged before replicas are added so that replicas copy the merged segments.
+    """
+    es_client.indices.put_settings(index=index, body={"index.refresh_interval": load_profile.refresh_interval})
+    es_client.indices.refresh(index=index)
+
+    forcemerge_args = {}
+    if load_profile.max_num_segments is not None:
+        forcemerge_args["max_num_segments"] = load_profile.max_num_segments
+    es_client.indices.forcemerge(index=index, request_timeout=24 * 60 * 60, **forcemerge_args)
+
+    if load_profile.replicas:
+        es_client.indices.put_settings(index=index, body={"index.number_of_replicas": load_profile.replicas})
+
+
+def _documents_match(expected, actual):
+    # Elasticsearch-Hadoop omits null fields and may serialize floats with a different precision
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        expected = {k: v for k, v in expected.items() if v is not None}
+        actual = {k: v for k, v in actual.items() if v is not None}
+        return expected.keys() == actual.keys() and all(_documents_match(expected[k], actual[k]) for k in expected)
+
+    if isinstance(expected, list) and isinstance(actual, list):
+        return len(expected) == len(actual) and all(_documents_match(e, a) for e, a in zip(expected, actual))
+
+    if isinstance(expected, float) or isinstance(actual, float):
+        return isinstance(actual, (int, float)) and math.isclose(expected, actual, rel_tol=1e-6)
+
+    return expected == actual
+
+
+def validate_index(es_client, index, table, id_field=None, value_encoding="json", n_sample_documents=10):
+    """
+    Check that an index contains one document for each row of a table.
+
+    If documents have IDs, also check that a sample of documents retrieved from the index match their table rows.
+    Raises a RuntimeError if validation fails.
+    """
+    es_client.indices.refresh(index=index)
+    n_documents = es_client.count(index=index)["count"]
+    n_rows = table.count()
+    if n_documents != n_rows:
+        raise RuntimeError(f"Index {index} contains {n_documents:,} documents, expected {n_rows:,}")
+
+    if id_field is None:
+        logger.info(f"Documents in {index} do not have IDs, skipping sample document comparison")
+        return
+
+    table = table.key_by()
+    sample = table.select(document_id=hl.str(table[id_field]), document=hl.json(table.row)).head(n_sample_documents)
+    sample = sample.collect()
+
+    response = es_client.mget(index=index, body={"ids": [row.document_id for row in sample]})
+    for row, doc in zip(sample, response["docs"]):
+        if not doc.get("found"):
+            raise RuntimeError(f"Document {row.document_id} not found in index {index}")
+
+        document = doc["_source"]
+        if value_encoding != "json":
+            document = {**document, "value": decode_value(document["value"])}
+
+        if not _documents_match(json.loads(row.document), document):
+            raise RuntimeError(f"Document {row.document_id} in index {index} does not match table row")
+
+
+def _get_aliased_indices(es_client, alias):
+    if not es_client.indices.exists_alias(name=alias):
+        return set()
+
+    return set(es_client.indices.get_alias(name=alias))
+
+
+def update_alias(es_client, alias, index):
+    """
+    Atomically point an alias at an index, removing it from any other indices.
+    """
+    actions = [
+        {"remove": {"index": aliased_index, "alias": alias}}
+        for aliased_index in sorted(_get_aliased_indices(es_client, alias))
+        if aliased_index != index
+    ]
+    actions.append({"add": {"index": index, "alias": alias}})
+    es_client.indices.update_aliases(body={"actions": actions})
+
+
+def delete_old_indices(es_client, alias, retain_indices):
+    """
+    Delete indices created by previous exports to an alias, keeping the most recent retain_indices indices.
+
+    Indices that the alias points to are never deleted.
+
+    Return:
+        list: names of deleted indices
+    """
+    # Names of indices created by export_table_to_elasticsearch, <alias>-<timestamp>
+    index_name_pattern = re.compile(rf"^{re.escape(alias)}-\d{{4}}-\d{{2}}-\d{{2}}--\d{{2}}-\d{{2}}$")
+
+    indices = es_client.cat.indices(  # pylint: disable=unexpected-keyword-arg
+        index=f"{alias}-*", format="json", h="index"
+    )
+    indices = sorted((i["index"] for i in indices if index_name_pattern.match(i["index"])), reverse=True)
+
+    aliased_indices = _get_aliased_indices(es_client, alias)
+
+    deleted_indices = []
+    for index in indices[retain_indices:]:
+        if index not in aliased_indices:
+            logger.info(f"Deleting index {index}")
+            es_client.indices.delete(index=index)
+            deleted_indices.append(index)
+
+    return deleted_indices
+
+
+def _create_index(es_client, cluster_name, index, request_body):
+    if es_client.indices.exists(index=index):
+        es_client.indices.delete(index=index)
+
+    es_client.indices.create(index=index, body=request_body)
+
+    # Automatically set shard allocation based on available nodes.
+    # If temporary ingest nodes are present, use them. Otherwise, use existing permanent data nodes.
+    nodes = es_client.cat.nodes(format="json", h="name")  # pylint: disable=unexpected-keyword-arg
+    node_names = [node["name"] for node in nodes]
+    node_sets = set(re.sub(r"-[0-9]+$", "", node_name[len(f"{cluster_name}-es-") :]) for node_name in node_names)
+
+    if "ingest" in node_sets:
+        es_client.indices.put_settings(
+            index=index, body={"index.routing.allocation.require._name": f"{cluster_name}-es-ingest-*"}
+        )
+    else:
+        data_node_sets = [node_set for node_set in node_sets if node_set.startswith("data-")]
+        if len(data_node_sets) == 1:
+            es_client.indices.put_settings(
+                index=index,
+                body={"index.routing.allocation.require._name": f"{cluster_name}-es-{data_node_sets[0]}-*"},
+            )
+
+
 def export_table_to_elasticsearch(
     table,
     host,
@@ -103,7 +370,67 @@ def export_table_to_elasticsearch(
     id_field=None,
     index_fields=None,
     num_shards=1,
+    engine="es-hadoop",
+    bulk_workers=8,
+    staging_path=None,
+    resume_index=None,
+    throughput_budget=None,
+    progress_monitor=None,
+    load_profile=None,
+    mapping_hints=None,
+    value_encoding="json",
+    update_index_alias=False,
+    retain_indices=None,
 ):
+    """
+    Export a Hail table to a new Elasticsearch index named <index>-<timestamp>.
+
+    Args:
+        engine: "es-hadoop" to load documents from Spark executors with the Elasticsearch-Hadoop connector, or
+            "bulk" to export documents to files (one per table partition) and stream them to the bulk API from
+            the driver with concurrent workers, adaptive batch sizes, and retries
+        bulk_workers: number of concurrent workers for the bulk engine
+        staging_path: location for files exported by the bulk engine (defaults to a Hail temporary file)
+        resume_index: name of an existing index to resume a bulk export into. Only partitions that the export's
+            ledger does not record as loaded are sent. If the staged files no longer exist, the table is exported
+            to files again. Requires an id_field, since partly loaded partitions are sent again.
+        throughput_budget: ThroughputBudget limiting the rate of documents sent by the bulk engine, which may be
+            shared with other concurrent exports
+        progress_monitor: ExportProgressMonitor to report bulk engine progress to, under the index argument
+        load_profile: LoadProfile or dict of LoadProfile attributes for index settings and post-load optimizations
+        mapping_hints: MappingHints or dict of MappingHints attributes. If given, only fields used by queries are
+            indexed or have doc values.
+        value_encoding: how to store the value field if index_fields are given (one of VALUE_ENCODINGS).
+            Encodings other than "json" require the bulk engine.
+        update_index_alias: validate the new index against the table and, if valid, point an alias named <index>
+            at it
+        retain_indices: after updating the alias, delete all but this many of the most recent <index>-<timestamp>
+            indices (None keeps all indices)
+    """
+    if engine not in EXPORT_ENGINES:
+        raise ValueError(f"Invalid export engine '{engine}'. Allowed values are: {', '.join(EXPORT_ENGINES)}")
+
+    if resume_index and engine != "bulk":
+        raise ValueError("Only exports using the bulk engine can be resumed")
+
+    # Partly loaded partitions are sent again in full when resuming, which would duplicate documents without IDs
+    if resume_index and id_field is None:
+        raise ValueError("Only exports of documents with IDs can be resumed")
+
+    if value_encoding not in VALUE_ENCODINGS:
+        raise ValueError(f"Invalid value encoding '{value_encoding}'. Allowed values are: {', '.join(VALUE_ENCODINGS)}")
+
+    # Only documents with index_fields have a value field
+    encode_values = value_encoding != "json" and bool(index_fields)
+    value_encoding_for_export = value_encoding if encode_values else "json"
+    if encode_values and engine != "bulk":
+        raise ValueError(f"The {value_encoding} value encoding requires the bulk engine")
+
+    if load_profile is None:
+        load_profile = LoadProfile()
+    elif isinstance(load_profile, dict):
+        load_profile = LoadProfile(**load_profile)
+
     export_time = datetime.datetime.utcnow()
 
     table = table.select_globals(exported_at=export_time.isoformat(timespec="seconds"), table_globals=table.globals)
@@ -115,9 +442,20 @@ def export_table_to_elasticsearch(
 
         table = table.select(**get_index_fields(table, index_fields), value=table.row)
         mapping = elasticsearch_mapping_for_table(table, disable_fields=("value",))
+        if encode_values:
+            mapping["properties"]["value"] = {"type": "binary"}
     else:
         mapping = elasticsearch_mapping_for_table(table)
 
+    if mapping_hints is not None:
+        if isinstance(mapping_hints, dict):
+            mapping_hints = MappingHints(**mapping_hints)
+
+        mapping = optimize_mapping(mapping, mapping_hints)
+
+    for field in load_profile.eager_global_ordinals:
+        _set_field_parameter(mapping, field, "eager_global_ordinals", True)
+
     mapping["_meta"] = json.loads(hl.eval(hl.json(table.globals)))
 
     # Hard code type name for all indices
@@ -126,55 +464,84 @@ def export_table_to_elasticsearch(
     # https://www.elastic.co/guide/en/elasticsearch/reference/7.x/removal-of-types.html
     type_name = "_doc"
 
-    # https://www.elastic.co/guide/en/elasticsearch/reference/current/index-modules.html#index-modules-settings
-    request_body = {
-        "mappings": mapping,
-        "settings": {
-            "index.codec": "best_compression",
-            "index.mapping.total_fields.limit": 10000,
-            "index.number_of_replicas": 0,
-            "index.number_of_shards": num_shards,
-            "index.refresh_interval": -1,
-        },
-    }
+    request_body = {"mappings": mapping, "settings": get_index_settings(num_shards, load_profile)}
 
-    es_client = elasticsearch.Elasticsearch(host, port=9200, http_auth=auth)
+    es_client = elasticsearch.Elasticsearch(host, port=9200, http_auth=auth, maxsize=max(10, bulk_workers))
     cluster_name = es_client.cluster.health()["cluster_name"]
 
-    index = f"{index}-{export_time.strftime('%Y-%m-%d--%H-%M')}"
-
-    if es_client.indices.exists(index=index):
-        es_client.indices.delete(index=index)
-
-    es_client.indices.create(index=index, body=request_body)
-
-    # Automatically set shard allocation based on available nodes.
-    # If temporary ingest nodes are present, use them. Otherwise, use existing permanent data nodes.
-    nodes = es_client.cat.nodes(format="json", h="name")  # pylint: disable=unexpected-keyword-arg
-    node_names = [node["name"] for node in nodes]
-    node_sets = set(re.sub(r"-[0-9]+$", "", node_name[len(f"{cluster_name}-es-") :]) for node_name in node_names)
+    alias = index
+    if resume_index:
+        if not es_client.indices.exists(index=resume_index):
+            raise RuntimeError(f"Unable to resume export, index '{resume_index}' does not exist")
 
-    if "ingest" in node_sets:
-        es_client.indices.put_settings(
-            index=index, body={"index.routing.allocation.require._name": f"{cluster_name}-es-ingest-*"}
-        )
+        index = resume_index
     else:
-        data_node_sets = [node_set for node_set in node_sets if node_set.startswith("data-")]
-        if len(data_node_sets) == 1:
-            es_client.indices.put_settings(
-                index=index,
-                body={"index.routing.allocation.require._name": f"{cluster_name}-es-{data_node_sets[0]}-*"},
+        index = f"{index}-{export_time.strftime('%Y-%m-%d--%H-%M')}"
+        _create_index(es_client, cluster_name, index, request_body)
+
+    if engine == "bulk":
+        ledger = ExportLedger(es_client, index)
+        if resume_index:
+            export = ledger.get_export()
+            if not export:
+                raise RuntimeError(f"Unable to resume export, no export ledger found for index '{index}'")
+
+            # Exports started before the ledger recorded value encodings did not encode values
+            if export.get("value_encoding", "json") != value_encoding_for_export:
+                raise RuntimeError(
+                    f"Unable to resume export, index '{index}' was loaded with "
+                    f"{export.get('value_encoding', 'json')} value encoding"
+                )
+
+            staging_path = export["staging_path"]
+            partition_paths = list_document_partitions(staging_path)
+            if len(partition_paths) != export["partitions"]:
+                partition_paths = export_table_to_document_partitions(
+                    table, staging_path, id_field=id_field, value_field="value" if encode_values else None
+                )
+                if len(partition_paths) != export["partitions"]:
+                    raise RuntimeError(
+                        f"Unable to resume export, table has {len(partition_paths)} partitions "
+                        f"but export ledger has {export['partitions']}"
+                    )
+        else:
+            staging_path = staging_path or hl.utils.new_temp_file("elasticsearch_export", "json")
+            partition_paths = export_table_to_document_partitions(
+                table, staging_path, id_field=id_field, value_field="value" if encode_values else None
             )
+            ledger.start(staging_path, len(partition_paths), value_encoding=value_encoding_for_export)
+
+        bulk_load_partitions(
+            es_client,
+            index,
+            partition_paths,
+            has_ids=id_field is not None,
+            initial_batch_size=block_size,
+            num_workers=bulk_workers,
+            encode_values=encode_values,
+            ledger=ledger,
+            throughput_budget=throughput_budget,
+            progress_monitor=progress_monitor,
+            progress_name=alias,
+        )
+        ledger.finish()
+    else:
+        elasticsearch_config = {"es.write.operation": "index"}
+
+        if auth:
+            elasticsearch_config["es.net.http.auth.user"] = auth[0]
+            elasticsearch_config["es.net.http.auth.pass"] = auth[1]
 
-    elasticsearch_config = {"es.write.operation": "index"}
+        if id_field is not None:
+            elasticsearch_config["es.mapping.id"] = id_field
 
-    if auth:
-        elasticsearch_config["es.net.http.auth.user"] = auth[0]
-        elasticsearch_config["es.net.http.auth.pass"] = auth[1]
+        hl.export_elasticsearch(table, host, 9200, index, type_name, block_size, elasticsearch_config, True)
 
-    if id_field is not None:
-        elasticsearch_config["es.mapping.id"] = id_field
+    finalize_index(es_client, index, load_profile)
 
-    hl.export_elasticsearch(table, host, 9200, index, type_name, block_size, elasticsearch_config, True)
+    if update_index_alias:
+        validate_index(es_client, index, table, id_field=id_field, value_encoding=value_encoding_for_export)
+        update_alias(es_client, alias, index)
 
-    es_client.indices.forcemerge(index=index)
+        if retain_indices is not None:
+            delete_old_indices(es_client, alias, retain_indices)
@@ -0,0 +1,33 @@
+import base64
+import json
+import zlib
+
+# Encodings for the value field of documents exported with index_fields
+# json: value is stored as an object in _source
+# zlib: value is stored as zlib compressed JSON in a binary field (base64 encoded in _source)
+VALUE_ENCODINGS = ["json", "zlib"]
+
+
+def encode_value(value_json: str, compression_level: int = 6) -> str:
+    return base64.b64encode(zlib.compress(value_json.encode("utf8"), compression_level)).decode("ascii")
+
+
+def decode_value(encoded_value: str):
+    """
+    Decode a value stored with the zlib encoding.
+
+    Elasticsearch clients can fetch documents as usual and decode the value field of each document's _source
+    with this (or an equivalent function that base64 decodes, inflates, and parses JSON).
+    """
+    return json.loads(zlib.decompress(base64.b64decode(encoded_value)).decode("utf8"))
+
+
+def add_encoded_value(document: str, value_json: str, field: str = "value") -> str:
+    """
+    Add an encoded value to a JSON document without parsing the document.
+    """
+    if not document.endswith("}"):
+        raise ValueError("Document must be a JSON object")
+
+    separator = "," if document.rstrip("}").strip() != "{" else ""
+    return f'{document[:-1]}{separator}"{field}":"{encode_value(value_json)}"}}'
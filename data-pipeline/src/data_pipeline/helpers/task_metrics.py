@@ -0,0 +1,201 @@
+import csv
+import io
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import attr
+import hail as hl
+from cattrs import unstructure
+from loguru import logger
+
+
+@attr.define
+class TableStats:
+    rows: int
+    partitions: int
+    size_bytes: int
+
+
+@attr.define
+class TaskMetrics:
+    task_name: str
+    ran: bool
+    wall_time: float
+    spark_jobs: Optional[int] = None
+    spark_stages: Optional[int] = None
+    shuffle_read_bytes: Optional[int] = None
+    shuffle_write_bytes: Optional[int] = None
+    # Highest JVM heap usage of any executor during any of the task's stages
+    peak_executor_memory_bytes: Optional[int] = None
+    inputs: Dict[str, Optional[TableStats]] = attr.Factory(dict)
+    output: Optional[TableStats] = None
+
+
+def get_table_stats(path: str) -> Optional[TableStats]:
+    """
+    Get row count, partition count, and size for a Hail table from its metadata, without running a Spark job.
+
+    Returns None for paths that are not Hail tables.
+    """
+    path = path.rstrip("/")
+    if not path.endswith(".ht"):
+        return None
+
+    with hl.hadoop_open(f"{path}/metadata.json.gz", "r") as f:
+        metadata = json.load(f)
+
+    partition_counts = metadata["components"]["partition_counts"]["counts"]
+    size_bytes = sum(
+        f["size_bytes"]
+        for component in ["globals", "rows"]
+        for f in hl.hadoop_ls(f"{path}/{component}/parts")
+        if not f["is_dir"]
+    )
+
+    return TableStats(rows=sum(partition_counts), partitions=len(partition_counts), size_bytes=size_bytes)
+
+
+class SparkStatusClient:
+    """
+    Read job and stage metrics from the Spark monitoring REST API of the current Hail session.
+
+    https://spark.apache.org/docs/latest/monitoring.html#rest-api
+    """
+
+    def __init__(self):
+        self._spark_context = hl.spark_context()
+        self._base_url = f"{self._spark_context.uiWebUrl}/api/v1/applications/{self._spark_context.applicationId}"
+
+    def _get(self, endpoint):
+        with urllib.request.urlopen(f"{self._base_url}/{endpoint}", timeout=60) as response:
+            return json.load(response)
+
+    def set_job_group(self, job_group: str, description: str) -> None:
+        # Spark jobs are attributed to a job group by thread, so this must be called from the thread running the task.
+        self._spark_context.setJobGroup(job_group, description)
+
+    def get_job_group_metrics(self, job_group: str) -> dict:
+        jobs = [job for job in self._get("jobs") if job.get("jobGroup") == job_group]
+
+        stages = []
+        for stage_id in sorted({stage_id for job in jobs for stage_id in job["stageIds"]}):
+            try:
+                stages.extend(self._get(f"stages/{stage_id}"))
+            except urllib.error.HTTPError:
+                # Stages that were skipped because their output was already available are not listed
+                continue
+
+        return {
+            "spark_jobs": len(jobs),
+            "spark_stages": len(stages),
+            "shuffle_read_bytes": sum(stage.get("shuffleReadBytes", 0) for stage in stages),
+            "shuffle_write_bytes": sum(stage.get("shuffleWriteBytes", 0) for stage in stages),
+            "peak_executor_memory_bytes": max(
+                (stage.get("peakExecutorMetrics", {}).get("JVMHeapMemory", 0) for stage in stages), default=0
+            ),
+        }
+
+
+class PipelineProfiler:
+    """
+    Collects metrics for each task run by a pipeline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.task_metrics: List[TaskMetrics] = []
+
+        try:
+            self._spark_status: Optional[SparkStatusClient] = SparkStatusClient()
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Unable to connect to Spark status API, Spark metrics will not be collected")
+            self._spark_status = None
+
+    def run_task(
+        self, task_name: str, run: Callable[[], bool], input_paths: Dict[str, str], output_path: str
+    ) -> TaskMetrics:
+        job_group = f"{task_name}-{uuid.uuid4().hex[:8]}"
+        if self._spark_status:
+            self._spark_status.set_job_group(job_group, task_name)
+
+        start = time.perf_counter()
+        ran = run()
+        metrics = TaskMetrics(task_name=task_name, ran=bool(ran), wall_time=time.perf_counter() - start)
+
+        if ran:
+            try:
+                if self._spark_status:
+                    for field, value in self._spark_status.get_job_group_metrics(job_group).items():
+                        setattr(metrics, field, value)
+
+                metrics.inputs = {name: get_table_stats(path) for name, path in input_paths.items()}
+                metrics.output = get_table_stats(output_path)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception(f"Unable to collect metrics for {task_name}")
+
+        with self._lock:
+            self.task_metrics.append(metrics)
+
+        return metrics
+
+    def write_report(self, report_path_prefix: str) -> None:
+        """
+        Write collected metrics to <report_path_prefix>.json and <report_path_prefix>.csv.
+        """
+        with hl.hadoop_open(f"{report_path_prefix}.json", "w") as f:
+            f.write(json.dumps(unstructure(self.task_metrics), indent=2))
+
+        with hl.hadoop_open(f"{report_path_prefix}.csv", "w") as f:
+            f.write(task_metrics_csv(self.task_metrics))
+
+        logger.info(f"Wrote task metrics to {report_path_prefix}.json and {report_path_prefix}.csv")
+
+
+TASK_METRICS_CSV_COLUMNS = [
+    "task_name",
+    "ran",
+    "wall_time",
+    "spark_jobs",
+    "spark_stages",
+    "shuffle_read_bytes",
+    "shuffle_write_bytes",
+    "peak_executor_memory_bytes",
+    "input_rows",
+    "input_partitions",
+    "output_rows",
+    "output_partitions",
+    "output_size_bytes",
+]
+
+
+def task_metrics_csv(task_metrics: List[TaskMetrics]) -> str:
+    """
+    Format task metrics as CSV, with one row per task. Input stats are summed over all Hail table inputs.
+    """
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=TASK_METRICS_CSV_COLUMNS)
+    writer.writeheader()
+
+    for metrics in task_metrics:
+        input_stats = [stats for stats in metrics.inputs.values() if stats is not None]
+        writer.writerow(
+            {
+                **{
+                    column: getattr(metrics, column)
+                    for column in TASK_METRICS_CSV_COLUMNS
+                    if not column.startswith(("input_", "output_"))
+                },
+                "input_rows": sum(stats.rows for stats in input_stats) if input_stats else None,
+                "input_partitions": sum(stats.partitions for stats in input_stats) if input_stats else None,
+                "output_rows": metrics.output.rows if metrics.output else None,
+                "output_partitions": metrics.output.partitions if metrics.output else None,
+                "output_size_bytes": metrics.output.size_bytes if metrics.output else None,
+            }
+        )
+
+    return output.getvalue()
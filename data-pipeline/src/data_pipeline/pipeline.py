@@ -1,20 +1,30 @@
 import argparse
 import datetime
+import gzip
+import hashlib
+import inspect
+import json
 import os
 import shutil
 import subprocess
+import sys
 import tempfile
+import threading
 import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Callable, Dict, List, Optional, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union, cast
 import attr
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 
 from loguru import logger
 
 import hail as hl
 
 from data_pipeline.config import PipelineConfig
+from data_pipeline.helpers.task_metrics import PipelineProfiler
+from data_pipeline.helpers.timestamp import generate_iso_timestamp_for_filename
 
 
 class GoogleCloudStorageFileSystem:
@@ -31,6 +41,38 @@ class GoogleCloudStorageFileSystem:
         stat = hl.hadoop_stat(path)
         return stat["modification_time"]
 
+    def modified_times(self, directory):  # pylint: disable=no-self-use
+        if not hl.hadoop_exists(directory):
+            return {}
+
+        return {
+            os.path.basename(f["path"].rstrip("/")): f["modification_time"]
+            for f in hl.hadoop_ls(directory)
+            if not f["is_dir"]
+        }
+
+    def file_sizes(self, path):  # pylint: disable=no-self-use
+        return [f["size_bytes"] for f in hl.hadoop_ls(path) if not f["is_dir"]]
+
+    def content_hash(self, path):  # pylint: disable=no-self-use
+        # Use the checksums stored in object metadata instead of downloading the object.
+        # Composite objects only have a CRC32C checksum.
+        output = subprocess.check_output(["gsutil", "stat", path]).decode("utf8")
+        return ",".join(line.strip() for line in output.splitlines() if line.strip().startswith("Hash"))
+
+    def read_text(self, path) -> str:  # pylint: disable=no-self-use
+        with hl.hadoop_open(path, "r") as f:
+            # hadoop_open's return type includes binary files, but files opened in "r" mode read as text
+            return cast(str, f.read())
+
+    def write_text(self, path, text):  # pylint: disable=no-self-use
+        with hl.hadoop_open(path, "w") as f:
+            f.write(text)
+
+    def remove_directory(self, path):  # pylint: disable=no-self-use
+        if hl.hadoop_exists(path):
+            subprocess.check_call(["gsutil", "-m", "-q", "rm", "-r", path])
+
 
 class LocalFileSystem:
     def exists(self, path):  # pylint: disable=no-self-use
@@ -40,22 +82,266 @@ class LocalFileSystem:
         stat_result = os.stat(path)
         return datetime.datetime.fromtimestamp(stat_result.st_mtime)
 
+    def modified_times(self, directory):  # pylint: disable=no-self-use
+        if not os.path.isdir(directory):
+            return {}
+
+        return {
+            entry.name: datetime.datetime.fromtimestamp(entry.stat().st_mtime)
+            for entry in os.scandir(directory)
+            if entry.is_file()
+        }
+
+    def file_sizes(self, path):  # pylint: disable=no-self-use
+        return [entry.stat().st_size for entry in os.scandir(path) if entry.is_file()]
+
+    def content_hash(self, path):  # pylint: disable=no-self-use
+        content_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                content_hash.update(chunk)
+        return content_hash.hexdigest()
+
+    def read_text(self, path) -> str:  # pylint: disable=no-self-use
+        with gzip.open(path, "rt") if path.endswith(".gz") else open(path, "r") as f:
+            return f.read()
+
+    def write_text(self, path, text):  # pylint: disable=no-self-use
+        with open(path, "w") as f:
+            f.write(text)
+
+    def remove_directory(self, path):  # pylint: disable=no-self-use
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+
+def get_file_system(path):
+    return GoogleCloudStorageFileSystem() if path.startswith("gs://") else LocalFileSystem()
+
+
+def _get_check_path(path):
+    path = path.rstrip("/")
+    return path + "/_SUCCESS" if path.endswith(".ht") else path
+
+
+class FileStatCache:
+    """
+    Cache of file existence, modification times, and content fingerprints shared by all tasks in a pipeline run.
+
+    Instead of checking each path individually, the directory containing a path is listed once and
+    the modification times of all files in that directory are cached. Directories can be listed
+    concurrently with `prefetch`. Cached information for a path must be invalidated after it is written.
+    """
+
+    def __init__(self, max_workers: int = 16):
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._listings: Dict[str, dict] = {}
+        self._fingerprints: Dict[str, str] = {}
+
+    def _get_listing(self, directory):
+        with self._lock:
+            if directory in self._listings:
+                return self._listings[directory]
+
+        listing = get_file_system(directory).modified_times(directory)
+
+        with self._lock:
+            return self._listings.setdefault(directory, listing)
+
+    def prefetch(self, paths) -> None:
+        directories = {os.path.dirname(_get_check_path(path)) for path in paths}
+        with self._lock:
+            directories = [directory for directory in directories if directory not in self._listings]
+
+        with ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="stat") as executor:
+            list(executor.map(self._get_listing, directories))
+
+    def exists(self, path) -> bool:
+        check_path = _get_check_path(path)
+        return os.path.basename(check_path) in self._get_listing(os.path.dirname(check_path))
+
+    def modified_time(self, path):
+        check_path = _get_check_path(path)
+        try:
+            return self._get_listing(os.path.dirname(check_path))[os.path.basename(check_path)]
+        except KeyError as error:
+            raise FileNotFoundError(check_path) from error
+
+    def content_fingerprint(self, path) -> str:
+        path = path.rstrip("/")
+        with self._lock:
+            if path in self._fingerprints:
+                return self._fingerprints[path]
+
+        fingerprint = _compute_content_fingerprint(path)
+
+        with self._lock:
+            return self._fingerprints.setdefault(path, fingerprint)
+
+    def invalidate(self, path) -> None:
+        path = path.rstrip("/")
+        with self._lock:
+            self._listings.pop(os.path.dirname(_get_check_path(path)), None)
+            self._listings.pop(os.path.dirname(path), None)
+            self._fingerprints.pop(path, None)
+
+
+_file_stat_cache: Optional[FileStatCache] = None
+
+
+def invalidate_file_stats(path):
+    if _file_stat_cache is not None:
+        _file_stat_cache.invalidate(path)
+
 
 def file_exists(path):
-    file_system = GoogleCloudStorageFileSystem() if path.startswith("gs://") else LocalFileSystem()
-    check_path = path + "/_SUCCESS" if path.endswith(".ht") else path
-    return file_system.exists(check_path)
+    if _file_stat_cache is not None:
+        return _file_stat_cache.exists(path)
+
+    return get_file_system(path).exists(_get_check_path(path))
 
 
 def modified_time(path):
-    file_system = GoogleCloudStorageFileSystem() if path.startswith("gs://") else LocalFileSystem()
-    check_path = path + "/_SUCCESS" if path.endswith(".ht") else path
-    return file_system.modified_time(check_path)
+    if _file_stat_cache is not None:
+        return _file_stat_cache.modified_time(path)
+
+    return get_file_system(path).modified_time(_get_check_path(path))
+
+
+def content_fingerprint(path):
+    if _file_stat_cache is not None:
+        return _file_stat_cache.content_fingerprint(path)
+
+    return _compute_content_fingerprint(path)
+
+
+def _compute_content_fingerprint(path):
+    """
+    Fingerprint the contents of a file or Hail table without comparing modification times.
+
+    For Hail tables, this uses the table metadata (which includes the schema and partition counts)
+    and the sizes of the globals and rows part files. For other files, it uses a hash of the file contents.
+    """
+    path = path.rstrip("/")
+    file_system = get_file_system(path)
+    if path.endswith(".ht"):
+        fingerprint = hashlib.sha256(file_system.read_text(f"{path}/metadata.json.gz").encode("utf8"))
+        for component in ["globals", "rows"]:
+            fingerprint.update(json.dumps(sorted(file_system.file_sizes(f"{path}/{component}/parts"))).encode("utf8"))
+        return fingerprint.hexdigest()
+
+    return file_system.content_hash(path)
+
+
+def _task_function_fingerprint(task_function):
+    try:
+        source = inspect.getsource(task_function)
+    except (OSError, TypeError):
+        source = getattr(task_function, "__qualname__", type(task_function).__name__)
+
+    return hashlib.sha256(source.encode("utf8")).hexdigest()
+
+
+def _build_manifest_path(output_path):
+    return output_path.rstrip("/") + ".manifest.json"
+
+
+def read_build_manifest(output_path):
+    """
+    Read the build manifest recorded for a task output.
+
+    Returns None if there is no manifest or if the output has been modified since the manifest was written.
+    """
+    manifest_path = _build_manifest_path(output_path)
+    if not file_exists(manifest_path):
+        return None
+
+    manifest = json.loads(get_file_system(manifest_path).read_text(manifest_path))
+    if manifest.get("output_modified_time") != str(modified_time(output_path)):
+        return None
+
+    return manifest
+
+
+def write_build_manifest(output_path, fingerprint):
+    manifest_path = _build_manifest_path(output_path)
+    manifest = {**fingerprint, "output_modified_time": str(modified_time(output_path))}
+    get_file_system(manifest_path).write_text(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    invalidate_file_stats(manifest_path)
+
+
+def get_changed_fingerprint_fields(manifest, fingerprint) -> List[str]:
+    changed_fields = []
+    for field, value in fingerprint.items():
+        previous_value = manifest.get(field)
+        if isinstance(value, dict) and isinstance(previous_value, dict):
+            changed_fields.extend(
+                f"{field}.{key}"
+                for key in sorted(set(value) | set(previous_value))
+                if value.get(key) != previous_value.get(key)
+            )
+        elif value != previous_value:
+            changed_fields.append(field)
+
+    return changed_fields
 
 
 _pipeline_config = {}
 
 
+def _use_build_manifests():
+    return _pipeline_config.get("use_build_manifests", True)
+
+
+# Checkpoint location for the task running in the current thread
+_task_context = threading.local()
+
+
+@contextmanager
+def _task_checkpoints(checkpoint_root, fingerprint):
+    _task_context.checkpoint_root = checkpoint_root
+    _task_context.fingerprint = fingerprint
+    try:
+        yield
+    finally:
+        _task_context.checkpoint_root = None
+        _task_context.fingerprint = None
+
+
+def checkpoint(ds: hl.Table, name: str) -> hl.Table:
+    """
+    Checkpoint an intermediate table within a pipeline task.
+
+    The table is written to <output-root>/_checkpoints/<task name>/<name>.ht and read back. If the task
+    fails and is run again, checkpoints written by the previous attempt are reused as long as the task's
+    build fingerprint (inputs, task function, and params) has not changed. A task's checkpoints are
+    removed once its output has been written.
+
+    Outside of a pipeline task, the table is returned unchanged.
+
+    Args:
+        name: unique name for the checkpoint within the task
+    """
+    checkpoint_root = getattr(_task_context, "checkpoint_root", None)
+    if checkpoint_root is None:
+        return ds
+
+    checkpoint_path = os.path.join(checkpoint_root, f"{name}.ht")
+    fingerprint = _task_context.fingerprint
+
+    manifest = read_build_manifest(checkpoint_path) if file_exists(checkpoint_path) else None
+    if manifest is not None and not get_changed_fingerprint_fields(manifest, fingerprint):
+        logger.info(f"Reusing checkpoint {name}")
+        return hl.read_table(checkpoint_path)
+
+    logger.info(f"Writing checkpoint {name}")
+    ds = ds.checkpoint(checkpoint_path, overwrite=True)
+    invalidate_file_stats(checkpoint_path)
+    write_build_manifest(checkpoint_path, fingerprint)
+    return ds
+
+
 @attr.define
 class DownloadTask:
     _config: Optional[PipelineConfig]
@@ -73,19 +359,33 @@ class DownloadTask:
         else:
             return _pipeline_config["output_root"] + self._output_path
 
-    def should_run(self):
+    def get_build_fingerprint(self):
+        return {"url": self._url}
+
+    def should_run(self, fingerprint=None):
         output_path = self.get_output_path()
         if not file_exists(output_path):
             return (True, "Output does not exist")
 
+        if fingerprint is not None:
+            manifest = read_build_manifest(output_path)
+            if manifest is not None:
+                changed_fields = get_changed_fingerprint_fields(manifest, fingerprint)
+                if changed_fields:
+                    return (True, f"Changed {', '.join(changed_fields)}")
+
         return (False, None)
 
     def get_inputs(self):
         raise NotImplementedError("Method not valid for DownloadTask")
 
+    def get_dependencies(self):
+        return []
+
     def run(self, force=False):
         output_path = self.get_output_path()
-        should_run, reason = (True, "Forced") if force else self.should_run()
+        fingerprint = self.get_build_fingerprint() if _use_build_manifests() else None
+        should_run, reason = (True, "Forced") if force else self.should_run(fingerprint)
         if should_run:
             logger.info(f"Running {self._name} ({reason}")
 
@@ -98,11 +398,20 @@ class DownloadTask:
                 else:
                     shutil.copyfile(tmp.name, output_path)
 
+            invalidate_file_stats(output_path)
+
+            if fingerprint is not None:
+                write_build_manifest(output_path, fingerprint)
+
             stop = time.perf_counter()
             elapsed = stop - start
             logger.info("Finished %s in %dm%02ds", self._name, elapsed // 60, elapsed % 60)
-        else:
-            logger.info("Skipping %s", self._name)
+            return True
+
+        if fingerprint is not None and read_build_manifest(output_path) is None:
+            write_build_manifest(output_path, fingerprint)
+        logger.info("Skipping %s", self._name)
+        return False
 
 
 @attr.define
@@ -136,6 +445,9 @@ class Task:
         else:
             return _pipeline_config["output_root"] + self._output_path
 
+    def set_params(self, params: dict):
+        self._params = {**self._params, **params}
+
     def get_inputs(self):
         paths = {}
 
@@ -155,11 +467,39 @@ class Task:
 
         return paths
 
-    def should_run(self):
+    def get_checkpoint_root(self):
+        output_root = self._config.output_root if self._config else _pipeline_config["output_root"]
+        return os.path.join(output_root, "_checkpoints", self._name)
+
+    def get_dependencies(self) -> List[Union["Task", DownloadTask]]:
+        return [v for v in self._inputs.values() if isinstance(v, (Task, DownloadTask))]
+
+    def get_build_fingerprint(self):
+        """
+        Fingerprint everything that determines this task's output: the contents of its inputs,
+        the source of its task function, and its parameters.
+        """
+        return {
+            "inputs": {name: content_fingerprint(path) for name, path in self.get_inputs().items()},
+            "params": json.loads(json.dumps(self._params, sort_keys=True, default=str)),
+            "task_function": _task_function_fingerprint(self._task_function),
+        }
+
+    def should_run(self, fingerprint=None):
         output_path = self.get_output_path()
         if not file_exists(output_path):
             return (True, "Output does not exist")
 
+        # If a build manifest was recorded for the output, compare fingerprints instead of modification times.
+        if fingerprint is not None:
+            manifest = read_build_manifest(output_path)
+            if manifest is not None:
+                changed_fields = get_changed_fingerprint_fields(manifest, fingerprint)
+                if changed_fields:
+                    return (True, f"Changed {', '.join(changed_fields)}")
+
+                return (False, None)
+
         if self._inputs:
             output_mod_time = modified_time(output_path)
             input_mod_time = max(modified_time(path) for path in self.get_inputs().values())
@@ -171,29 +511,49 @@ class Task:
 
     def run(self, force=False):
         output_path = self.get_output_path()
-        should_run, reason = (True, "Forced") if force else self.should_run()
+        fingerprint = self.get_build_fingerprint() if _use_build_manifests() else None
+        should_run, reason = (True, "Forced") if force else self.should_run(fingerprint)
         if should_run:
             logger.info(f"Running {self._name} ({reason})")
             start = time.perf_counter()
-            result = self._task_function(**self.get_inputs(), **self._params)
 
-            if self._config:
-                if "gs://" not in self._config.output_root:
-                    Path(self._config.output_root).mkdir(parents=True, exist_ok=True)
+            checkpoint_root = self.get_checkpoint_root()
+            checkpoint_file_system = get_file_system(checkpoint_root)
+            if force:
+                checkpoint_file_system.remove_directory(checkpoint_root)
+
+            with _task_checkpoints(checkpoint_root, fingerprint or self.get_build_fingerprint()):
+                result = self._task_function(**self.get_inputs(), **self._params)
+
+                if self._config:
+                    if "gs://" not in self._config.output_root:
+                        Path(self._config.output_root).mkdir(parents=True, exist_ok=True)
+
+                result.write(output_path, overwrite=True)  # pylint: disable=unexpected-keyword-arg
+
+            invalidate_file_stats(output_path)
+            checkpoint_file_system.remove_directory(checkpoint_root)
+            if fingerprint is not None:
+                write_build_manifest(output_path, fingerprint)
 
-            result.write(output_path, overwrite=True)  # pylint: disable=unexpected-keyword-arg
             stop = time.perf_counter()
             elapsed = stop - start
             logger.info(f"Finished {self._name} in {elapsed // 60}m{elapsed % 60:02}s")
-        else:
-            logger.info(f"Skipping {self._name}")
+            return True
+
+        # Record a manifest for outputs built before manifests existed so that later runs can use it.
+        if fingerprint is not None and read_build_manifest(output_path) is None:
+            write_build_manifest(output_path, fingerprint)
+        logger.info(f"Skipping {self._name}")
+        return False
 
 
 @attr.define
 class Pipeline:
     config: Optional[PipelineConfig] = None
-    _tasks: OrderedDict = OrderedDict()
-    _outputs: dict = {}
+    # Each pipeline needs its own task and output registries rather than sharing one default instance
+    _tasks: OrderedDict = attr.field(factory=OrderedDict, alias="tasks")
+    _outputs: dict = attr.field(factory=dict, alias="outputs")
 
     def add_task(
         self,
@@ -225,9 +585,108 @@ class Pipeline:
     def get_all_task_names(self) -> List[str]:
         return list(self._tasks.keys())
 
-    def run(self, force_tasks=None) -> None:
-        for task_name, task in self._tasks.items():
-            task.run(force=force_tasks and task_name in force_tasks)
+    def get_task_graph(self) -> Dict[str, List[str]]:
+        """
+        Map each task name to the names of the tasks in this pipeline whose outputs it uses as inputs.
+        """
+        task_names = {id(task): task_name for task_name, task in self._tasks.items()}
+        return {
+            task_name: [task_names[id(dep)] for dep in task.get_dependencies() if id(dep) in task_names]
+            for task_name, task in self._tasks.items()
+        }
+
+    def _get_checked_paths(self) -> List[str]:
+        paths = []
+        for task in self._tasks.values():
+            output_path = task.get_output_path()
+            paths.extend([output_path, _build_manifest_path(output_path)])
+            if isinstance(task, Task):
+                paths.extend(task.get_inputs().values())
+
+        return paths
+
+    def run(self, force_tasks=None, max_concurrency: int = 1, profiler: Optional[PipelineProfiler] = None) -> None:
+        global _file_stat_cache  # pylint: disable=global-statement
+
+        # Share file information between all tasks in this run and fetch it for all tasks up front.
+        _file_stat_cache = FileStatCache()
+        try:
+            _file_stat_cache.prefetch(self._get_checked_paths())
+
+            if max_concurrency > 1:
+                self._run_concurrently(force_tasks, max_concurrency, profiler)
+                return
+
+            for task_name in self._tasks:
+                self._run_task(task_name, bool(force_tasks and task_name in force_tasks), profiler)
+        finally:
+            _file_stat_cache = None
+
+    def _run_task(self, task_name, force, profiler: Optional[PipelineProfiler] = None) -> float:
+        task = self._tasks[task_name]
+        start = time.perf_counter()
+        if profiler is None:
+            task.run(force=force)
+        else:
+            profiler.run_task(
+                task_name,
+                lambda: task.run(force=force),
+                input_paths=task.get_inputs() if isinstance(task, Task) else {},
+                output_path=task.get_output_path(),
+            )
+
+        return time.perf_counter() - start
+
+    def _run_concurrently(self, force_tasks, max_concurrency: int, profiler: Optional[PipelineProfiler]) -> None:
+        # Tasks are run as soon as all tasks they depend on have finished. All tasks share
+        # the same Hail/Spark session, so independent branches submit Spark jobs concurrently.
+        graph = self.get_task_graph()
+        waiting_on = {task_name: set(deps) for task_name, deps in graph.items()}
+        dependents = defaultdict(list)
+        for task_name, deps in graph.items():
+            for dep in deps:
+                dependents[dep].append(task_name)
+
+        durations: Dict[str, float] = {}
+        failures = []
+
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="pipeline") as executor:
+            running = {}
+
+            def submit_ready_tasks():
+                for task_name in [task_name for task_name, deps in waiting_on.items() if not deps]:
+                    del waiting_on[task_name]
+                    force = bool(force_tasks and task_name in force_tasks)
+                    running[executor.submit(self._run_task, task_name, force, profiler)] = task_name
+
+            submit_ready_tasks()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_name = running.pop(future)
+                    try:
+                        durations[task_name] = future.result()
+                    except Exception as error:  # pylint: disable=broad-except
+                        logger.exception(f"Task {task_name} failed")
+                        failures.append((task_name, error))
+                        continue
+
+                    for dependent in dependents[task_name]:
+                        waiting_on[dependent].discard(task_name)
+
+                # Once a task has failed, let running tasks finish but do not start any new ones.
+                if not failures:
+                    submit_ready_tasks()
+
+        if failures:
+            failed_task_name, error = failures[0]
+            raise RuntimeError(f"Task {failed_task_name} failed") from error
+
+        if waiting_on:
+            raise RuntimeError(f"Unable to schedule tasks with circular dependencies: {', '.join(waiting_on)}")
+
+        critical_path, critical_path_time = get_critical_path(graph, durations)
+        logger.info(f"Critical path: {' -> '.join(critical_path)} ({_format_elapsed_time(critical_path_time)})")
 
     def set_outputs(self, outputs) -> None:
         for output_name, task_name in outputs.items():
@@ -240,6 +699,35 @@ class Pipeline:
         return self._tasks[task_name]
 
 
+def _format_elapsed_time(elapsed: float) -> str:
+    return f"{int(elapsed // 60)}m{int(elapsed % 60):02}s"
+
+
+def get_critical_path(graph: Dict[str, List[str]], durations: Dict[str, float]) -> Tuple[List[str], float]:
+    """
+    Find the chain of dependent tasks with the longest total run time.
+
+    Args:
+        graph: map of task name to the names of the tasks it depends on
+        durations: map of task name to run time in seconds
+
+    Return:
+        tuple: task names along the critical path (in run order) and the total run time of those tasks
+    """
+    longest_paths: Dict[str, Tuple[List[str], float]] = {}
+
+    def longest_path_to(task_name):
+        if task_name not in longest_paths:
+            path, elapsed = max(
+                (longest_path_to(dep) for dep in graph.get(task_name, [])), key=lambda p: p[1], default=([], 0.0)
+            )
+            longest_paths[task_name] = (path + [task_name], elapsed + durations.get(task_name, 0.0))
+
+        return longest_paths[task_name]
+
+    return max((longest_path_to(task_name) for task_name in graph), key=lambda p: p[1], default=([], 0.0))
+
+
 @attr.define
 class PipelineMock:
     output_mappings: Dict[str, str]
@@ -254,6 +742,22 @@ class PipelineMock:
         raise ValueError("Output name is not valid")
 
 
+def set_task_param(pipeline: Pipeline, task_param: str):
+    """
+    Set a parameter of a task's function from a TASK.PARAM=VALUE string. The value is passed as a string.
+    """
+    name, separator, value = task_param.partition("=")
+    task_name, _, param = name.partition(".")
+    if not separator or not param:
+        raise ValueError(f"Invalid task parameter '{task_param}', expected TASK.PARAM=VALUE")
+
+    task = pipeline.get_task(task_name)
+    if not isinstance(task, Task):
+        raise ValueError(f"Task '{task_name}' does not have parameters")
+
+    task.set_params({param: value})
+
+
 def run_pipeline(pipeline: Pipeline):
     task_names = pipeline.get_all_task_names()
 
@@ -262,17 +766,64 @@ def run_pipeline(pipeline: Pipeline):
     group = parser.add_mutually_exclusive_group()
     group.add_argument("--force", choices=task_names, nargs="+")
     group.add_argument("--force-all", action="store_true")
+    parser.add_argument(
+        "--ignore-build-manifests",
+        action="store_true",
+        help="Decide whether to rerun tasks by comparing modification times of inputs and outputs",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=1,
+        help="Maximum number of independent tasks to run at the same time",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Collect metrics for each task and write them to a report in <output-root>/_reports",
+    )
+    parser.add_argument(
+        "--task-param",
+        action="append",
+        default=[],
+        metavar="TASK.PARAM=VALUE",
+        help="Set a parameter of a task's function. May be given multiple times.",
+    )
     args = parser.parse_args()
 
+    for task_param in args.task_param:
+        set_task_param(pipeline, task_param)
+
     if args.output_root:
         _pipeline_config["output_root"] = args.output_root.rstrip("/")
 
+    if args.ignore_build_manifests:
+        _pipeline_config["use_build_manifests"] = False
+
     pipeline_args = {}
     if args.force_all:
         pipeline_args["force_tasks"] = task_names
     elif args.force:
         pipeline_args["force_tasks"] = args.force
 
+    pipeline_args["max_concurrency"] = args.max_concurrency
+
     hl.init()
 
-    pipeline.run(**pipeline_args)
+    if not args.profile:
+        pipeline.run(**pipeline_args)
+        return
+
+    profiler = PipelineProfiler()
+    try:
+        pipeline.run(**pipeline_args, profiler=profiler)
+    finally:
+        if pipeline.config:
+            output_root, pipeline_name = pipeline.config.output_root, pipeline.config.name
+        else:
+            output_root = _pipeline_config["output_root"]
+            pipeline_name = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+
+        profiler.write_report(
+            os.path.join(output_root, "_reports", f"{pipeline_name}-{generate_iso_timestamp_for_filename()}")
+        )
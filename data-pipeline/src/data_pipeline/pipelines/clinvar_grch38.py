@@ -22,6 +22,8 @@ pipeline.add_download_task(
     "/external_sources/clinvar.xml.gz",
 )
 
+# To copy unchanged variants from a previous import instead of parsing them, run the pipeline with
+# --task-param import_clinvar_xml.previous_clinvar_path=<path to a copy of a previous output>
 pipeline.add_task(
     "import_clinvar_xml",
     import_clinvar_xml,
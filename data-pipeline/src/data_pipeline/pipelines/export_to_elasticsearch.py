@@ -4,11 +4,16 @@ import argparse
 import logging
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import hail as hl
 
+from data_pipeline.data_types.coverage import COVERAGE_METRICS
 from data_pipeline.data_types.variant import compressed_variant_id
-from data_pipeline.helpers.elasticsearch_export import export_table_to_elasticsearch
+from data_pipeline.data_types.variant.transcript_consequence import decode_transcript_consequence
+from data_pipeline.helpers.elasticsearch_bulk_export import ExportProgressMonitor, ThroughputBudget
+from data_pipeline.helpers.elasticsearch_export import EXPORT_ENGINES, export_table_to_elasticsearch
+from data_pipeline.helpers.elasticsearch_value_encoding import VALUE_ENCODINGS
 from data_pipeline.pipeline import _pipeline_config
 
 from data_pipeline.pipelines.clinvar_grch37 import pipeline as clinvar_grch37_pipeline
@@ -60,6 +65,10 @@ def add_variant_document_id(ds):
     return ds.annotate(document_id=compressed_variant_id(ds.locus, ds.alleles))
 
 
+def decode_transcript_consequences(ds):
+    return ds.annotate(transcript_consequences=ds.transcript_consequences.map(decode_transcript_consequence))
+
+
 def truncate_clinvar_variant_ids(ds):
     return ds.annotate(
         variant_id=hl.if_else(hl.len(ds.variant_id) >= 32_766, ds.variant_id[:32_632] + "...", ds.variant_id)
@@ -72,6 +81,54 @@ def add_liftover_document_id(ds):
     )
 
 
+# Coverage is queried by xpos ranges, so sort documents by xpos to keep regions in a few contiguous blocks
+COVERAGE_LOAD_PROFILE = {"index_sort": ["xpos"], "max_num_segments": 1}
+
+VARIANTS_LOAD_PROFILE = {"max_num_segments": 1}
+
+# Coverage queries filter by locus and average metrics in locus.position histogram buckets
+COVERAGE_MAPPING_HINTS = {
+    "searched_fields": ["locus"],
+    "aggregated_fields": [
+        "locus.position",
+        "xpos",  # Used for index sorting
+        "mean",
+        "median",
+        "over_1",
+        "over_5",
+        "over_10",
+        "over_15",
+        "over_20",
+        "over_25",
+        "over_30",
+        "over_50",
+        "over_100",
+    ],
+    "field_types": {
+        "mean": "half_float",
+        "median": "half_float",
+        **{f"over_{x}": {"type": "scaled_float", "scaling_factor": 1000} for x in [1, 5, 10, 15, 20, 25, 30, 50, 100]},
+    },
+}
+
+# Run-length encoded coverage is queried for runs overlapping a region (xpos <= region end and xend >= region start)
+# and metrics are averaged weighted by run length (end - locus.position + 1)
+COVERAGE_RUNS_MAPPING_HINTS = {
+    "searched_fields": ["xpos", "xend"],
+    "aggregated_fields": ["xpos", "xend", "locus.position", "end", *COVERAGE_METRICS],
+    "field_types": COVERAGE_MAPPING_HINTS["field_types"],
+}
+
+# Coverage bins are queried at one bin size and averaged weighted by n_bases
+COVERAGE_BINS_LOAD_PROFILE = {"index_sort": ["bin_size", "xpos"], "max_num_segments": 1}
+
+COVERAGE_BINS_MAPPING_HINTS = {
+    "searched_fields": ["bin_size", "locus", "xpos"],
+    "aggregated_fields": ["bin_size", "xpos", "locus.position", "n_bases", *COVERAGE_METRICS],
+    "field_types": COVERAGE_MAPPING_HINTS["field_types"],
+}
+
+
 DATASETS_CONFIG = {
     ##############################################################################################################
     # Genes
@@ -120,7 +177,11 @@ DATASETS_CONFIG = {
     ##############################################################################################################
     "gnomad_v4_variants": {
         "get_table": lambda: subset_table(
-            add_variant_document_id(hl.read_table(gnomad_v4_variants_pipeline.get_output("variants").get_output_path()))
+            add_variant_document_id(
+                decode_transcript_consequences(
+                    hl.read_table(gnomad_v4_variants_pipeline.get_output("variants").get_output_path())
+                )
+            )
         ),
         "args": {
             "index": "gnomad_v4_variants",
@@ -132,17 +193,52 @@ DATASETS_CONFIG = {
                 "locus",
                 "transcript_consequences.gene_id",
                 "transcript_consequences.transcript_id",
+                "transcript_consequences.major_consequence_code",
             ],
             "id_field": "document_id",
             "num_shards": 48,
             "block_size": 1_000,
+            "load_profile": VARIANTS_LOAD_PROFILE,
         },
     },
     "gnomad_v4_exome_coverage": {
         "get_table": lambda: subset_table(
             hl.read_table(gnomad_v4_coverage_pipeline.get_output("exome_coverage").get_output_path())
         ),
-        "args": {"index": "gnomad_v4_exome_coverage", "id_field": "xpos", "num_shards": 48, "block_size": 10_000},
+        "args": {
+            "index": "gnomad_v4_exome_coverage",
+            "id_field": "xpos",
+            "num_shards": 48,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_MAPPING_HINTS,
+        },
+    },
+    "gnomad_v4_exome_coverage_runs": {
+        "get_table": lambda: subset_table(
+            hl.read_table(gnomad_v4_coverage_pipeline.get_output("exome_coverage_runs").get_output_path())
+        ),
+        "args": {
+            "index": "gnomad_v4_exome_coverage_runs",
+            "id_field": "xpos",
+            "num_shards": 12,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_RUNS_MAPPING_HINTS,
+        },
+    },
+    "gnomad_v4_exome_coverage_bins": {
+        "get_table": lambda: subset_table(
+            hl.read_table(gnomad_v4_coverage_pipeline.get_output("exome_coverage_bins").get_output_path())
+        ),
+        "args": {
+            "index": "gnomad_v4_exome_coverage_bins",
+            "id_field": "document_id",
+            "num_shards": 8,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_BINS_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_BINS_MAPPING_HINTS,
+        },
     },
     # "gnomad_v4_genome_coverage": {
     #     "get_table": lambda: subset_table(
@@ -201,7 +297,11 @@ DATASETS_CONFIG = {
     ##############################################################################################################
     "gnomad_v3_variants": {
         "get_table": lambda: subset_table(
-            add_variant_document_id(hl.read_table(gnomad_v3_variants_pipeline.get_output("variants").get_output_path()))
+            add_variant_document_id(
+                decode_transcript_consequences(
+                    hl.read_table(gnomad_v3_variants_pipeline.get_output("variants").get_output_path())
+                )
+            )
         ),
         "args": {
             "index": "gnomad_v3_variants",
@@ -213,17 +313,52 @@ DATASETS_CONFIG = {
                 "locus",
                 "transcript_consequences.gene_id",
                 "transcript_consequences.transcript_id",
+                "transcript_consequences.major_consequence_code",
             ],
             "id_field": "document_id",
             "num_shards": 48,
             "block_size": 1_000,
+            "load_profile": VARIANTS_LOAD_PROFILE,
         },
     },
     "gnomad_v3_genome_coverage": {
         "get_table": lambda: subset_table(
             hl.read_table(gnomad_v3_coverage_pipeline.get_output("genome_coverage").get_output_path())
         ),
-        "args": {"index": "gnomad_v3_genome_coverage", "id_field": "xpos", "num_shards": 48, "block_size": 10_000},
+        "args": {
+            "index": "gnomad_v3_genome_coverage",
+            "id_field": "xpos",
+            "num_shards": 48,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_MAPPING_HINTS,
+        },
+    },
+    "gnomad_v3_genome_coverage_runs": {
+        "get_table": lambda: subset_table(
+            hl.read_table(gnomad_v3_coverage_pipeline.get_output("genome_coverage_runs").get_output_path())
+        ),
+        "args": {
+            "index": "gnomad_v3_genome_coverage_runs",
+            "id_field": "xpos",
+            "num_shards": 12,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_RUNS_MAPPING_HINTS,
+        },
+    },
+    "gnomad_v3_genome_coverage_bins": {
+        "get_table": lambda: subset_table(
+            hl.read_table(gnomad_v3_coverage_pipeline.get_output("genome_coverage_bins").get_output_path())
+        ),
+        "args": {
+            "index": "gnomad_v3_genome_coverage_bins",
+            "id_field": "document_id",
+            "num_shards": 8,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_BINS_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_BINS_MAPPING_HINTS,
+        },
     },
     "gnomad_v3_local_ancestry": {
         "get_table": lambda: subset_table(
@@ -245,7 +380,9 @@ DATASETS_CONFIG = {
     "gnomad_v3_mitochondrial_variants": {
         "get_table": lambda: subset_table(
             add_variant_document_id(
-                hl.read_table(gnomad_v3_mitochondrial_variants_pipeline.get_output("variants").get_output_path())
+                decode_transcript_consequences(
+                    hl.read_table(gnomad_v3_mitochondrial_variants_pipeline.get_output("variants").get_output_path())
+                )
             )
         ),
         "args": {
@@ -257,6 +394,7 @@ DATASETS_CONFIG = {
                 "locus",
                 "transcript_consequences.gene_id",
                 "transcript_consequences.transcript_id",
+                "transcript_consequences.major_consequence_code",
             ],
             "id_field": "document_id",
             "num_shards": 1,
@@ -272,6 +410,7 @@ DATASETS_CONFIG = {
             "id_field": "xpos",
             "num_shards": 1,
             "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
         },
     },
     ##############################################################################################################
@@ -316,7 +455,11 @@ DATASETS_CONFIG = {
     ##############################################################################################################
     "gnomad_v2_variants": {
         "get_table": lambda: subset_table(
-            add_variant_document_id(hl.read_table(gnomad_v2_variants_pipeline.get_output("variants").get_output_path()))
+            add_variant_document_id(
+                decode_transcript_consequences(
+                    hl.read_table(gnomad_v2_variants_pipeline.get_output("variants").get_output_path())
+                )
+            )
         ),
         "args": {
             "index": "gnomad_v2_variants",
@@ -328,23 +471,91 @@ DATASETS_CONFIG = {
                 "locus",
                 "transcript_consequences.gene_id",
                 "transcript_consequences.transcript_id",
+                "transcript_consequences.major_consequence_code",
             ],
             "id_field": "document_id",
             "num_shards": 48,
             "block_size": 1_000,
+            "load_profile": VARIANTS_LOAD_PROFILE,
         },
     },
     "gnomad_v2_exome_coverage": {
         "get_table": lambda: subset_table(
             hl.read_table(gnomad_v2_coverage_pipeline.get_output("exome_coverage").get_output_path())
         ),
-        "args": {"index": "gnomad_v2_exome_coverage", "id_field": "xpos", "num_shards": 48, "block_size": 10_000},
+        "args": {
+            "index": "gnomad_v2_exome_coverage",
+            "id_field": "xpos",
+            "num_shards": 48,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_MAPPING_HINTS,
+        },
+    },
+    "gnomad_v2_exome_coverage_runs": {
+        "get_table": lambda: subset_table(
+            hl.read_table(gnomad_v2_coverage_pipeline.get_output("exome_coverage_runs").get_output_path())
+        ),
+        "args": {
+            "index": "gnomad_v2_exome_coverage_runs",
+            "id_field": "xpos",
+            "num_shards": 12,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_RUNS_MAPPING_HINTS,
+        },
+    },
+    "gnomad_v2_exome_coverage_bins": {
+        "get_table": lambda: subset_table(
+            hl.read_table(gnomad_v2_coverage_pipeline.get_output("exome_coverage_bins").get_output_path())
+        ),
+        "args": {
+            "index": "gnomad_v2_exome_coverage_bins",
+            "id_field": "document_id",
+            "num_shards": 8,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_BINS_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_BINS_MAPPING_HINTS,
+        },
     },
     "gnomad_v2_genome_coverage": {
         "get_table": lambda: subset_table(
             hl.read_table(gnomad_v2_coverage_pipeline.get_output("genome_coverage").get_output_path())
         ),
-        "args": {"index": "gnomad_v2_genome_coverage", "id_field": "xpos", "num_shards": 48, "block_size": 10_000},
+        "args": {
+            "index": "gnomad_v2_genome_coverage",
+            "id_field": "xpos",
+            "num_shards": 48,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_MAPPING_HINTS,
+        },
+    },
+    "gnomad_v2_genome_coverage_runs": {
+        "get_table": lambda: subset_table(
+            hl.read_table(gnomad_v2_coverage_pipeline.get_output("genome_coverage_runs").get_output_path())
+        ),
+        "args": {
+            "index": "gnomad_v2_genome_coverage_runs",
+            "id_field": "xpos",
+            "num_shards": 12,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_RUNS_MAPPING_HINTS,
+        },
+    },
+    "gnomad_v2_genome_coverage_bins": {
+        "get_table": lambda: subset_table(
+            hl.read_table(gnomad_v2_coverage_pipeline.get_output("genome_coverage_bins").get_output_path())
+        ),
+        "args": {
+            "index": "gnomad_v2_genome_coverage_bins",
+            "id_field": "document_id",
+            "num_shards": 8,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_BINS_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_BINS_MAPPING_HINTS,
+        },
     },
     "gnomad_v2_mnvs": {
         "get_table": lambda: hl.read_table(
@@ -387,7 +598,11 @@ DATASETS_CONFIG = {
     ##############################################################################################################
     "exac_variants": {
         "get_table": lambda: subset_table(
-            add_variant_document_id(hl.read_table(exac_variants_pipeline.get_output("variants").get_output_path()))
+            add_variant_document_id(
+                decode_transcript_consequences(
+                    hl.read_table(exac_variants_pipeline.get_output("variants").get_output_path())
+                )
+            )
         ),
         "args": {
             "index": "exac_variants",
@@ -399,24 +614,37 @@ DATASETS_CONFIG = {
                 "locus",
                 "transcript_consequences.gene_id",
                 "transcript_consequences.transcript_id",
+                "transcript_consequences.major_consequence_code",
             ],
             "id_field": "document_id",
             "num_shards": 16,
             "block_size": 1_000,
+            "load_profile": VARIANTS_LOAD_PROFILE,
         },
     },
     "exac_exome_coverage": {
         "get_table": lambda: subset_table(
             hl.read_table(exac_coverage_pipeline.get_output("exome_coverage").get_output_path())
         ),
-        "args": {"index": "exac_exome_coverage", "id_field": "xpos", "num_shards": 16, "block_size": 10_000},
+        "args": {
+            "index": "exac_exome_coverage",
+            "id_field": "xpos",
+            "num_shards": 16,
+            "block_size": 10_000,
+            "load_profile": COVERAGE_LOAD_PROFILE,
+            "mapping_hints": COVERAGE_MAPPING_HINTS,
+        },
     },
     ##############################################################################################################
     # ClinVar
     ##############################################################################################################
     "clinvar_grch38_variants": {
         "get_table": lambda: truncate_clinvar_variant_ids(
-            subset_table(hl.read_table(clinvar_grch38_pipeline.get_output("clinvar_variants").get_output_path()))
+            subset_table(
+                decode_transcript_consequences(
+                    hl.read_table(clinvar_grch38_pipeline.get_output("clinvar_variants").get_output_path())
+                )
+            )
         ),
         "args": {
             "index": "clinvar_grch38_variants",
@@ -428,6 +656,7 @@ DATASETS_CONFIG = {
                 "pos",
                 "transcript_consequences.gene_id",
                 "transcript_consequences.transcript_id",
+                "transcript_consequences.major_consequence_code",
             ],
             "num_shards": 2,
             "block_size": 2_000,
@@ -435,7 +664,11 @@ DATASETS_CONFIG = {
     },
     "clinvar_grch37_variants": {
         "get_table": lambda: truncate_clinvar_variant_ids(
-            subset_table(hl.read_table(clinvar_grch37_pipeline.get_output("clinvar_variants").get_output_path()))
+            subset_table(
+                decode_transcript_consequences(
+                    hl.read_table(clinvar_grch37_pipeline.get_output("clinvar_variants").get_output_path())
+                )
+            )
         ),
         "args": {
             "index": "clinvar_grch37_variants",
@@ -447,6 +680,7 @@ DATASETS_CONFIG = {
                 "pos",
                 "transcript_consequences.gene_id",
                 "transcript_consequences.transcript_id",
+                "transcript_consequences.major_consequence_code",
             ],
             "num_shards": 2,
             "block_size": 2_000,
@@ -465,6 +699,14 @@ DATASETS_CONFIG = {
             "id_field": "document_id",
             "num_shards": 8,
             "block_size": 1_000,
+            "mapping_hints": {
+                "searched_fields": [
+                    "source.variant_id",
+                    "source.reference_genome",
+                    "liftover.variant_id",
+                    "liftover.reference_genome",
+                ]
+            },
         },
     },
     ##############################################################################################################
@@ -481,22 +723,109 @@ DATASETS_CONFIG = {
         "args": {
             "index": "gnomad_v3_genomic_constraint_regions",
             "id_field": "element_id",
+            # Regions are only fetched by ID
+            "mapping_hints": {},
         },
     },
 }
 
 
-def export_datasets(elasticsearch_host, elasticsearch_auth, datasets):
+DATASET_ORDERS = ["given", "largest-first", "smallest-first"]
+
+
+def order_datasets(datasets, order="given"):
+    """
+    Order datasets for export. Sizes are estimated by the number of shards configured for each dataset's index.
+    """
+    if order == "given":
+        return list(datasets)
+
+    def size_hint(dataset):
+        return DATASETS_CONFIG[dataset].get("args", {}).get("num_shards", 1)
+
+    return sorted(datasets, key=size_hint, reverse=order == "largest-first")
+
+
+def export_datasets(
+    elasticsearch_host,
+    elasticsearch_auth,
+    datasets,
+    engine="es-hadoop",
+    bulk_workers=8,
+    resume_index=None,
+    parallelism=1,
+    order="given",
+    max_documents_per_second=None,
+    update_aliases=False,
+    retain_indices=None,
+    value_encoding="json",
+):
+    """
+    Export datasets to Elasticsearch.
+
+    Args:
+        parallelism: number of datasets to export at the same time
+        order: order in which to start exporting datasets (one of DATASET_ORDERS)
+        max_documents_per_second: limit on the total rate of documents sent by all exports using the bulk engine
+        update_aliases: validate each new index and point an alias named after the dataset's index at it
+        retain_indices: after updating aliases, delete all but this many of each dataset's most recent indices
+        value_encoding: how to store the value field for datasets exported with index_fields
+    """
     base_args = {
         "host": elasticsearch_host,
         "auth": elasticsearch_auth,
+        "engine": engine,
+        "bulk_workers": bulk_workers,
+        "resume_index": resume_index,
+        "throughput_budget": ThroughputBudget(max_documents_per_second) if max_documents_per_second else None,
+        "update_index_alias": update_aliases,
+        "retain_indices": retain_indices,
+        "value_encoding": value_encoding,
     }
 
-    for dataset in datasets:
-        logger.info("exporting dataset %s", dataset)
+    datasets = order_datasets(datasets, order)
+
+    if parallelism <= 1:
+        for dataset in datasets:
+            logger.info("exporting dataset %s", dataset)
+            dataset_config = DATASETS_CONFIG[dataset]
+            table = dataset_config["get_table"]()
+            export_table_to_elasticsearch(table, **base_args, **dataset_config.get("args", {}))
+
+        return
+
+    progress_monitor = ExportProgressMonitor()
+
+    def export_dataset(dataset):
         dataset_config = DATASETS_CONFIG[dataset]
-        table = dataset_config["get_table"]()
-        export_table_to_elasticsearch(table, **base_args, **dataset_config.get("args", {}))
+        progress_name = dataset_config["args"]["index"]
+        progress_monitor.set_status(progress_name, "running")
+        try:
+            table = dataset_config["get_table"]()
+            export_table_to_elasticsearch(
+                table, **base_args, **dataset_config.get("args", {}), progress_monitor=progress_monitor
+            )
+        except Exception:
+            progress_monitor.set_status(progress_name, "failed")
+            raise
+
+        progress_monitor.set_status(progress_name, "done")
+
+    for dataset in datasets:
+        progress_monitor.set_status(DATASETS_CONFIG[dataset]["args"]["index"], "waiting")
+
+    failed_datasets = []
+    with progress_monitor, ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="export") as executor:
+        futures = {executor.submit(export_dataset, dataset): dataset for dataset in datasets}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("failed to export dataset %s", futures[future])
+                failed_datasets.append(futures[future])
+
+    if failed_datasets:
+        raise RuntimeError(f"Failed to export datasets: {', '.join(sorted(failed_datasets))}")
 
 
 def main(argv):
@@ -505,8 +834,43 @@ def main(argv):
     parser.add_argument("--secret", required=True)
     parser.add_argument("--output-root", required=True)
     parser.add_argument("--datasets", required=True)
+    parser.add_argument("--engine", choices=EXPORT_ENGINES, default="es-hadoop")
+    parser.add_argument("--bulk-workers", type=int, default=8)
+    parser.add_argument("--resume", metavar="INDEX", help="Resume an interrupted bulk export into an existing index")
+    parser.add_argument("--parallelism", type=int, default=1, help="Number of datasets to export at the same time")
+    parser.add_argument("--order", choices=DATASET_ORDERS, default="given")
+    parser.add_argument(
+        "--max-documents-per-second",
+        type=int,
+        help="Limit on the total rate of documents sent by all datasets exported with the bulk engine",
+    )
+    parser.add_argument(
+        "--update-aliases",
+        action="store_true",
+        help="Validate each new index and point an alias named after the dataset's index at it",
+    )
+    parser.add_argument(
+        "--retain-indices",
+        type=int,
+        help="After updating aliases, delete all but this many of each dataset's most recent indices",
+    )
+    parser.add_argument(
+        "--value-encoding",
+        choices=VALUE_ENCODINGS,
+        default="json",
+        help="How to store the value field for datasets exported with index fields",
+    )
     args = parser.parse_args(argv)
 
+    if args.value_encoding != "json" and args.engine != "bulk":
+        parser.error("--value-encoding requires --engine=bulk")
+
+    if args.retain_indices is not None and not args.update_aliases:
+        parser.error("--retain-indices requires --update-aliases")
+
+    if args.resume and args.engine != "bulk":
+        parser.error("--resume requires --engine=bulk")
+
     # TODO: clean this up
     _pipeline_config["output_root"] = args.output_root.rstrip("/")
 
@@ -519,8 +883,25 @@ def main(argv):
     if unknown_datasets:
         raise RuntimeError(f"Unknown datasets: {', '.join(unknown_datasets)}")
 
+    if args.resume and len(datasets) != 1:
+        raise RuntimeError("Exports can only be resumed for one dataset at a time")
+
+    if args.resume and DATASETS_CONFIG[datasets[0]]["args"].get("id_field") is None:
+        raise RuntimeError(f"Exports of {datasets[0]} cannot be resumed because its documents do not have IDs")
+
     export_datasets(
-        elasticsearch_host=args.host, elasticsearch_auth=("elastic", elasticsearch_password), datasets=datasets
+        elasticsearch_host=args.host,
+        elasticsearch_auth=("elastic", elasticsearch_password),
+        datasets=datasets,
+        engine=args.engine,
+        bulk_workers=args.bulk_workers,
+        resume_index=args.resume,
+        parallelism=args.parallelism,
+        order=args.order,
+        max_documents_per_second=args.max_documents_per_second,
+        update_aliases=args.update_aliases,
+        retain_indices=args.retain_indices,
+        value_encoding=args.value_encoding,
     )
 
 
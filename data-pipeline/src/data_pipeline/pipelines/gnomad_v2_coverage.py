@@ -1,6 +1,11 @@
 from data_pipeline.pipeline import Pipeline, run_pipeline
 
-from data_pipeline.data_types.coverage import prepare_coverage
+from data_pipeline.data_types.coverage import (
+    COVERAGE_RUN_PRECISION,
+    prepare_coverage,
+    prepare_coverage_bins,
+    prepare_coverage_runs,
+)
 
 
 pipeline = Pipeline()
@@ -21,12 +26,49 @@ pipeline.add_task(
     },
 )
 
+pipeline.add_task(
+    "compact_gnomad_v2_exome_coverage",
+    prepare_coverage_runs,
+    "/gnomad_v2/gnomad_v2_exome_coverage_runs.ht",
+    {"coverage_path": pipeline.get_task("prepare_gnomad_v2_exome_coverage")},
+    {"precision": COVERAGE_RUN_PRECISION},
+)
+
+pipeline.add_task(
+    "bin_gnomad_v2_exome_coverage",
+    prepare_coverage_bins,
+    "/gnomad_v2/gnomad_v2_exome_coverage_bins.ht",
+    {"coverage_path": pipeline.get_task("prepare_gnomad_v2_exome_coverage")},
+)
+
+pipeline.add_task(
+    "compact_gnomad_v2_genome_coverage",
+    prepare_coverage_runs,
+    "/gnomad_v2/gnomad_v2_genome_coverage_runs.ht",
+    {"coverage_path": pipeline.get_task("prepare_gnomad_v2_genome_coverage")},
+    {"precision": COVERAGE_RUN_PRECISION},
+)
+
+pipeline.add_task(
+    "bin_gnomad_v2_genome_coverage",
+    prepare_coverage_bins,
+    "/gnomad_v2/gnomad_v2_genome_coverage_bins.ht",
+    {"coverage_path": pipeline.get_task("prepare_gnomad_v2_genome_coverage")},
+)
+
 ###############################################
 # Outputs
 ###############################################
 
 pipeline.set_outputs(
-    {"exome_coverage": "prepare_gnomad_v2_exome_coverage", "genome_coverage": "prepare_gnomad_v2_genome_coverage"}
+    {
+        "exome_coverage": "prepare_gnomad_v2_exome_coverage",
+        "exome_coverage_runs": "compact_gnomad_v2_exome_coverage",
+        "exome_coverage_bins": "bin_gnomad_v2_exome_coverage",
+        "genome_coverage": "prepare_gnomad_v2_genome_coverage",
+        "genome_coverage_runs": "compact_gnomad_v2_genome_coverage",
+        "genome_coverage_bins": "bin_gnomad_v2_genome_coverage",
+    }
 )
 
 ###############################################
@@ -1,6 +1,11 @@
 from data_pipeline.pipeline import Pipeline, run_pipeline
 
-from data_pipeline.data_types.coverage import prepare_coverage
+from data_pipeline.data_types.coverage import (
+    COVERAGE_RUN_PRECISION,
+    prepare_coverage,
+    prepare_coverage_bins,
+    prepare_coverage_runs,
+)
 
 
 pipeline = Pipeline()
@@ -12,11 +17,32 @@ pipeline.add_task(
     {"coverage_path": "gs://gcp-public-data--gnomad/release/3.0.1/coverage/genomes/gnomad.genomes.r3.0.1.coverage.ht"},
 )
 
+pipeline.add_task(
+    "compact_gnomad_v3_coverage",
+    prepare_coverage_runs,
+    "/gnomad_v3/gnomad_v3_genome_coverage_runs.ht",
+    {"coverage_path": pipeline.get_task("prepare_gnomad_v3_coverage")},
+    {"precision": COVERAGE_RUN_PRECISION},
+)
+
+pipeline.add_task(
+    "bin_gnomad_v3_coverage",
+    prepare_coverage_bins,
+    "/gnomad_v3/gnomad_v3_genome_coverage_bins.ht",
+    {"coverage_path": pipeline.get_task("prepare_gnomad_v3_coverage")},
+)
+
 ###############################################
 # Outputs
 ###############################################
 
-pipeline.set_outputs({"genome_coverage": "prepare_gnomad_v3_coverage"})
+pipeline.set_outputs(
+    {
+        "genome_coverage": "prepare_gnomad_v3_coverage",
+        "genome_coverage_runs": "compact_gnomad_v3_coverage",
+        "genome_coverage_bins": "bin_gnomad_v3_coverage",
+    }
+)
 
 ###############################################
 # Run
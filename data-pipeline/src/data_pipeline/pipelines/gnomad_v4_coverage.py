@@ -1,6 +1,11 @@
 from data_pipeline.pipeline import Pipeline, run_pipeline
 
-from data_pipeline.data_types.coverage import prepare_coverage
+from data_pipeline.data_types.coverage import (
+    COVERAGE_RUN_PRECISION,
+    prepare_coverage,
+    prepare_coverage_bins,
+    prepare_coverage_runs,
+)
 
 output_sub_dir = "gnomad_v4_20231027T203139"
 
@@ -16,6 +21,21 @@ pipeline.add_task(
     # params={"filter_intervals": ["chr1:55039447-55064852"]},
 )
 
+pipeline.add_task(
+    "compact_gnomad_v4_exome_coverage",
+    prepare_coverage_runs,
+    f"/{output_sub_dir}/gnomad_v4_exome_coverage_runs.ht",
+    {"coverage_path": pipeline.get_task("prepare_gnomad_v4_exome_coverage")},
+    {"precision": COVERAGE_RUN_PRECISION},
+)
+
+pipeline.add_task(
+    "bin_gnomad_v4_exome_coverage",
+    prepare_coverage_bins,
+    f"/{output_sub_dir}/gnomad_v4_exome_coverage_bins.ht",
+    {"coverage_path": pipeline.get_task("prepare_gnomad_v4_exome_coverage")},
+)
+
 # pipeline.add_task(
 #     name="prepare_gnomad_v4_genome_coverage",
 #     task_function=prepare_coverage,
@@ -34,6 +54,8 @@ pipeline.add_task(
 pipeline.set_outputs(
     {
         "exome_coverage": "prepare_gnomad_v4_exome_coverage",
+        "exome_coverage_runs": "compact_gnomad_v4_exome_coverage",
+        "exome_coverage_bins": "bin_gnomad_v4_exome_coverage",
         # "genome_coverage": "prepare_gnomad_v4_genome_coverage",
     }
 )
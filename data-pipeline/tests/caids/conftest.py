@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Scripts in the caids directory are run directly instead of being installed as part of a package.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "caids"))
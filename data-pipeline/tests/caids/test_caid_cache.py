@@ -0,0 +1,40 @@
+import hail as hl
+import pytest
+
+from export_vcfs import exclude_cached_variants
+from import_caids import merge_caids
+
+pytestmark = pytest.mark.requires_hail
+
+
+def caids_table(rows):
+    return hl.Table.parallelize(
+        [
+            {"locus": hl.Locus("chr1", position, "GRCh38"), "alleles": ["A", "G"], "caid": caid}
+            for position, caid in rows
+        ],
+        hl.tstruct(locus=hl.tlocus("GRCh38"), alleles=hl.tarray(hl.tstr), caid=hl.tstr),
+        key=("locus", "alleles"),
+    )
+
+
+def test_exclude_cached_variants(tmp_path):
+    caids_table([(1, "CA1"), (2, None)]).write(str(tmp_path / "cache.ht"))
+
+    ds = caids_table([(1, None), (2, None), (3, None)]).select()
+    ds = exclude_cached_variants(ds, str(tmp_path / "cache.ht"))
+
+    assert [variant.locus.position for variant in ds.collect()] == [2, 3]
+
+
+def test_merge_caids(tmp_path):
+    caids_table([(1, "CA1"), (2, None), (3, "CA3")]).write(str(tmp_path / "cache.ht"))
+
+    ds = merge_caids(caids_table([(2, "CA2"), (3, "CA30"), (4, None)]), str(tmp_path / "cache.ht"))
+
+    assert [(variant.locus.position, variant.caid) for variant in ds.collect()] == [
+        (1, "CA1"),
+        (2, "CA2"),
+        (3, "CA30"),
+        (4, None),
+    ]
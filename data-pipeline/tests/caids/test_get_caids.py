@@ -0,0 +1,139 @@
+import asyncio
+import gzip
+import json
+
+from aiohttp import web
+
+from get_caids import AdaptiveConcurrencyLimiter, GzipDecompressor, get_caids
+
+VCF_HEADER = """##fileformat=VCFv4.2
+##contig=<ID=chr1,length=248956422,assembly=GRCh38>
+##contig=<ID=chrUn_KI270302v1,length=2274,assembly=GRCh38>
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO
+"""
+
+
+def vcf_lines(positions):
+    return "".join(f"chr1\t{position}\t.\tA\tG\t.\t.\t.\n" for position in positions)
+
+
+class StubAlleleRegistry:
+    """Stand in for the Allele Registry's annotateVcf endpoint, rejecting the first request as overloaded."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def annotate_vcf(self, request):
+        body = (await request.read()).decode("utf-8")
+        self.requests.append((request.query["assembly"], body))
+
+        if len(self.requests) == 1:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+
+        output_lines = []
+        for line in body.splitlines():
+            if not line.startswith("#"):
+                contig, pos, _, *rest = line.split("\t")
+                line = "\t".join([contig, pos, f"CA{pos}", *rest])
+            output_lines.append(line)
+
+        return web.Response(text="\n".join(output_lines) + "\n")
+
+
+async def run_get_caids(sharded_vcf_path, output_path, **kwargs):
+    allele_registry = StubAlleleRegistry()
+    app = web.Application()
+    app.router.add_post("/annotateVcf", allele_registry.annotate_vcf)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    try:
+        await get_caids(
+            str(sharded_vcf_path),
+            str(output_path),
+            allele_registry_url=f"http://127.0.0.1:{port}/annotateVcf",
+            **kwargs,
+        )
+    finally:
+        await runner.cleanup()
+
+    return allele_registry
+
+
+def test_get_caids(tmp_path):
+    sharded_vcf_path = tmp_path / "variants.vcf.bgz"
+    sharded_vcf_path.mkdir()
+    (sharded_vcf_path / "header.bgz").write_bytes(gzip.compress(VCF_HEADER.encode("utf-8")))
+    # Block gzipped parts contain multiple gzip members
+    (sharded_vcf_path / "part-00000.bgz").write_bytes(
+        gzip.compress(vcf_lines([1, 2, 3]).encode("utf-8")) + gzip.compress(vcf_lines([4, 5]).encode("utf-8"))
+    )
+    (sharded_vcf_path / "part-00001.bgz").write_bytes(gzip.compress(vcf_lines([6]).encode("utf-8")))
+
+    output_path = tmp_path / "caids"
+    output_path.mkdir()
+    # Completed parts are not requested again
+    (output_path / "part-00001.tsv").write_text("locus\talleles\tCAID\n")
+
+    allele_registry = asyncio.run(run_get_caids(sharded_vcf_path, output_path, batch_size=2, max_parallelism=2))
+
+    # One rejected request and three batches of at most two variants
+    assert len(allele_registry.requests) == 4
+    for assembly, body in allele_registry.requests:
+        assert assembly == "GRCh38"
+        assert "chrUn_KI270302v1" not in body
+        assert len([line for line in body.splitlines() if not line.startswith("#")]) <= 2
+
+    with open(output_path / "part-00000.tsv") as f:
+        lines = [line.rstrip("\n").split("\t") for line in f]
+
+    assert lines[0] == ["locus", "alleles", "CAID"]
+    assert sorted(lines[1:]) == [[f"chr1:{i}", json.dumps(["A", "G"]), f"CA{i}"] for i in range(1, 6)]
+
+
+def test_gzip_decompressor_handles_multiple_members():
+    data = gzip.compress(b"abc\n") + gzip.compress(b"def\n")
+
+    decompressor = GzipDecompressor()
+    decompressed = b"".join(decompressor.decompress(data[i : i + 3]) for i in range(0, len(data), 3))
+
+    assert decompressed == b"abc\ndef\n"
+
+
+def test_adaptive_concurrency_limiter():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=3, target_latency=10)
+
+        # Additive increase after about a limit's worth of fast requests
+        for _ in range(3):
+            await limiter.acquire()
+            limiter.release(latency=1)
+        assert int(limiter.limit) == 3
+
+        for _ in range(10):
+            await limiter.acquire()
+            limiter.release(latency=1)
+        assert limiter.limit == 3
+
+        # Multiplicative decrease, at most once per target latency
+        await limiter.acquire()
+        limiter.release(overloaded=True)
+        await limiter.acquire()
+        limiter.release(latency=20)
+        assert limiter.limit == 1.5
+
+        # Requests wait for a slot
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        limiter.release(latency=1)
+        await asyncio.wait_for(waiting, timeout=1)
+        assert limiter.in_flight == 1
+
+    asyncio.run(run())
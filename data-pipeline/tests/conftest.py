@@ -0,0 +1,9 @@
+import shutil
+
+import pytest
+
+
+def pytest_runtest_setup(item):
+    # Hail can build expressions without Java, but running them requires a JVM
+    if item.get_closest_marker("requires_hail") and shutil.which("java") is None:
+        pytest.skip("Hail requires Java")
@@ -0,0 +1,30 @@
+import tempfile
+
+import attr
+import pytest
+
+
+@pytest.fixture
+def output_tmp():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield temp_dir
+
+
+@attr.define
+class WritableFile:
+    text: str = "Hi"
+
+    def update_text(self, text: str):
+        self.text = text
+
+    def write(self, path, overwrite=False):
+        with open(path, "w") as f:
+            f.write(self.text)
+
+
+@pytest.fixture
+def writable_file():
+    """
+    Task output that writes its text to the task's output path.
+    """
+    return WritableFile
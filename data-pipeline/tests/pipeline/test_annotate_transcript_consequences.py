@@ -0,0 +1,52 @@
+import hail as hl
+import pytest
+
+from data_pipeline.data_types.variant.transcript_consequence.annotate_transcript_consequences import (
+    _annotate_consequences_with_lookups,
+)
+
+
+@pytest.mark.requires_hail
+@pytest.mark.parametrize("lookup_method", ["literal", "join"])
+def test_annotate_consequences_with_lookups(lookup_method):
+    consequence_type = hl.tstruct(transcript_id=hl.tstr, gene_id=hl.tstr)
+    ds = hl.Table.parallelize(
+        [
+            {"id": 1, "csqs": [{"transcript_id": "T2", "gene_id": "G1"}, {"transcript_id": "T1", "gene_id": "G1"}]},
+            {"id": 2, "csqs": []},
+            {"id": 3, "csqs": None},
+            {"id": 4, "csqs": [{"transcript_id": "T3", "gene_id": "G2"}]},
+        ],
+        hl.tstruct(id=hl.tint32, csqs=hl.tarray(consequence_type)),
+        key="id",
+    )
+    transcripts = hl.Table.parallelize(
+        [{"transcript_id": "T1", "version": "1"}, {"transcript_id": "T2", "version": "2"}],
+        hl.tstruct(transcript_id=hl.tstr, version=hl.tstr),
+        key="transcript_id",
+    )
+    genes = hl.Table.parallelize(
+        [{"gene_id": "G1", "symbol": "GENE1"}], hl.tstruct(gene_id=hl.tstr, symbol=hl.tstr), key="gene_id"
+    )
+
+    csqs = _annotate_consequences_with_lookups(
+        ds,
+        ds.csqs,
+        {"transcript": (transcripts, "transcript_id"), "gene": (genes, "gene_id")},
+        lookup_method=lookup_method,
+    )
+    rows = ds.select(csqs=csqs).collect()
+
+    assert [row.csqs for row in rows] == [
+        [
+            hl.Struct(
+                transcript_id="T2", gene_id="G1", transcript=hl.Struct(version="2"), gene=hl.Struct(symbol="GENE1")
+            ),
+            hl.Struct(
+                transcript_id="T1", gene_id="G1", transcript=hl.Struct(version="1"), gene=hl.Struct(symbol="GENE1")
+            ),
+        ],
+        [],
+        None,
+        [hl.Struct(transcript_id="T3", gene_id="G2", transcript=None, gene=None)],
+    ]
@@ -0,0 +1,111 @@
+import gzip
+import os
+import time
+
+import pytest
+
+from data_pipeline.config import PipelineConfig
+from data_pipeline.pipeline import Pipeline, content_fingerprint, set_task_param
+
+
+@pytest.fixture
+def pipeline_tmp(output_tmp):
+    with open(os.path.join(output_tmp, "input.txt"), "w") as f:
+        f.write("input data")
+    return output_tmp
+
+
+@pytest.fixture
+def create_pipeline(pipeline_tmp, writable_file):
+    def create(calls, suffix="processed"):
+        def process(input_path, suffix):
+            calls.append(suffix)
+            with open(input_path) as f:
+                return writable_file(f"{f.read()} {suffix}")
+
+        config = PipelineConfig(name="manifests", input_root=pipeline_tmp, output_root=pipeline_tmp)
+        pipeline = Pipeline(config=config)
+        pipeline.add_task("process", process, "output.txt", {"input_path": "input.txt"}, {"suffix": suffix})
+        return pipeline
+
+    return create
+
+
+def touch(path):
+    future_time = time.time() + 60
+    os.utime(path, (future_time, future_time))
+
+
+def test_task_skipped_when_input_touched_but_unchanged(pipeline_tmp, create_pipeline):
+    calls = []
+    create_pipeline(calls).run()
+    assert os.path.exists(os.path.join(pipeline_tmp, "output.txt.manifest.json"))
+
+    touch(os.path.join(pipeline_tmp, "input.txt"))
+    create_pipeline(calls).run()
+
+    assert calls == ["processed"]
+
+
+def test_task_rerun_when_input_content_changes(pipeline_tmp, create_pipeline):
+    calls = []
+    create_pipeline(calls).run()
+
+    with open(os.path.join(pipeline_tmp, "input.txt"), "w") as f:
+        f.write("new input data")
+    create_pipeline(calls).run()
+
+    assert calls == ["processed", "processed"]
+    with open(os.path.join(pipeline_tmp, "output.txt")) as f:
+        assert f.read() == "new input data processed"
+
+
+def test_task_rerun_when_params_change(create_pipeline):
+    calls = []
+    create_pipeline(calls).run()
+    create_pipeline(calls, suffix="reprocessed").run()
+
+    assert calls == ["processed", "reprocessed"]
+
+
+def test_task_rerun_when_param_set_from_command_line(create_pipeline):
+    calls = []
+    create_pipeline(calls).run()
+
+    pipeline = create_pipeline(calls)
+    set_task_param(pipeline, "process.suffix=reprocessed")
+    pipeline.run()
+
+    assert calls == ["processed", "reprocessed"]
+
+    with pytest.raises(ValueError, match="expected TASK.PARAM=VALUE"):
+        set_task_param(pipeline, "process.suffix")
+
+
+def test_manifest_recorded_for_existing_outputs(pipeline_tmp, create_pipeline):
+    with open(os.path.join(pipeline_tmp, "output.txt"), "w") as f:
+        f.write("input data processed")
+    touch(os.path.join(pipeline_tmp, "output.txt"))
+
+    calls = []
+    create_pipeline(calls).run()
+
+    assert calls == []
+    assert os.path.exists(os.path.join(pipeline_tmp, "output.txt.manifest.json"))
+
+
+def test_content_fingerprint_for_hail_table(pipeline_tmp):
+    table_path = os.path.join(pipeline_tmp, "table.ht")
+    for component in ["globals", "rows"]:
+        os.makedirs(os.path.join(table_path, component, "parts"))
+        with open(os.path.join(table_path, component, "parts", "part-0"), "wb") as f:
+            f.write(b"data")
+    with gzip.open(os.path.join(table_path, "metadata.json.gz"), "wt") as f:
+        f.write('{"components": {"partition_counts": {"counts": [1]}}}')
+
+    fingerprint = content_fingerprint(table_path + "/")
+    assert fingerprint == content_fingerprint(table_path)
+
+    with open(os.path.join(table_path, "rows", "parts", "part-1"), "wb") as f:
+        f.write(b"more data")
+    assert content_fingerprint(table_path) != fingerprint
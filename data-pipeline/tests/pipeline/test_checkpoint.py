@@ -0,0 +1,64 @@
+import os
+from typing import cast
+
+import attr
+import hail as hl
+import pytest
+
+from data_pipeline import pipeline as pipeline_module
+from data_pipeline.config import PipelineConfig
+from data_pipeline.pipeline import Pipeline, checkpoint
+
+
+@attr.define
+class CheckpointableTable:
+    text: str
+
+    def checkpoint(self, path, overwrite=False):
+        os.makedirs(path, exist_ok=overwrite)
+        with open(os.path.join(path, "data"), "w") as f:
+            f.write(self.text)
+        with open(os.path.join(path, "_SUCCESS"), "w") as f:
+            f.write("")
+        return self
+
+    def write(self, path, overwrite=False):
+        with open(path, "w") as f:
+            f.write(self.text)
+
+
+def test_checkpoint_outside_task_returns_table():
+    table = cast(hl.Table, CheckpointableTable("data"))
+    assert checkpoint(table, "step") is table
+
+
+def test_checkpoint_reused_after_failure(output_tmp, monkeypatch):
+    def read_checkpoint(path):
+        with open(os.path.join(path, "data")) as f:
+            return CheckpointableTable(f"{f.read()} (from checkpoint)")
+
+    monkeypatch.setattr(pipeline_module.hl, "read_table", read_checkpoint)
+
+    attempts = []
+
+    def task_fn():
+        ds = checkpoint(cast(hl.Table, CheckpointableTable("expensive")), "expensive_step")
+        attempts.append(ds.text)
+        if len(attempts) == 1:
+            raise RuntimeError("Worker preempted")
+        return ds
+
+    config = PipelineConfig(name="checkpoints", input_root=output_tmp, output_root=output_tmp)
+    pipeline = Pipeline(config=config)
+    pipeline.add_task("task", task_fn, "output.txt")
+
+    with pytest.raises(RuntimeError, match="Worker preempted"):
+        pipeline.run()
+
+    checkpoint_path = os.path.join(output_tmp, "_checkpoints", "task", "expensive_step.ht")
+    assert os.path.exists(os.path.join(checkpoint_path, "_SUCCESS"))
+
+    pipeline.run()
+
+    assert attempts == ["expensive", "expensive (from checkpoint)"]
+    assert not os.path.exists(os.path.join(output_tmp, "_checkpoints", "task"))
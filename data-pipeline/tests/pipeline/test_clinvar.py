@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+import os
+from xml.etree import ElementTree
+
+from data_pipeline.datasets.clinvar import (
+    CLINVAR_VARIANTS_TSV_HEADER,
+    _chunk_variation_archives,
+    _get_variation_archive_version,
+    _parse_changed_variation_archives,
+    _iter_variation_archives,
+    _parse_variant,
+    _parse_variation_archives,
+)
+
+DEFAULT_TRAITS = '<Trait Type="Disease"><Name><ElementValue Type="Preferred">Disease</ElementValue></Name></Trait>'
+
+
+def variation_archive(
+    variation_id, version=1, chromosome="1", position=55516888, traits=DEFAULT_TRAITS, trait_mappings=""
+):
+    return f"""<VariationArchive VariationID="{variation_id}" Accession="VCV{variation_id}" Version="{version}">
+  <InterpretedRecord>
+    <SimpleAllele AlleleID="{variation_id}">
+      <Location>
+        <SequenceLocation Assembly="GRCh38" Chr="{chromosome}" positionVCF="{position}"
+          referenceAlleleVCF="G" alternateAlleleVCF="A" />
+      </Location>
+      <XRefList><XRef DB="dbSNP" ID="rs{variation_id}" /></XRefList>
+    </SimpleAllele>
+    <ReviewStatus>criteria provided, single submitter</ReviewStatus>
+    <Interpretations>
+      <Interpretation Type="Clinical significance" DateLastEvaluated="2020-01-01">
+        <Description>Pathogenic</Description>
+      </Interpretation>
+    </Interpretations>
+    <ClinicalAssertionList>
+      <ClinicalAssertion ID="{variation_id}0">
+        <ClinVarAccession Accession="SCV{variation_id}" SubmitterName="Lab &amp; Clinic" />
+        <Interpretation><Description>Pathogenic</Description></Interpretation>
+        <ReviewStatus>criteria provided, single submitter</ReviewStatus>
+        <TraitSet>{traits}</TraitSet>
+      </ClinicalAssertion>
+    </ClinicalAssertionList>
+    <TraitMappingList>{trait_mappings}</TraitMappingList>
+  </InterpretedRecord>
+</VariationArchive>"""
+
+
+def clinvar_xml(variation_archives):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<ClinVarVariationRelease ReleaseDate="2024-01-01">\n'
+        + "\n".join(variation_archives)
+        + "\n</ClinVarVariationRelease>\n"
+    ).encode("utf8")
+
+
+def test_iter_variation_archives():
+    archives = [variation_archive(i) for i in range(1, 20)]
+
+    # Use a small block size so that tags are split across blocks
+    found_archives = list(_iter_variation_archives(io.BytesIO(clinvar_xml(archives)), block_size=7))
+
+    assert found_archives == [archive.encode("utf8") for archive in archives]
+
+
+def test_chunk_variation_archives():
+    chunks = list(_chunk_variation_archives([b"a" * 10, b"b" * 10, b"c" * 10], chunk_size=15))
+
+    assert chunks == [b"a" * 10 + b"b" * 10, b"c" * 10]
+
+
+def test_get_variation_archive_version():
+    assert _get_variation_archive_version(variation_archive(12345, version=3).encode("utf8")) == ("12345", "3")
+
+
+def test_parse_variation_archives(tmp_path):
+    archives = [variation_archive(1), variation_archive(2, chromosome="Un"), variation_archive(3, chromosome="MT")]
+    output_path = tmp_path / "part-00000.tsv"
+
+    n_variants = _parse_variation_archives("".join(archives).encode("utf8"), str(output_path))
+
+    with open(output_path) as f:
+        rows = list(csv.DictReader(f, delimiter="\t"))
+
+    assert n_variants == 2
+    assert [row["locus_GRCh38"] for row in rows] == ["chr1:55516888", "chrM:55516888"]
+    assert [row["variation_archive_version"] for row in rows] == ["1", "1"]
+
+    variant = json.loads(rows[0]["variant"])
+    assert variant["clinvar_variation_id"] == "1"
+    assert variant["rsid"] == "rs1"
+    assert variant["submissions"][0]["submitter_name"] == "Lab & Clinic"
+    assert variant["submissions"][0]["conditions"] == [{"name": "Disease", "medgen_id": None}]
+
+
+def test_parse_variant_maps_submission_traits_to_medgen():
+    traits = """
+      <Trait Type="Disease"><Name><ElementValue Type="Preferred">Disease</ElementValue></Name></Trait>
+      <Trait Type="Disease"><Name><ElementValue Type="Alternate">Other "disease"</ElementValue></Name></Trait>
+      <Trait Type="Disease"><XRef DB="OMIM" ID="100100" /></Trait>
+    """
+    trait_mappings = """
+      <TraitMapping ClinicalAssertionID="10" TraitType="Disease" MappingType="Name" MappingValue="Disease">
+        <MedGen CUI="C0000001" Name="Disease 1" />
+      </TraitMapping>
+      <TraitMapping ClinicalAssertionID="10" TraitType="Disease" MappingType="Name" MappingValue='Other "disease"'>
+        <MedGen CUI="C0000002" Name="Disease 2" />
+      </TraitMapping>
+      <TraitMapping ClinicalAssertionID="10" TraitType="Disease" MappingType="XRef" MappingValue="100100">
+        <MedGen CUI="C0000003" Name="Disease 3" />
+      </TraitMapping>
+      <TraitMapping ClinicalAssertionID="20" TraitType="Disease" MappingType="XRef" MappingValue="100100">
+        <MedGen CUI="C0000004" Name="Disease 4" />
+      </TraitMapping>
+    """
+
+    variant = _parse_variant(ElementTree.fromstring(variation_archive(1, traits=traits, trait_mappings=trait_mappings)))
+
+    assert variant["submissions"][0]["conditions"] == [
+        {"name": "Disease 1", "medgen_id": "C0000001"},
+        {"name": "Disease 2", "medgen_id": "C0000002"},
+        {"name": "Disease 3", "medgen_id": "C0000003"},
+    ]
+
+
+def test_parse_changed_variation_archives(tmp_path):
+    archives = [variation_archive(1), variation_archive(2, version=2), variation_archive(3)]
+
+    n_variants, unchanged_variation_ids = _parse_changed_variation_archives(
+        io.BytesIO(clinvar_xml(archives)), str(tmp_path), previous_versions={"1": "1", "2": "1"}, n_workers=1
+    )
+
+    assert n_variants == 2
+    assert unchanged_variation_ids == ["1"]
+    with open(tmp_path / "part-00000.tsv") as f:
+        assert [row["variation_archive_version"] for row in csv.DictReader(f, delimiter="\t")] == ["2", "1"]
+
+
+def test_parse_changed_variation_archives_with_no_changes(tmp_path):
+    archives = [variation_archive(1), variation_archive(2)]
+
+    n_variants, unchanged_variation_ids = _parse_changed_variation_archives(
+        io.BytesIO(clinvar_xml(archives)), str(tmp_path), previous_versions={"1": "1", "2": "1"}, n_workers=1
+    )
+
+    assert n_variants == 0
+    assert unchanged_variation_ids == ["1", "2"]
+    # A header-only part is written so that the parts can still be imported
+    assert os.listdir(tmp_path) == ["part-00000.tsv"]
+    with open(tmp_path / "part-00000.tsv") as f:
+        assert f.read().splitlines() == ["\t".join(CLINVAR_VARIANTS_TSV_HEADER)]
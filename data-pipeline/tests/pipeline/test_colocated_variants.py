@@ -0,0 +1,52 @@
+import hail as hl
+import pytest
+
+from data_pipeline.data_types.variant import annotate_colocated_variants, variant_id
+
+
+@pytest.mark.requires_hail
+def test_annotate_colocated_variants():
+    variants = [
+        ("1", 100, ["A", "C"], 1),
+        ("1", 100, ["A", "G"], 0),
+        ("1", 100, ["A", "T"], 2),
+        ("1", 200, ["C", "G"], 1),
+        ("2", 100, ["A", "C"], 1),
+        ("2", 100, ["A", "G"], 1),
+    ]
+    ds = hl.Table.parallelize(
+        [
+            {"locus": hl.Locus(contig, position), "alleles": alleles, "ac": ac}
+            for contig, position, alleles, ac in variants
+        ],
+        hl.tstruct(locus=hl.tlocus(), alleles=hl.tarray(hl.tstr), ac=hl.tint32),
+        key=["locus", "alleles"],
+        # Split a locus across partitions
+        n_partitions=3,
+    )
+    ds = ds.annotate(variant_id=variant_id(ds.locus, ds.alleles))
+
+    result = annotate_colocated_variants(ds, {"all": hl.literal(True), "non_zero": ds.ac > 0})
+    result = result.annotate(
+        colocated_variants=result.colocated_variants.annotate(
+            **{subset: hl.sorted(result.colocated_variants[subset]) for subset in ["all", "non_zero"]}
+        )
+    )
+    assert result.colocated_variants.collect() == [
+        hl.Struct(all=["1-100-A-G", "1-100-A-T"], non_zero=["1-100-A-T"]),
+        hl.Struct(all=["1-100-A-C", "1-100-A-T"], non_zero=["1-100-A-C", "1-100-A-T"]),
+        hl.Struct(all=["1-100-A-C", "1-100-A-G"], non_zero=["1-100-A-C"]),
+        hl.Struct(all=[], non_zero=[]),
+        hl.Struct(all=["2-100-A-G"], non_zero=["2-100-A-G"]),
+        hl.Struct(all=["2-100-A-C"], non_zero=["2-100-A-C"]),
+    ]
+
+    result = annotate_colocated_variants(ds)
+    assert hl.sorted(result.colocated_variants).collect() == [
+        ["1-100-A-G", "1-100-A-T"],
+        ["1-100-A-C", "1-100-A-T"],
+        ["1-100-A-C", "1-100-A-G"],
+        [],
+        ["2-100-A-G"],
+        ["2-100-A-C"],
+    ]
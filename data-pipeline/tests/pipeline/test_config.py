@@ -2,7 +2,6 @@
 import os
 import pytest
 import tempfile
-import attr
 
 from data_pipeline.config import DataEnvironment, PipelineConfig, get_data_environment
 from data_pipeline.pipeline import Pipeline
@@ -18,12 +17,6 @@ def input_tmp():
         yield temp_dir
 
 
-@pytest.fixture
-def output_tmp():
-    with tempfile.TemporaryDirectory() as temp_dir:
-        yield temp_dir
-
-
 def test_get_data_environment_defaults_mock():
     data_environment = get_data_environment("mock")
     assert data_environment == DataEnvironment.mock
@@ -52,23 +45,11 @@ def test_config_read_input_file(input_tmp, output_tmp):
         assert f.read() == "tiny dataset"
 
 
-@attr.define
-class WritableFile:
-    text: str = "Hi"
-
-    def update_text(self, text: str):
-        self.text = text
-
-    def write(self, path, overwrite=False):
-        with open(path, "w") as f:
-            f.write(self.text)
-
-
-def test_pipeline_tasks(input_tmp, output_tmp):
+def test_pipeline_tasks(input_tmp, output_tmp, writable_file):
     def task_1_fn(input_file_path):
         with open(input_file_path, "r") as f:
             input_data = f.read()
-            output_data = WritableFile()
+            output_data = writable_file()
             output_data.update_text(f"{input_data} processed")
             return output_data
 
@@ -0,0 +1,70 @@
+import hail as hl
+import pytest
+
+from data_pipeline.data_types.coverage import COVERAGE_METRICS, bin_coverage, run_length_encode_coverage
+
+pytestmark = pytest.mark.requires_hail
+
+
+def coverage_table(rows):
+    return hl.Table.parallelize(
+        [
+            {"locus": hl.Locus(contig, position, "GRCh38"), **{metric: value for metric in COVERAGE_METRICS}}
+            for contig, position, value in rows
+        ],
+        hl.tstruct(locus=hl.tlocus("GRCh38"), **{metric: hl.tfloat64 for metric in COVERAGE_METRICS}),
+        key="locus",
+    )
+
+
+def test_run_length_encode_coverage():
+    coverage = coverage_table(
+        [
+            ("chr1", 1, 0.5),
+            ("chr1", 2, 0.5),
+            ("chr1", 3, 0.52),
+            # Gap between positions
+            ("chr1", 5, 0.52),
+            ("chr1", 6, 0.51),
+            ("chr2", 7, 0.51),
+        ]
+    )
+
+    runs = run_length_encode_coverage(coverage).collect()
+
+    assert [(run.locus.position, run.end, run.mean) for run in runs] == [
+        (1, 2, 0.5),
+        (3, 3, 0.52),
+        (5, 5, 0.52),
+        (6, 6, 0.51),
+        (7, 7, 0.51),
+    ]
+
+    runs = run_length_encode_coverage(coverage, precision={metric: 1 for metric in COVERAGE_METRICS}).collect()
+
+    assert [(run.locus.contig, run.locus.position, run.end, run.mean) for run in runs] == [
+        ("chr1", 1, 3, 0.5),
+        ("chr1", 5, 6, 0.5),
+        ("chr2", 7, 7, 0.5),
+    ]
+    assert runs[0].xend == 1_000_000_003
+
+
+def test_bin_coverage():
+    coverage = coverage_table([("chr1", position, float(position)) for position in range(1, 26)])
+
+    bins = bin_coverage(coverage, bin_sizes=[10, 20]).collect()
+
+    assert [(b.bin_size, b.locus.position, b.n_bases, b.mean) for b in bins] == [
+        (10, 1, 10, 5.5),
+        (10, 11, 10, 15.5),
+        (10, 21, 5, 23.0),
+        (20, 1, 20, 10.5),
+        (20, 21, 5, 23.0),
+    ]
+    assert bins[0].document_id == "10-1000000001"
+
+
+def test_bin_coverage_requires_nested_bin_sizes():
+    with pytest.raises(ValueError):
+        bin_coverage(coverage_table([("chr1", 1, 1.0)]), bin_sizes=[10, 25])
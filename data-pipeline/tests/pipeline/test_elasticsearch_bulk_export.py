@@ -0,0 +1,247 @@
+import io
+import json
+from typing import cast
+
+import elasticsearch
+import pytest
+
+from data_pipeline.helpers.elasticsearch_bulk_export import (
+    AdaptiveBatchSize,
+    BulkLoadProgress,
+    ExportLedger,
+    ExportProgressMonitor,
+    ThroughputBudget,
+    bulk_index_partition,
+    bulk_load_partitions,
+    get_partition_index,
+    parse_document_line,
+)
+from data_pipeline.helpers.elasticsearch_value_encoding import add_encoded_value, decode_value
+
+
+class FakeElasticsearchClient:
+    def __init__(self, responses=None):
+        self.responses = list(responses or [])
+        self.requests = []
+
+    def bulk(self, body, index, request_timeout=None):  # pylint: disable=unused-argument
+        lines = body.strip().split("\n")
+        self.requests.append(lines)
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        return {"errors": False, "items": [{"index": {"status": 201}} for _ in lines[::2]]}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr("data_pipeline.helpers.elasticsearch_bulk_export.time.sleep", lambda seconds: None)
+
+
+def test_adaptive_batch_size():
+    batch_size = AdaptiveBatchSize(1000, min_size=100, max_size=1200, target_latency=1.0)
+
+    batch_size.record_success(0.5)
+    assert batch_size.size == 1100
+    batch_size.record_success(0.5)
+    batch_size.record_success(0.5)
+    assert batch_size.size == 1200
+
+    batch_size.record_rejection()
+    assert batch_size.size == 600
+    batch_size.record_success(2.0)
+    assert batch_size.size == 450
+
+    for _ in range(10):
+        batch_size.record_rejection()
+    assert batch_size.size == 100
+
+
+def test_bulk_index_partition_batches_documents():
+    es_client = FakeElasticsearchClient()
+    lines = io.StringIO("".join(f'{i}\t{{"id": {i}}}\n' for i in range(25)))
+
+    n_documents = bulk_index_partition(es_client, "test", lines, AdaptiveBatchSize(10, min_size=1), has_ids=True)
+
+    assert n_documents == 25
+    assert [len(request) // 2 for request in es_client.requests] == [10, 11, 4]
+    assert es_client.requests[0][:2] == ['{"index": {"_id": "0"}}', '{"id": 0}']
+
+
+def test_bulk_index_partition_retries_rejected_documents():
+    es_client = FakeElasticsearchClient(
+        [
+            elasticsearch.TransportError(429, "es_rejected_execution_exception"),
+            {"errors": True, "items": [{"index": {"status": 201}}, {"index": {"status": 429}}]},
+        ]
+    )
+    lines = ['a\t{"id": "a"}\n', 'b\t{"id": "b"}\n']
+
+    bulk_index_partition(es_client, "test", lines, AdaptiveBatchSize(10, min_size=1), has_ids=True)
+
+    assert len(es_client.requests) == 3
+    assert es_client.requests[2] == ['{"index": {"_id": "b"}}', '{"id": "b"}']
+
+
+def test_bulk_index_partition_raises_indexing_errors():
+    es_client = FakeElasticsearchClient(
+        [{"errors": True, "items": [{"index": {"status": 400, "error": {"type": "mapper_parsing_exception"}}}]}]
+    )
+
+    with pytest.raises(RuntimeError, match="mapper_parsing_exception"):
+        bulk_index_partition(es_client, "test", ['{"id": "a"}\n'], AdaptiveBatchSize(10), has_ids=False)
+
+
+def test_bulk_load_partitions_reports_failed_partitions():
+    partitions = {
+        "part-0": ['{"id": "a"}\n'],
+        "part-1": ['{"id": "b"}\n', "not a document\n"],
+    }
+
+    class FailingClient(FakeElasticsearchClient):
+        def bulk(self, body, index, request_timeout=None):
+            if "not a document" in body:
+                return {"errors": True, "items": [{"index": {"status": 201}}, {"index": {"status": 400}}]}
+            return super().bulk(body, index, request_timeout)
+
+    with pytest.raises(RuntimeError, match="Failed to load 1 of 2 partitions: part-1"):
+        bulk_load_partitions(
+            FailingClient(),
+            "test",
+            list(partitions),
+            has_ids=False,
+            initial_batch_size=10,
+            num_workers=2,
+            open_partition=lambda path: io.StringIO("".join(partitions[path])),
+        )
+
+
+def test_get_partition_index():
+    assert get_partition_index("gs://bucket/export.json/part-00012-2-12-0-6f2a0f1e") == 12
+    assert get_partition_index("/tmp/export.json/part-3") == 3
+
+    with pytest.raises(ValueError):
+        get_partition_index("/tmp/export.json/header")
+
+
+def test_bulk_load_partitions_skips_partitions_in_ledger():
+    partitions = {f"part-{i}": [f'{{"id": {i}}}\n'] for i in range(4)}
+
+    class FakeLedger:
+        def __init__(self, completed_partitions):
+            self.completed = dict.fromkeys(completed_partitions, 1)
+
+        def completed_partitions(self):
+            return set(self.completed)
+
+        def record_partition(self, partition, n_documents):
+            self.completed[partition] = n_documents
+
+    es_client = FakeElasticsearchClient()
+    ledger = FakeLedger([0, 2])
+
+    bulk_load_partitions(
+        es_client,
+        "test",
+        list(partitions),
+        has_ids=False,
+        initial_batch_size=10,
+        num_workers=2,
+        ledger=cast(ExportLedger, ledger),
+        open_partition=lambda path: io.StringIO("".join(partitions[path])),
+    )
+
+    assert sorted(request[1] for request in es_client.requests) == ['{"id": 1}', '{"id": 3}']
+    assert ledger.completed == {0: 1, 1: 1, 2: 1, 3: 1}
+
+
+def test_throughput_budget(monkeypatch):
+    clock = {"now": 0.0}
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock["now"] += seconds
+
+    monkeypatch.setattr("data_pipeline.helpers.elasticsearch_bulk_export.time.perf_counter", lambda: clock["now"])
+    monkeypatch.setattr("data_pipeline.helpers.elasticsearch_bulk_export.time.sleep", sleep)
+
+    budget = ThroughputBudget(100)
+    budget.acquire(100)
+    assert not sleeps
+
+    budget.acquire(50)
+    assert sleeps == [0.5]
+
+    clock["now"] += 10
+    budget.acquire(100)
+    assert sleeps == [0.5]
+
+
+def test_export_progress_monitor_combines_progress(monkeypatch):
+    messages = []
+    monkeypatch.setattr("data_pipeline.helpers.elasticsearch_bulk_export.logger.info", messages.append)
+
+    monitor = ExportProgressMonitor()
+
+    progress = BulkLoadProgress(10)
+    progress.record_documents(1000)
+    progress.record_partition()
+
+    monitor.set_status("gnomad_v4_variants", "running")
+    monitor.track_bulk_load("gnomad_v4_variants", progress)
+    monitor.set_status("genes_grch38", "done")
+    monitor.set_status("transcripts_grch38", "waiting")
+    monitor.log()
+
+    assert messages == [
+        "Export progress:\n"
+        "  gnomad_v4_variants: running, 1/10 partitions, 1,000 documents\n"
+        "  genes_grch38: done\n"
+        "  transcripts_grch38: waiting"
+    ]
+
+
+def test_add_encoded_value():
+    value = {"variant_id": "1-55516888-G-GA", "populations": [{"id": "afr", "ac": 1}]}
+
+    document = json.loads(add_encoded_value('{"variant_id":"1-55516888-G-GA"}', json.dumps(value)))
+    assert document["variant_id"] == "1-55516888-G-GA"
+    assert decode_value(document["value"]) == value
+
+    document = json.loads(add_encoded_value("{}", json.dumps(value)))
+    assert list(document.keys()) == ["value"]
+
+
+def test_parse_document_line_with_encoded_values():
+    document_id, document = parse_document_line('abc\t{"id":"abc"}\t{"ac":1}\n', has_ids=True, encode_values=True)
+
+    assert document_id == "abc"
+    assert decode_value(json.loads(document)["value"]) == {"ac": 1}
+
+
+def test_export_ledger_records_value_encoding():
+    class FakeLedgerClient:
+        def __init__(self):
+            self.indices = self
+            self.documents = {}
+
+        def exists(self, index):  # pylint: disable=unused-argument
+            return True
+
+        def index(self, index, id, body, refresh=False):  # pylint: disable=redefined-builtin,unused-argument
+            self.documents[id] = body
+
+        def get(self, index, id):  # pylint: disable=redefined-builtin,unused-argument
+            return {"_source": self.documents[id]}
+
+    ledger = ExportLedger(FakeLedgerClient(), "variants-2024-01-01")
+    ledger.start("/tmp/export.json", 4, value_encoding="zlib")
+
+    export = ledger.get_export()
+    assert export is not None
+    assert export["value_encoding"] == "zlib"
+    assert export["partitions"] == 4
@@ -0,0 +1,266 @@
+import hail as hl
+import pytest
+
+from data_pipeline.helpers.elasticsearch_export import (
+    LoadProfile,
+    MappingHints,
+    _documents_match,
+    delete_old_indices,
+    export_table_to_elasticsearch,
+    finalize_index,
+    get_index_settings,
+    optimize_mapping,
+    update_alias,
+    validate_index,
+)
+
+
+class FakeIndicesClient:
+    def __init__(self, indices=None, aliases=None):
+        self.calls = []
+        self.indices = list(indices or [])
+        self.aliases = dict(aliases or {})
+
+    def exists_alias(self, name):
+        return name in self.aliases.values()
+
+    def get_alias(self, name):
+        return {index: {"aliases": {name: {}}} for index, alias in self.aliases.items() if alias == name}
+
+    def update_aliases(self, body):
+        self.calls.append(("update_aliases", body))
+
+    def delete(self, index):
+        self.indices.remove(index)
+
+    def put_settings(self, index, body):
+        self.calls.append(("put_settings", index, body))
+
+    def refresh(self, index):
+        self.calls.append(("refresh", index))
+
+    def forcemerge(self, index, request_timeout=None, **kwargs):  # pylint: disable=unused-argument
+        self.calls.append(("forcemerge", index, kwargs))
+
+
+class FakeCatClient:
+    def __init__(self, indices_client):
+        self.indices_client = indices_client
+
+    def indices(self, index, format, h):  # pylint: disable=redefined-builtin,unused-argument
+        prefix = index.rstrip("*")
+        return [{"index": i} for i in self.indices_client.indices if i.startswith(prefix)]
+
+
+class FakeElasticsearchClient:
+    def __init__(self, indices=None, aliases=None, documents=None):
+        self.indices = FakeIndicesClient(indices, aliases)
+        self.cat = FakeCatClient(self.indices)
+        self.documents = dict(documents or {})
+
+    def count(self, index):  # pylint: disable=unused-argument
+        return {"count": len(self.documents)}
+
+    def mget(self, index, body):  # pylint: disable=unused-argument
+        return {
+            "docs": [
+                {"_id": doc_id, "found": doc_id in self.documents, "_source": self.documents.get(doc_id)}
+                for doc_id in body["ids"]
+            ]
+        }
+
+
+def test_get_index_settings_with_default_profile():
+    settings = get_index_settings(4, LoadProfile())
+
+    assert settings["index.number_of_shards"] == 4
+    assert settings["index.number_of_replicas"] == 0
+    assert settings["index.refresh_interval"] == -1
+    assert "index.sort.field" not in settings
+
+
+def test_get_index_settings_with_profile():
+    load_profile = LoadProfile(
+        bulk_settings={"index.translog.durability": "async", "index.codec": "default"},
+        index_sort=["locus.contig", "locus.position"],
+        store_preload=["nvd", "dvd"],
+    )
+
+    settings = get_index_settings(1, load_profile)
+
+    assert settings["index.sort.field"] == ["locus.contig", "locus.position"]
+    assert settings["index.sort.order"] == ["asc", "asc"]
+    assert settings["index.store.preload"] == ["nvd", "dvd"]
+    assert settings["index.translog.durability"] == "async"
+    assert settings["index.codec"] == "default"
+
+
+def test_finalize_index():
+    es_client = FakeElasticsearchClient()
+
+    finalize_index(es_client, "test", LoadProfile(replicas=1, refresh_interval="30s", max_num_segments=1))
+
+    assert es_client.indices.calls == [
+        ("put_settings", "test", {"index.refresh_interval": "30s"}),
+        ("refresh", "test"),
+        ("forcemerge", "test", {"max_num_segments": 1}),
+        ("put_settings", "test", {"index.number_of_replicas": 1}),
+    ]
+
+
+def test_finalize_index_with_default_profile():
+    es_client = FakeElasticsearchClient()
+
+    finalize_index(es_client, "test", LoadProfile())
+
+    assert es_client.indices.calls == [
+        ("put_settings", "test", {"index.refresh_interval": None}),
+        ("refresh", "test"),
+        ("forcemerge", "test", {}),
+    ]
+
+
+def test_update_alias():
+    es_client = FakeElasticsearchClient(aliases={"genes-2024-01-01--00-00": "genes"})
+
+    update_alias(es_client, "genes", "genes-2024-02-01--00-00")
+
+    assert es_client.indices.calls == [
+        (
+            "update_aliases",
+            {
+                "actions": [
+                    {"remove": {"index": "genes-2024-01-01--00-00", "alias": "genes"}},
+                    {"add": {"index": "genes-2024-02-01--00-00", "alias": "genes"}},
+                ]
+            },
+        )
+    ]
+
+
+def test_delete_old_indices():
+    es_client = FakeElasticsearchClient(
+        indices=[
+            "genes-2024-01-01--00-00",
+            "genes-2024-02-01--00-00",
+            "genes-2024-03-01--00-00",
+            "genes-2024-04-01--00-00",
+            "genes-test",
+        ],
+        aliases={"genes-2024-01-01--00-00": "genes"},
+    )
+
+    deleted_indices = delete_old_indices(es_client, "genes", 2)
+
+    assert deleted_indices == ["genes-2024-02-01--00-00"]
+    assert es_client.indices.indices == [
+        "genes-2024-01-01--00-00",
+        "genes-2024-03-01--00-00",
+        "genes-2024-04-01--00-00",
+        "genes-test",
+    ]
+
+
+def test_documents_match():
+    expected = {"variant_id": "1-55516888-G-GA", "af": 0.1, "flags": [], "filters": None, "locus": {"position": 1}}
+
+    assert _documents_match(
+        expected, {"variant_id": "1-55516888-G-GA", "af": 0.10000000001, "flags": [], "locus": {"position": 1}}
+    )
+    assert not _documents_match(
+        expected, {"variant_id": "1-55516888-G-GA", "af": 0.2, "flags": [], "locus": {"position": 1}}
+    )
+    assert not _documents_match(expected, {"variant_id": "1-55516888-G-GA", "af": 0.1, "locus": {"position": 1}})
+
+
+@pytest.mark.requires_hail
+def test_validate_index_without_encoded_values():
+    table = hl.Table.parallelize(
+        [{"variant_id": "1-100-A-C", "ac": 1}, {"variant_id": "1-200-C-G", "ac": 2}],
+        hl.tstruct(variant_id=hl.tstr, ac=hl.tint32),
+    )
+    # Documents for tables without index_fields contain the whole row and no value field
+    es_client = FakeElasticsearchClient(
+        documents={
+            "1-100-A-C": {"variant_id": "1-100-A-C", "ac": 1},
+            "1-200-C-G": {"variant_id": "1-200-C-G", "ac": 2},
+        }
+    )
+
+    validate_index(es_client, "variants", table, id_field="variant_id", value_encoding="json")
+
+    es_client.documents["1-200-C-G"] = {"variant_id": "1-200-C-G", "ac": 3}
+    with pytest.raises(RuntimeError, match="does not match"):
+        validate_index(es_client, "variants", table, id_field="variant_id", value_encoding="json")
+
+
+def test_optimize_mapping():
+    mapping = {
+        "properties": {
+            "locus": {"type": "object", "properties": {"contig": {"type": "keyword"}, "position": {"type": "integer"}}},
+            "xpos": {"type": "long"},
+            "over_20": {"type": "double"},
+            "transcript_consequences": {
+                "type": "nested",
+                "properties": {"gene_id": {"type": "keyword"}, "lof": {"type": "keyword"}},
+            },
+            "populations": {"type": "nested", "properties": {"id": {"type": "keyword"}}},
+            "value": {"enabled": False, "properties": {"id": {"type": "keyword"}}},
+        }
+    }
+    mapping_hints = MappingHints(
+        searched_fields=["locus", "transcript_consequences.gene_id"],
+        aggregated_fields=["locus.position", "over_20"],
+        nested_fields=["transcript_consequences"],
+        field_types={"over_20": {"type": "scaled_float", "scaling_factor": 1000}},
+    )
+
+    optimize_mapping(mapping, mapping_hints)
+
+    assert mapping["properties"] == {
+        "locus": {
+            "type": "object",
+            "properties": {
+                "contig": {"type": "keyword", "doc_values": False},
+                "position": {"type": "integer"},
+            },
+        },
+        "xpos": {"type": "long", "index": False, "doc_values": False},
+        "over_20": {"type": "scaled_float", "scaling_factor": 1000, "index": False},
+        "transcript_consequences": {
+            "type": "nested",
+            "properties": {
+                "gene_id": {"type": "keyword", "doc_values": False},
+                "lof": {"type": "keyword", "index": False, "doc_values": False},
+            },
+        },
+        "populations": {"properties": {"id": {"type": "keyword", "index": False, "doc_values": False}}},
+        "value": {"enabled": False, "properties": {"id": {"type": "keyword"}}},
+    }
+
+
+def test_optimize_mapping_with_encoded_values():
+    mapping = {
+        "properties": {
+            "variant_id": {"type": "keyword"},
+            "xpos": {"type": "long"},
+            "flags": {"enabled": False},
+            "value": {"type": "binary"},
+        }
+    }
+    mapping_hints = MappingHints(searched_fields=["variant_id"], aggregated_fields=["xpos"])
+
+    optimize_mapping(mapping, mapping_hints)
+
+    assert mapping["properties"] == {
+        "variant_id": {"type": "keyword", "doc_values": False},
+        "xpos": {"type": "long", "index": False},
+        "flags": {"enabled": False},
+        "value": {"type": "binary", "doc_values": False},
+    }
+
+
+def test_export_without_ids_cannot_be_resumed():
+    # Documents without IDs from a partly loaded partition would be duplicated when the partition is sent again
+    with pytest.raises(ValueError, match="with IDs"):
+        export_table_to_elasticsearch(None, "localhost", "variants", engine="bulk", resume_index="variants-2024-01-01")
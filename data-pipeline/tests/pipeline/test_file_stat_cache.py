@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+import pytest
+
+from data_pipeline.pipeline import FileStatCache
+
+
+@pytest.fixture
+def files_tmp():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(os.path.join(temp_dir, "file.txt"), "w") as f:
+            f.write("data")
+        os.makedirs(os.path.join(temp_dir, "table.ht"))
+        with open(os.path.join(temp_dir, "table.ht", "_SUCCESS"), "w") as f:
+            f.write("")
+        yield temp_dir
+
+
+def test_file_stat_cache_checks_files_and_tables(files_tmp):
+    cache = FileStatCache()
+    cache.prefetch([os.path.join(files_tmp, "file.txt"), os.path.join(files_tmp, "table.ht")])
+
+    assert cache.exists(os.path.join(files_tmp, "file.txt"))
+    assert cache.exists(os.path.join(files_tmp, "table.ht"))
+    assert cache.exists(os.path.join(files_tmp, "table.ht/"))
+    assert not cache.exists(os.path.join(files_tmp, "other.txt"))
+    assert not cache.exists(os.path.join(files_tmp, "nonexistent", "other.txt"))
+
+    with pytest.raises(FileNotFoundError):
+        cache.modified_time(os.path.join(files_tmp, "other.txt"))
+
+
+def test_file_stat_cache_invalidate(files_tmp):
+    cache = FileStatCache()
+    new_file_path = os.path.join(files_tmp, "new_file.txt")
+    assert not cache.exists(new_file_path)
+
+    with open(new_file_path, "w") as f:
+        f.write("data")
+
+    # Listings are cached until invalidated
+    assert not cache.exists(new_file_path)
+    cache.invalidate(new_file_path)
+    assert cache.exists(new_file_path)
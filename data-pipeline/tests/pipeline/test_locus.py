@@ -0,0 +1,41 @@
+import hail as hl
+import pytest
+
+from data_pipeline.data_types.locus import CONTIG_NUMBERS, NORMALIZED_CONTIGS, normalized_contig, x_position
+
+
+def test_contig_numbers():
+    assert CONTIG_NUMBERS["1"] == CONTIG_NUMBERS["chr1"] == 1
+    assert CONTIG_NUMBERS["22"] == CONTIG_NUMBERS["chr22"] == 22
+    assert CONTIG_NUMBERS["X"] == CONTIG_NUMBERS["chrX"] == 23
+    assert CONTIG_NUMBERS["Y"] == CONTIG_NUMBERS["chrY"] == 24
+    assert CONTIG_NUMBERS["MT"] == CONTIG_NUMBERS["chrM"] == 25
+
+
+def test_normalized_contigs():
+    assert NORMALIZED_CONTIGS["chr1"] == "1"
+    assert NORMALIZED_CONTIGS["chrX"] == "X"
+    assert NORMALIZED_CONTIGS["MT"] == NORMALIZED_CONTIGS["chrM"] == "M"
+    assert set(NORMALIZED_CONTIGS) == set(CONTIG_NUMBERS)
+
+
+@pytest.mark.requires_hail
+@pytest.mark.parametrize("reference_genome", ["GRCh37", "GRCh38"])
+def test_x_position_matches_string_expressions(reference_genome):
+    contigs = hl.get_reference(reference_genome).contigs
+    ds = hl.Table.parallelize(
+        [{"locus": hl.Locus(contig, 1, reference_genome)} for contig in contigs if contig in CONTIG_NUMBERS],
+        hl.tstruct(locus=hl.tlocus(reference_genome)),
+    )
+    ds = ds.annotate(
+        xpos=x_position(ds.locus),
+        xpos_from_contig=x_position(ds.locus.contig, ds.locus.position),
+        chrom=normalized_contig(ds.locus),
+        chrom_from_contig=normalized_contig(ds.locus.contig),
+        expected_chrom=hl.rbind(ds.locus.contig.replace("^chr", ""), lambda c: hl.if_else(c == "MT", "M", c)),
+    )
+    rows = ds.collect()
+
+    assert [row.xpos for row in rows] == [CONTIG_NUMBERS[row.locus.contig] * 1_000_000_000 + 1 for row in rows]
+    assert all(row.xpos == row.xpos_from_contig for row in rows)
+    assert all(row.chrom == row.chrom_from_contig == row.expected_chrom for row in rows)
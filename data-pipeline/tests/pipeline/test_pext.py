@@ -0,0 +1,46 @@
+import hail as hl
+import pytest
+
+from data_pipeline.data_types.pext import TISSUE_NAME_MAP, prepare_base_level_pext
+
+
+@pytest.mark.requires_hail
+def test_prepare_base_level_pext(tmp_path):
+    bases = [
+        ("ENSG1", 10, 0.5),
+        ("ENSG1", 11, 0.5),
+        ("ENSG1", 12, None),
+        ("ENSG1", 13, float("nan")),
+        # Gap between positions
+        ("ENSG1", 20, 0.0),
+        ("ENSG2", 11, 0.5),
+    ]
+    ds = hl.Table.parallelize(
+        [
+            {
+                "locus": hl.Locus("1", position, "GRCh37"),
+                "ensg": gene_id,
+                "mean_proportion": value,
+                **{tissue: value for tissue in TISSUE_NAME_MAP},
+            }
+            for gene_id, position, value in bases
+        ],
+        hl.tstruct(
+            locus=hl.tlocus("GRCh37"),
+            ensg=hl.tstr,
+            mean_proportion=hl.tfloat64,
+            **{tissue: hl.tfloat64 for tissue in TISSUE_NAME_MAP},
+        ),
+        key="locus",
+    )
+    ds.write(str(tmp_path / "pext.ht"))
+
+    genes = prepare_base_level_pext(str(tmp_path / "pext.ht")).collect()
+
+    assert [gene.gene_id for gene in genes] == ["ENSG1", "ENSG2"]
+    assert [(region.start, region.stop, region.mean) for region in genes[0].regions] == [
+        (10, 11, 0.5),
+        (12, 13, 0.0),
+        (20, 20, 0.0),
+    ]
+    assert [(region.start, region.stop, region.tissues.liver) for region in genes[1].regions] == [(11, 11, 0.5)]
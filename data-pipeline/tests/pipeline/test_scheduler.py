@@ -0,0 +1,80 @@
+import os
+import threading
+
+import pytest
+
+from data_pipeline.config import PipelineConfig
+from data_pipeline.pipeline import Pipeline, get_critical_path
+
+
+def test_pipeline_task_graph(output_tmp, writable_file):
+    config = PipelineConfig(name="graph", input_root=output_tmp, output_root=output_tmp)
+    pipeline = Pipeline(config=config)
+
+    pipeline.add_task("a", lambda: writable_file("a"), "a.txt")
+    pipeline.add_task("b", lambda: writable_file("b"), "b.txt")
+    pipeline.add_task("c", lambda a, b: writable_file("c"), "c.txt", {"a": pipeline.get_task("a"), "b": "b.txt"})
+
+    assert pipeline.get_task_graph() == {"a": [], "b": [], "c": ["a"]}
+
+
+def test_pipelines_do_not_share_tasks(output_tmp, writable_file):
+    config = PipelineConfig(name="first", input_root=output_tmp, output_root=output_tmp)
+    Pipeline(config=config).add_task("a", lambda: writable_file("a"), "a.txt")
+
+    assert not Pipeline(config=config).get_all_task_names()
+
+
+def test_pipeline_runs_independent_tasks_concurrently(output_tmp, writable_file):
+    config = PipelineConfig(name="concurrent", input_root=output_tmp, output_root=output_tmp)
+    pipeline = Pipeline(config=config)
+
+    # Both branches must be running at the same time to get past the barrier
+    barrier = threading.Barrier(2, timeout=10)
+
+    def branch_fn(text):
+        barrier.wait()
+        return writable_file(text)
+
+    def merge_fn(left_path, right_path):
+        with open(left_path) as left, open(right_path) as right:
+            return writable_file(left.read() + right.read())
+
+    pipeline.add_task("left", branch_fn, "left.txt", params={"text": "left"})
+    pipeline.add_task("right", branch_fn, "right.txt", params={"text": "right"})
+    pipeline.add_task(
+        "merge",
+        merge_fn,
+        "merged.txt",
+        {"left_path": pipeline.get_task("left"), "right_path": pipeline.get_task("right")},
+    )
+
+    pipeline.run(max_concurrency=2)
+
+    with open(os.path.join(output_tmp, "merged.txt")) as f:
+        assert f.read() == "leftright"
+
+
+def test_pipeline_does_not_run_dependents_of_failed_tasks(output_tmp, writable_file):
+    config = PipelineConfig(name="failure", input_root=output_tmp, output_root=output_tmp)
+    pipeline = Pipeline(config=config)
+
+    def failing_fn():
+        raise ValueError("Task failed")
+
+    pipeline.add_task("fail", failing_fn, "fail.txt")
+    pipeline.add_task(
+        "downstream", lambda path: writable_file("x"), "downstream.txt", {"path": pipeline.get_task("fail")}
+    )
+
+    with pytest.raises(RuntimeError, match="Task fail failed"):
+        pipeline.run(max_concurrency=2)
+
+    assert not os.path.exists(os.path.join(output_tmp, "downstream.txt"))
+
+
+def test_get_critical_path():
+    graph = {"a": [], "b": [], "c": ["a", "b"], "d": ["b"]}
+    durations = {"a": 10.0, "b": 2.0, "c": 5.0, "d": 12.0}
+
+    assert get_critical_path(graph, durations) == (["a", "c"], 15.0)
@@ -0,0 +1,39 @@
+import csv
+import io
+
+from data_pipeline.helpers.task_metrics import TableStats, TaskMetrics, task_metrics_csv
+
+
+def test_task_metrics_csv():
+    task_metrics = [
+        TaskMetrics(
+            task_name="prepare_variants",
+            ran=True,
+            wall_time=120.5,
+            spark_jobs=3,
+            spark_stages=7,
+            shuffle_read_bytes=1024,
+            shuffle_write_bytes=2048,
+            peak_executor_memory_bytes=4096,
+            inputs={
+                "exome_variants_path": TableStats(rows=100, partitions=10, size_bytes=1000),
+                "genome_variants_path": TableStats(rows=50, partitions=5, size_bytes=500),
+                "gtf_path": None,
+            },
+            output=TableStats(rows=120, partitions=8, size_bytes=800),
+        ),
+        TaskMetrics(task_name="annotate_variants", ran=False, wall_time=0.1),
+    ]
+
+    rows = list(csv.DictReader(io.StringIO(task_metrics_csv(task_metrics))))
+
+    assert rows[0]["task_name"] == "prepare_variants"
+    assert rows[0]["shuffle_write_bytes"] == "2048"
+    assert rows[0]["input_rows"] == "150"
+    assert rows[0]["input_partitions"] == "15"
+    assert rows[0]["output_rows"] == "120"
+    assert rows[0]["output_size_bytes"] == "800"
+
+    assert rows[1]["ran"] == "False"
+    assert rows[1]["spark_jobs"] == ""
+    assert rows[1]["input_rows"] == ""
@@ -0,0 +1,107 @@
+import random
+
+import hail as hl
+import pytest
+
+from data_pipeline.data_types.variant import compressed_variant_id as hail_compressed_variant_id
+from data_pipeline.data_types.variant import variant_id as hail_variant_id
+from data_pipeline.data_types.variant.variant_id_codec import (
+    CompressedVariantId,
+    compressed_variant_id,
+    compressed_variant_ids,
+    decode_allele,
+    encode_allele,
+    encode_alleles,
+    parse_compressed_variant_id,
+    parse_variant_id,
+    variant_id,
+)
+
+
+def random_allele(rng, min_length=1, max_length=20, bases="ACGT"):
+    return "".join(rng.choice(bases) for _ in range(rng.randint(min_length, max_length)))
+
+
+def random_variant(rng, contigs=("1", "chr2", "X", "chrY", "MT", "chrM")):
+    contig = rng.choice(contigs)
+    position = rng.randint(1, 16_000 if contig in ("MT", "chrM") else 50_000_000)
+    ref = random_allele(rng)
+    alt = rng.choice([ref[0] + random_allele(rng), ref[0], random_allele(rng, len(ref), len(ref))])
+    return (contig, position, ref, alt)
+
+
+@pytest.mark.parametrize(
+    "allele,expected",
+    [("", ""), ("A", "A"), ("ACG", "G"), ("ACGT", "Gw"), ("GGG", "q"), ("TTT", "_"), ("TTTCCCA", "_VA"), ("AN", None)],
+)
+def test_encode_allele(allele, expected):
+    assert encode_allele(allele) == expected
+    assert encode_alleles([allele]) == [expected]
+
+
+@pytest.mark.parametrize(
+    "variant,expected",
+    [
+        (("1", 55516888, "G", "A"), "1-55516888-G-A"),
+        (("chr1", 55516888, "GAC", "TCA"), "1-55516888-GAC-TCA"),
+        (("1", 55516888, "G", "GA"), "1-55516888i1-g"),
+        (("chrX", 100, "GAT", "G"), "X-100d2-G"),
+        (("MT", 100, "A", "ATTT"), "M-100i3-Pw"),
+        (("chrM", 100, "A", "AN"), None),
+    ],
+)
+def test_compressed_variant_id(variant, expected):
+    assert compressed_variant_id(*variant) == expected
+    assert compressed_variant_ids([variant_id(*variant)]) == [expected]
+
+
+def test_compressed_variant_ids_match_single_variant_encoding():
+    rng = random.Random(0)
+    variants = [random_variant(rng) for _ in range(5000)]
+    variants.append(("1", 100, "A", "ANA"))
+
+    assert compressed_variant_ids([variant_id(*variant) for variant in variants]) == [
+        compressed_variant_id(*variant) for variant in variants
+    ]
+
+
+def test_compressed_variant_id_round_trip():
+    rng = random.Random(1)
+    for _ in range(5000):
+        contig, position, ref, alt = random_variant(rng)
+        compressed_id = compressed_variant_id(contig, position, ref, alt)
+        assert compressed_id is not None
+        parsed_id = parse_compressed_variant_id(compressed_id)
+
+        assert parse_variant_id(variant_id(contig, position, ref, alt))[1:] == (position, ref, alt)
+        assert parsed_id.contig == parse_variant_id(variant_id(contig, position, ref, alt))[0]
+        assert parsed_id.position == position
+        if len(ref) == len(alt):
+            assert parsed_id == CompressedVariantId(parsed_id.contig, position, "substitution", ref, alt, 0)
+        elif len(ref) > len(alt):
+            assert parsed_id == CompressedVariantId(
+                parsed_id.contig, position, "deletion", None, alt, len(ref) - len(alt)
+            )
+        else:
+            assert parsed_id.variant_type == "insertion"
+            assert parsed_id.length_change == len(alt) - len(ref)
+            assert decode_allele(parsed_id.alt, len(alt)) == alt
+
+
+@pytest.mark.requires_hail
+def test_compressed_variant_ids_match_hail():
+    rng = random.Random(2)
+    variants = [random_variant(rng, contigs=("chr1", "chr2", "chrX", "chrY", "chrM")) for _ in range(2000)]
+
+    ds = hl.Table.parallelize(
+        [{"locus": hl.Locus(c, p, "GRCh38"), "alleles": [r, a]} for c, p, r, a in variants],
+        hl.tstruct(locus=hl.tlocus("GRCh38"), alleles=hl.tarray(hl.tstr)),
+    )
+    ds = ds.annotate(
+        variant_id=hail_variant_id(ds.locus, ds.alleles),
+        compressed_id=hail_compressed_variant_id(ds.locus, ds.alleles),
+    )
+    rows = ds.collect()
+
+    assert [row.variant_id for row in rows] == [variant_id(*variant) for variant in variants]
+    assert [row.compressed_id for row in rows] == compressed_variant_ids([row.variant_id for row in rows])
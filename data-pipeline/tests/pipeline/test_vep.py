@@ -0,0 +1,48 @@
+import hail as hl
+import pytest
+
+from data_pipeline.data_types.variant.transcript_consequence.vep import (
+    UNKNOWN_CONSEQUENCE_TERM,
+    UNKNOWN_CONSEQUENCE_TERM_CODE,
+    consequence_term_code,
+    decode_transcript_consequence,
+    encode_consequence_terms,
+    most_severe_consequence_code,
+)
+
+
+@pytest.mark.requires_hail
+def test_encode_consequence_terms():
+    terms = hl.literal(["intron_variant", "splice_region_variant", "splice_donor_region_variant"])
+    mask = encode_consequence_terms(terms)
+    csq = hl.struct(consequence_term_mask=mask, major_consequence_code=most_severe_consequence_code(mask))
+
+    assert hl.eval(decode_transcript_consequence(csq)) == hl.Struct(
+        major_consequence_code=13,
+        consequence_terms=["splice_region_variant", "intron_variant", "splice_donor_region_variant"],
+        major_consequence="splice_region_variant",
+    )
+    assert hl.eval(most_severe_consequence_code(encode_consequence_terms(hl.empty_array(hl.tstr)))) is None
+
+
+@pytest.mark.requires_hail
+def test_encode_unknown_consequence_terms():
+    mask = encode_consequence_terms(hl.literal(["new_consequence_variant", "intron_variant"]))
+    csq = hl.struct(consequence_term_mask=mask, major_consequence_code=most_severe_consequence_code(mask))
+
+    assert hl.eval(decode_transcript_consequence(csq)).consequence_terms == [
+        "intron_variant",
+        UNKNOWN_CONSEQUENCE_TERM,
+    ]
+
+    mask = encode_consequence_terms(hl.literal(["new_consequence_variant"]))
+    csq = hl.struct(consequence_term_mask=mask, major_consequence_code=most_severe_consequence_code(mask))
+
+    assert hl.eval(decode_transcript_consequence(csq)) == hl.Struct(
+        major_consequence_code=UNKNOWN_CONSEQUENCE_TERM_CODE,
+        consequence_terms=[UNKNOWN_CONSEQUENCE_TERM],
+        major_consequence=UNKNOWN_CONSEQUENCE_TERM,
+    )
+
+    # Unknown most severe consequences must still match the major consequence code of their transcript consequences
+    assert hl.eval(consequence_term_code("new_consequence_variant")) == UNKNOWN_CONSEQUENCE_TERM_CODE
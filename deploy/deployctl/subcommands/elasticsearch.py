@@ -50,7 +50,22 @@ def get_elasticsearch_password(cluster_name: str, namespace: str) -> None:
     )
 
 
-def load_datasets(cluster_name: str, namespace: str, dataproc_cluster: str, secret: str, datasets: str):
+def load_datasets(
+    cluster_name: str,
+    namespace: str,
+    dataproc_cluster: str,
+    secret: str,
+    datasets: str,
+    engine: str,
+    bulk_workers: int,
+    resume: typing.Optional[str] = None,
+    parallelism: int = 1,
+    order: str = "given",
+    max_documents_per_second: typing.Optional[int] = None,
+    update_aliases: bool = False,
+    retain_indices: typing.Optional[int] = None,
+    value_encoding: str = "json",
+):
     # Matches service name in deploy/manifests/elasticsearch.load-balancer.yaml.jinja2
     elasticsearch_load_balancer_ip = kubectl(
         [
@@ -62,6 +77,25 @@ def load_datasets(cluster_name: str, namespace: str, dataproc_cluster: str, secr
         ]
     )
 
+    pipeline_args = [
+        f"--host={elasticsearch_load_balancer_ip}",
+        f"--secret={secret}",
+        f"--datasets={datasets}",
+        f"--engine={engine}",
+        f"--bulk-workers={bulk_workers}",
+        f"--parallelism={parallelism}",
+        f"--order={order}",
+        f"--value-encoding={value_encoding}",
+    ]
+    if resume:
+        pipeline_args.append(f"--resume={resume}")
+    if max_documents_per_second:
+        pipeline_args.append(f"--max-documents-per-second={max_documents_per_second}")
+    if update_aliases:
+        pipeline_args.append("--update-aliases")
+    if retain_indices is not None:
+        pipeline_args.append(f"--retain-indices={retain_indices}")
+
     subprocess.check_call(
         [
             sys.argv[0],
@@ -70,9 +104,7 @@ def load_datasets(cluster_name: str, namespace: str, dataproc_cluster: str, secr
             "export_to_elasticsearch",
             f"--cluster={dataproc_cluster}",
             "--",
-            f"--host={elasticsearch_load_balancer_ip}",
-            f"--secret={secret}",
-            f"--datasets={datasets}",
+            *pipeline_args,
         ]
     )
 
@@ -103,6 +135,15 @@ def main(argv: typing.List[str]) -> None:
     load_parser.add_argument("--namespace", default="default")
     load_parser.add_argument("--dataproc-cluster", required=True)
     load_parser.add_argument("--secret", default="gnomad-elasticsearch-password")
+    load_parser.add_argument("--engine", choices=["es-hadoop", "bulk"], default="es-hadoop")
+    load_parser.add_argument("--bulk-workers", type=int, default=8)
+    load_parser.add_argument("--resume", metavar="INDEX")
+    load_parser.add_argument("--parallelism", type=int, default=1)
+    load_parser.add_argument("--order", choices=["given", "largest-first", "smallest-first"], default="given")
+    load_parser.add_argument("--max-documents-per-second", type=int)
+    load_parser.add_argument("--update-aliases", action="store_true")
+    load_parser.add_argument("--retain-indices", type=int)
+    load_parser.add_argument("--value-encoding", choices=["json", "zlib"], default="json")
     load_parser.add_argument("datasets")
 
     args = parser.parse_args(argv)
@@ -1,130 +1,314 @@
 import argparse
 import csv
 import gzip
+import heapq
+import itertools
 import os
 import sqlite3
-from collections import defaultdict
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from operator import itemgetter
 
+READS_TABLE_COLUMNS = """
+        `id` text,
+        `order` integer,
+        `n_alleles` integer,
+        `allele_1_repeat_unit` text,
+        `allele_2_repeat_unit` text,
+        `allele_1_repeats` integer,
+        `allele_1_repeats_ci_lower` integer,
+        `allele_1_repeats_ci_upper` integer,
+        `allele_2_repeats` integer,
+        `allele_2_repeats_ci_lower` integer,
+        `allele_2_repeats_ci_upper` integer,
+        `population` text,
+        `sex` text,
+        `age` text,
+        `pcr_protocol` text,
+        `filename` text"""
 
-def create_short_tandem_repeat_reads_db(input_path, output_path):
-    if os.path.exists(output_path):
-        raise Exception(f"{output_path} already exists")
+CREATE_READS_TABLE = f"CREATE TABLE `reads` ({READS_TABLE_COLUMNS})"
+
+# Compact databases cluster reads by locus and order instead of storing a separate ID index
+CREATE_COMPACT_READS_TABLE = f"""
+    CREATE TABLE `reads` (
+        {READS_TABLE_COLUMNS},
+        PRIMARY KEY (`id`, `order`)
+    ) WITHOUT ROWID
+"""
+
+# Columns that the reads server filters on. Including all of them in an index allows reads matching
+# a filter to be found using only the index.
+FILTER_COLUMNS = [
+    "id",
+    "population",
+    "sex",
+    "n_alleles",
+    "allele_1_repeat_unit",
+    "allele_1_repeats",
+    "allele_2_repeat_unit",
+    "allele_2_repeats",
+]
+
+FILTER_COLUMNS_SQL = ", ".join(f"`{column}`" for column in FILTER_COLUMNS)
+
+CREATE_ID_INDEX = "CREATE INDEX `id_idx` ON `reads` (`id`, `order`)"
+
+CREATE_FILTER_INDEX = f"CREATE INDEX `filter_idx` ON `reads` ({FILTER_COLUMNS_SQL}, `filename`)"
 
+# Number of reads with a readviz file for each combination of filter values at each locus
+CREATE_READ_COUNTS_TABLE = f"""
+    CREATE TABLE `read_counts` AS
+    SELECT {FILTER_COLUMNS_SQL}, COUNT(*) AS `n_reads`
+    FROM `reads`
+    WHERE `filename` IS NOT NULL
+    GROUP BY {FILTER_COLUMNS_SQL}
+"""
+
+CREATE_READ_COUNTS_INDEX = "CREATE INDEX `read_counts_idx` ON `read_counts` (`id`, `population`, `sex`)"
+
+INSERT_READ = """
+    INSERT INTO `reads` VALUES (
+        :id,
+        :order,
+        :n_alleles,
+        :allele_1_repeat_unit,
+        :allele_2_repeat_unit,
+        :allele_1_repeats,
+        :allele_1_repeats_ci_lower,
+        :allele_1_repeats_ci_upper,
+        :allele_2_repeats,
+        :allele_2_repeats_ci_lower,
+        :allele_2_repeats_ci_upper,
+        :population,
+        :sex,
+        :age,
+        :pcr_protocol,
+        :filename
+    )
+"""
+
+# The database is written once and then only read, so skip the journal and fsyncs while loading it.
+# A database that fails to load is deleted instead of being rolled back.
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",  # 256 MiB
+]
+
+
+def _open_input(input_path):
     if input_path.startswith("gs://"):
-        import hail as hl
+        import hail as hl  # pylint: disable=import-outside-toplevel
+
+        return hl.hadoop_open(input_path)
 
-        open_file = hl.hadoop_open
+    return gzip.open(input_path, "rt") if input_path.endswith(".gz") else open(input_path)
+
+
+def _sort_reads_by_locus(reads, tmp_dir, max_reads_in_memory=1_000_000):
+    """
+    Sort reads by locus ID with an external merge sort. Reads for each locus remain in their input order.
+    """
+    chunk_paths = []
+    fieldnames = None
+    while True:
+        chunk = list(itertools.islice(reads, max_reads_in_memory))
+        if not chunk:
+            break
+
+        fieldnames = list(chunk[0].keys())
+        chunk.sort(key=itemgetter("Id"))
+
+        chunk_path = os.path.join(tmp_dir, f"chunk-{len(chunk_paths)}.tsv")
+        with open(chunk_path, "w", newline="") as chunk_file:
+            writer = csv.DictWriter(chunk_file, fieldnames=fieldnames, delimiter="\t")
+            writer.writeheader()
+            writer.writerows(chunk)
+
+        chunk_paths.append(chunk_path)
+
+    chunk_files = [open(chunk_path, newline="") for chunk_path in chunk_paths]  # pylint: disable=consider-using-with
+    try:
+        # heapq.merge is stable, so reads for each locus stay in input order
+        yield from heapq.merge(
+            *(csv.DictReader(chunk_file, delimiter="\t") for chunk_file in chunk_files), key=itemgetter("Id")
+        )
+    finally:
+        for chunk_file in chunk_files:
+            chunk_file.close()
+
+
+def _group_reads_by_locus(reads):
+    """
+    Group reads by locus ID. Reads must already be grouped by locus.
+
+    Return:
+        iterator of (locus ID, iterator of reads)
+    """
+    loci = set()
+    for locus, locus_reads in itertools.groupby(reads, key=itemgetter("Id")):
+        if locus in loci:
+            raise ValueError(f"Reads for {locus} are not grouped together in input, use --sort to sort input")
+
+        loci.add(locus)
+        yield locus, (read for read in locus_reads if read["IsAdjacentRepeat"] != "True")
+
+
+def _format_read(read, index, locus):
+    # Hemizygotes have only one allele and only one value in Genotype/GenotypeConfidenceInterval
+    if "/" in read["Genotype"]:
+        n_alleles = 2
+        allele_1_repeats, allele_2_repeats = map(int, read["Genotype"].split("/"))
+        allele_1_ci, allele_2_ci = read["GenotypeConfidenceInterval"].split("/")
+        allele_1_ci_lower, allele_1_ci_upper = map(int, allele_1_ci.split("-"))
+        allele_2_ci_lower, allele_2_ci_upper = map(int, allele_2_ci.split("-"))
     else:
-        open_file = lambda path: gzip.open(path, "rt") if input_path.endswith(".gz") else open
+        n_alleles = 1
+        allele_1_repeats = int(read["Genotype"])
+        allele_2_repeats = None
+        allele_1_ci_lower, allele_1_ci_upper = map(int, read["GenotypeConfidenceInterval"].split("-"))
+        allele_2_ci_lower = allele_2_ci_upper = None
 
-    reads_data = defaultdict(list)
-    with open_file(input_path) as input_file:
-        reader = csv.DictReader(input_file, delimiter="\t")
-        for row in reader:
-            reads_data[row["Id"]].append(row)
+    if "/" in read["Motif"]:
+        allele_1_repeat_unit, allele_2_repeat_unit = read["Motif"].split("/")
+    else:
+        allele_1_repeat_unit = read["Motif"]
+        allele_2_repeat_unit = read["Motif"]
 
-    reads_data = {
-        locus: [read for read in reads if read["IsAdjacentRepeat"] != "True"] for locus, reads in reads_data.items()
+    return {
+        "id": locus,
+        "order": index,
+        "n_alleles": n_alleles,
+        "allele_1_repeat_unit": allele_1_repeat_unit,
+        "allele_2_repeat_unit": allele_2_repeat_unit,
+        "allele_1_repeats": allele_1_repeats,
+        "allele_1_repeats_ci_lower": allele_1_ci_lower,
+        "allele_1_repeats_ci_upper": allele_1_ci_upper,
+        "allele_2_repeats": allele_2_repeats,
+        "allele_2_repeats_ci_lower": allele_2_ci_lower,
+        "allele_2_repeats_ci_upper": allele_2_ci_upper,
+        "population": read["Population"],
+        "sex": read["Sex"],
+        "age": None if read["Age"] == "age_not_available" else read["Age"],
+        "pcr_protocol": read["PcrProtocol"],
+        "filename": read["ReadvizFilename"] or None,
     }
 
-    db = sqlite3.connect(output_path)
-    db.execute(
-        """
-        CREATE TABLE `reads` (
-            `id` text,
-            `order` integer,
-            `n_alleles` integer,
-            `allele_1_repeat_unit` text,
-            `allele_2_repeat_unit` text,
-            `allele_1_repeats` integer,
-            `allele_1_repeats_ci_lower` integer,
-            `allele_1_repeats_ci_upper` integer,
-            `allele_2_repeats` integer,
-            `allele_2_repeats_ci_lower` integer,
-            `allele_2_repeats_ci_upper` integer,
-            `population` text,
-            `sex` text,
-            `age` text,
-            `pcr_protocol` text,
-            `filename` text
-        )
-        """
-    )
 
-    db.execute("CREATE INDEX `id_idx` ON `reads` (`id`)")
-
-    def _format_read(read, index, locus):
-        # Hemizygotes have only one allele and only one value in Genotype/GenotypeConfidenceInterval
-        if "/" in read["Genotype"]:
-            n_alleles = 2
-            allele_1_repeats, allele_2_repeats = map(int, read["Genotype"].split("/"))
-            allele_1_ci, allele_2_ci = read["GenotypeConfidenceInterval"].split("/")
-            allele_1_ci_lower, allele_1_ci_upper = map(int, allele_1_ci.split("-"))
-            allele_2_ci_lower, allele_2_ci_upper = map(int, allele_2_ci.split("-"))
-        else:
-            n_alleles = 1
-            allele_1_repeats = int(read["Genotype"])
-            allele_2_repeats = None
-            allele_1_ci_lower, allele_1_ci_upper = map(int, read["GenotypeConfidenceInterval"].split("-"))
-            allele_2_ci_lower = allele_2_ci_upper = None
-
-        if "/" in read["Motif"]:
-            allele_1_repeat_unit, allele_2_repeat_unit = read["Motif"].split("/")
-        else:
-            allele_1_repeat_unit = read["Motif"]
-            allele_2_repeat_unit = read["Motif"]
-
-        return {
-            "id": locus,
-            "order": index,
-            "n_alleles": n_alleles,
-            "allele_1_repeat_unit": allele_1_repeat_unit,
-            "allele_2_repeat_unit": allele_2_repeat_unit,
-            "allele_1_repeats": allele_1_repeats,
-            "allele_1_repeats_ci_lower": allele_1_ci_lower,
-            "allele_1_repeats_ci_upper": allele_1_ci_upper,
-            "allele_2_repeats": allele_2_repeats,
-            "allele_2_repeats_ci_lower": allele_2_ci_lower,
-            "allele_2_repeats_ci_upper": allele_2_ci_upper,
-            "population": read["Population"],
-            "sex": read["Sex"],
-            "age": None if read["Age"] == "age_not_available" else read["Age"],
-            "pcr_protocol": read["PcrProtocol"],
-            "filename": read["ReadvizFilename"] or None,
-        }
-
-    for locus, reads in reads_data.items():
-        db.executemany(
-            """
-            INSERT INTO `reads` VALUES (
-                :id,
-                :order,
-                :n_alleles,
-                :allele_1_repeat_unit,
-                :allele_2_repeat_unit,
-                :allele_1_repeats,
-                :allele_1_repeats_ci_lower,
-                :allele_1_repeats_ci_upper,
-                :allele_2_repeats,
-                :allele_2_repeats_ci_lower,
-                :allele_2_repeats_ci_upper,
-                :population,
-                :sex,
-                :age,
-                :pcr_protocol,
-                :filename
-            )
-            """,
-            (_format_read(read, index, locus) for index, read in enumerate(reads)),
-        )
-        db.commit()
+def _write_reads_db(output_path, loci, compact=False):
+    """
+    Create a reads database containing reads for the given loci.
+
+    Args:
+        loci: iterator of (locus ID, iterator of reads)
+        compact: store reads in a table clustered by locus and compact the database after loading
+    """
+    if os.path.exists(output_path):
+        raise Exception(f"{output_path} already exists")
+
+    db = sqlite3.connect(output_path, isolation_level=None)
+    try:
+        for pragma in BULK_LOAD_PRAGMAS:
+            db.execute(pragma)
+
+        db.execute(CREATE_COMPACT_READS_TABLE if compact else CREATE_READS_TABLE)
+
+        # Load all reads in one transaction and build indexes afterwards
+        db.execute("BEGIN")
+        for locus, reads in loci:
+            db.executemany(INSERT_READ, (_format_read(read, index, locus) for index, read in enumerate(reads)))
+        db.execute("COMMIT")
+
+        if not compact:
+            db.execute(CREATE_ID_INDEX)
+
+        db.execute(CREATE_FILTER_INDEX)
+
+        db.execute(CREATE_READ_COUNTS_TABLE)
+        db.execute(CREATE_READ_COUNTS_INDEX)
+
+        # Collect statistics for the query planner to choose between indexes
+        db.execute("ANALYZE")
+
+        if compact:
+            db.execute("VACUUM")
+    except BaseException:
+        db.close()
+        os.remove(output_path)
+        raise
 
     db.close()
 
 
+def _write_locus_reads_db(output_path, locus, reads, compact=False):
+    _write_reads_db(output_path, [(locus, reads)], compact=compact)
+    return locus
+
+
+def create_short_tandem_repeat_reads_db(
+    input_path, output_path, sort=False, shard_by_locus=False, compact=False, n_workers=None, tmp_dir=None
+):
+    """
+    Create a SQLite database of STR reads from a readviz paths TSV file.
+
+    Input is read as a stream, so reads must be grouped by locus ID unless sort is True.
+
+    Args:
+        sort: sort input by locus ID before loading it
+        shard_by_locus: write a separate database for each locus, named <output_path>/<locus ID>.db
+        compact: write read-only databases with reads clustered by locus, for the reads server to memory map
+        n_workers: number of processes used to write databases when sharding by locus
+        tmp_dir: directory for temporary files when sorting input
+    """
+    if shard_by_locus:
+        os.makedirs(output_path, exist_ok=True)
+    elif os.path.exists(output_path):
+        raise Exception(f"{output_path} already exists")
+
+    with _open_input(input_path) as input_file, tempfile.TemporaryDirectory(dir=tmp_dir) as sort_dir:
+        reads = csv.DictReader(input_file, delimiter="\t")
+        if sort:
+            reads = _sort_reads_by_locus(reads, sort_dir)
+
+        loci = _group_reads_by_locus(reads)
+
+        if not shard_by_locus:
+            _write_reads_db(output_path, loci, compact=compact)
+            return
+
+        n_workers = n_workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            # Limit the number of loci held in memory while waiting for a process to write them
+            pending = set()
+            for locus, locus_reads in loci:
+                if os.sep in locus or locus.startswith("."):
+                    raise ValueError(f"Invalid locus ID {locus}")
+
+                if len(pending) >= 2 * n_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+
+                locus_output_path = os.path.join(output_path, f"{locus}.db")
+                pending.add(
+                    executor.submit(_write_locus_reads_db, locus_output_path, locus, list(locus_reads), compact=compact)
+                )
+
+            for future in pending:
+                future.result()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("input_path", help="Path to STR readviz paths TSV file")
-    parser.add_argument("output_path", help="Destination for SQLite database")
+    parser.add_argument("output_path", help="Destination for SQLite database (or directory with --shard-by-locus)")
+    parser.add_argument("--sort", action="store_true", help="Sort input by locus (required if it is not grouped)")
+    parser.add_argument("--shard-by-locus", action="store_true", help="Write a separate database for each locus")
+    parser.add_argument("--compact", action="store_true", help="Write compact read-only databases")
+    parser.add_argument("--workers", dest="n_workers", type=int, help="Number of processes for --shard-by-locus")
+    parser.add_argument("--tmp-dir", help="Directory for temporary files used to sort input")
     args = parser.parse_args()
     create_short_tandem_repeat_reads_db(**vars(args))
@@ -1,3 +1,6 @@
+const fs = require('fs')
+const path = require('path')
+
 const sqlite = require('sqlite')
 const sqlite3 = require('sqlite3')
 
@@ -8,7 +11,7 @@ const buildWhere = ({ id, filter }) => {
     ':id': id,
   }
 
-  let where = '`id` = :id AND `filename` IS NOT NULL'
+  let where = '`id` = :id'
 
   if (filter) {
     if (filter.population) {
@@ -104,15 +107,50 @@ const buildWhere = ({ id, filter }) => {
   return { where, params }
 }
 
-const resolveShortTandemRepeatNumReads = async ({ dbPath }, { id, filter }) => {
-  const { where, params } = buildWhere({ id, filter })
+// Reads may be stored in a single database or, if dbDirectory is configured, in a separate database for each locus.
+const getDbPath = ({ dbPath, dbDirectory }, id) => {
+  if (!dbDirectory) {
+    return dbPath
+  }
 
-  const query = `SELECT COUNT(*) AS \`num_reads\` FROM \`reads\` WHERE ${where}`
+  if (!/^[A-Za-z0-9_-]+$/.test(id)) {
+    throw new UserVisibleError('Invalid short tandem repeat ID')
+  }
+
+  const locusDbPath = path.join(dbDirectory, `${id}.db`)
+  return fs.existsSync(locusDbPath) ? locusDbPath : null
+}
 
+const openDb = async (dbPath) => {
   const db = await sqlite.open({
     filename: dbPath,
     driver: sqlite3.Database,
+    mode: sqlite3.OPEN_READONLY,
   })
+  // Databases are read only, so reading them through a memory map avoids copying pages into SQLite's cache
+  await db.exec('PRAGMA mmap_size = 268435456')
+  return db
+}
+
+const resolveShortTandemRepeatNumReads = async (config, { id, filter }) => {
+  const { where, params } = buildWhere({ id, filter })
+
+  const dbPath = getDbPath(config, id)
+  if (!dbPath) {
+    return 0
+  }
+
+  const db = await openDb(dbPath)
+
+  // Databases created before read counts were precomputed only have the reads table
+  const hasReadCounts = await db.get(
+    "SELECT 1 FROM `sqlite_master` WHERE `type` = 'table' AND `name` = 'read_counts'"
+  )
+
+  const query = hasReadCounts
+    ? `SELECT COALESCE(SUM(\`n_reads\`), 0) AS \`num_reads\` FROM \`read_counts\` WHERE ${where}`
+    : `SELECT COUNT(*) AS \`num_reads\` FROM \`reads\` WHERE ${where} AND \`filename\` IS NOT NULL`
+
   const result = await db.get(query, params)
   await db.close()
 
@@ -121,17 +159,18 @@ const resolveShortTandemRepeatNumReads = async ({ dbPath }, { id, filter }) => {
 
 const MAX_READS_PER_REQUEST = 1_000
 
-const resolveShortTandemRepeatReads = async (
-  { dbPath, publicPath },
-  { id, filter },
-  { limit = 10, offset = 0 }
-) => {
+const resolveShortTandemRepeatReads = async (config, { id, filter }, { limit = 10, offset = 0 }) => {
   if (limit > MAX_READS_PER_REQUEST) {
     throw new UserVisibleError(`Limit must be <= ${MAX_READS_PER_REQUEST}`)
   }
 
   const { where, params } = buildWhere({ id, filter })
 
+  const dbPath = getDbPath(config, id)
+  if (!dbPath) {
+    return []
+  }
+
   const query = `
     SELECT
       \`id\`,
@@ -153,7 +192,7 @@ const resolveShortTandemRepeatReads = async (
     FROM
       \`reads\`
     WHERE
-      ${where}
+      ${where} AND \`filename\` IS NOT NULL
     ORDER BY \`order\`
     LIMIT :limit OFFSET :offset
   `
@@ -163,10 +202,7 @@ const resolveShortTandemRepeatReads = async (
     ':offset': offset,
   })
 
-  const db = await sqlite.open({
-    filename: dbPath,
-    driver: sqlite3.Database,
-  })
+  const db = await openDb(dbPath)
   const rows = await db.all(query, params)
   await db.close()
 
@@ -206,7 +242,7 @@ const resolveShortTandemRepeatReads = async (
       sex: row.sex,
       age: row.age,
       pcr_protocol: row.pcr_protocol,
-      path: `${publicPath}/${id}/${row.filename}`,
+      path: `${config.publicPath}/${id}/${row.filename}`,
     }
   })
 }